@@ -0,0 +1,119 @@
+# analytics.py
+"""
+Dashboard aggregates served from the rollup tables in database.py.
+
+Backfill / repair the rollups from the base tables with:
+    python analytics.py rebuild
+"""
+
+import sys
+from datetime import date
+from typing import Any, Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import (SessionLocal, BusinessCard, VisitorLogEntry, DailyRollup, HourlyRollup, VisitorRollup,
+                      new_rollup_deltas, accumulate_visitor_rollups, accumulate_card_rollups, apply_rollup_deltas,
+                      create_db_and_tables)
+
+REBUILD_CHUNK_ROWS = 10_000
+
+
+def _day_range(column, start_date: date | None, end_date: date | None) -> list:
+    predicates = []
+    if start_date:
+        predicates.append(column >= start_date)
+    if end_date:
+        predicates.append(column <= end_date)
+    return predicates
+
+
+def get_dashboard_analytics(db: Session, start_date: date | None = None, end_date: date | None = None, top_n: int = 10) -> Dict[str, Any]:
+    """
+    Ready-made dashboard aggregates. Cost is proportional to the number of buckets
+    (days, day x hour, top_n), never to the number of stored records.
+    Top visitors are all-time; everything else honours the date range, which for visits means
+    the visit date written in the register (stored day if it couldn't be read) and for cards the
+    day they were stored.
+    """
+    daily_rows = (
+        db.query(DailyRollup)
+        .filter(*_day_range(DailyRollup.day, start_date, end_date))
+        .order_by(DailyRollup.day)
+        .all()
+    )
+    hourly_rows = (
+        db.query(HourlyRollup.hour, func.sum(HourlyRollup.arrivals))
+        .filter(*_day_range(HourlyRollup.day, start_date, end_date))
+        .group_by(HourlyRollup.hour)
+        .order_by(HourlyRollup.hour)
+        .all()
+    )
+    top_visitors = db.query(VisitorRollup).order_by(VisitorRollup.visits.desc()).limit(top_n).all()
+
+    duration_total = sum(row.duration_minutes_total for row in daily_rows)
+    duration_samples = sum(row.duration_samples for row in daily_rows)
+    return {
+        "visits_per_day": [{"day": row.day.isoformat(), "visits": row.visits} for row in daily_rows if row.visits],
+        "cards_per_day": [{"day": row.day.isoformat(), "cards": row.cards} for row in daily_rows if row.cards],
+        "visits_per_hour": [{"hour": hour, "visits": arrivals} for hour, arrivals in hourly_rows],
+        "top_visitors": [{"visitor_name": row.visitor_name, "visits": row.visits, "last_visit_day": row.last_visit_day.isoformat() if row.last_visit_day else None} for row in top_visitors],
+        "average_visit_minutes": round(duration_total / duration_samples, 1) if duration_samples else None,
+        "average_visit_minutes_per_day": [
+            {"day": row.day.isoformat(), "minutes": round(row.duration_minutes_total / row.duration_samples, 1)}
+            for row in daily_rows if row.duration_samples
+        ],
+        "totals": {
+            "visits": sum(row.visits for row in daily_rows),
+            "cards": sum(row.cards for row in daily_rows),
+        },
+    }
+
+
+def rebuild_rollups(db: Session) -> Dict[str, int]:
+    """
+    Recomputes every rollup table from the base tables in one transaction.
+    Rows are streamed in chunks; memory is bounded by days x hours + distinct visitors.
+    """
+    deltas = new_rollup_deltas()
+    visitor_rows = 0
+    log_query = db.query(
+        VisitorLogEntry.created_at, VisitorLogEntry.visit_date, VisitorLogEntry.visitor_name, VisitorLogEntry.time_in, VisitorLogEntry.time_out
+    ).yield_per(REBUILD_CHUNK_ROWS)
+    for created_at, visit_date, visitor_name, time_in, time_out in log_query:
+        if created_at is None and visit_date is None:
+            continue
+        entry = {"visitor_name": visitor_name, "time_in": time_in, "time_out": time_out}
+        accumulate_visitor_rollups(deltas, created_at.date() if created_at else None, [entry], [visit_date])
+        visitor_rows += 1
+
+    card_rows = 0
+    card_query = db.query(BusinessCard.created_at).yield_per(REBUILD_CHUNK_ROWS)
+    for (created_at,) in card_query:
+        if created_at is None:
+            continue
+        accumulate_card_rollups(deltas, created_at.date())
+        card_rows += 1
+
+    try:
+        for model in (DailyRollup, HourlyRollup, VisitorRollup):
+            db.query(model).delete(synchronize_session=False)
+        apply_rollup_deltas(db, deltas)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"visitor_log_rows": visitor_rows, "business_card_rows": card_rows, "days": len(deltas["daily"])}
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print(__doc__)
+        sys.exit(1)
+    create_db_and_tables()
+    session = SessionLocal()
+    try:
+        print(f"Rollups rebuilt: {rebuild_rollups(session)}")
+    finally:
+        session.close()
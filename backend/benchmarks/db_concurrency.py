@@ -0,0 +1,177 @@
+# benchmarks/db_concurrency.py
+"""
+Read latency on /get_visitor_logs/ while a long write transaction is running, with the
+SQLite tuning (WAL + pragmas) on and off.
+
+Each mode runs in its own subprocess against a fresh database, because the engine and its
+pragmas are configured at import time. A background thread repeatedly opens a write
+transaction, inserts --write-rows rows and holds it for --hold seconds before committing.
+Meanwhile --readers clients page through /get_visitor_logs/ and one client pings / to show
+whether the event loop itself stays responsive.
+
+    cd backend
+    python benchmarks/db_concurrency.py --seed-rows 50000 --readers 16 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"tuned": "true", "default": "false"}
+
+
+def percentile(samples: list, fraction: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies: list) -> dict:
+    millis = [value * 1000 for value in latencies]
+    return {
+        "count": len(millis),
+        "p50_ms": round(statistics.median(millis), 2) if millis else None,
+        "p95_ms": round(percentile(millis, 0.95), 2) if millis else None,
+        "max_ms": round(max(millis), 2) if millis else None,
+    }
+
+
+def visitor_row(i: int) -> tuple:
+    # Padded raw JSON makes each write transaction large enough to spill SQLite's page cache
+    return ("bench", f"Visitor {i}", "09:00", "17:00", json.dumps({"visitor_name": f"Visitor {i}", "notes": "x" * 200}))
+
+
+def seed(database_path: str, table: str, rows: int):
+    connection = sqlite3.connect(database_path)
+    with connection:
+        connection.executemany(
+            f"INSERT INTO {table} (batch_id, visitor_name, time_in, time_out, raw_json_entry, created_at) "
+            "VALUES (?, ?, ?, ?, ?, datetime('now'))",
+            (visitor_row(i) for i in range(rows)),
+        )
+    connection.close()
+
+
+class LongWriter(threading.Thread):
+    """Holds a write transaction open for `hold_seconds` at a time, as a large import would."""
+
+    def __init__(self, database_path: str, table: str, rows: int, hold_seconds: float):
+        super().__init__(daemon=True)
+        self.database_path, self.table, self.rows, self.hold_seconds = database_path, table, rows, hold_seconds
+        self.transactions = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        connection = sqlite3.connect(self.database_path, isolation_level=None, timeout=30)
+        while not self._stop_event.is_set():
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                f"INSERT INTO {self.table} (batch_id, visitor_name, time_in, time_out, raw_json_entry, created_at) "
+                "VALUES (?, ?, ?, ?, ?, datetime('now'))",
+                (visitor_row(i) for i in range(self.rows)),
+            )
+            self._stop_event.wait(self.hold_seconds)
+            connection.execute("COMMIT")
+            self.transactions += 1
+        connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+async def run_mode(args) -> dict:
+    """Child process body: one mode, fresh database, prints its JSON result."""
+    work_dir = tempfile.mkdtemp(prefix="db-concurrency-bench-")
+    os.chdir(work_dir)
+    database_path = os.path.join(work_dir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["EXTRACTION_CACHE_PERSIST"] = "false"
+    sys.path.insert(0, BACKEND_DIR)
+
+    import httpx
+    import database
+    import main as backend
+
+    database.create_db_and_tables()
+    database.engine.dispose() # Reconnect so the connect-time pragmas (incl. journal_mode) apply to a fresh pool
+    with database.engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    table = database.VisitorLogEntry.__tablename__
+    seed(database_path, table, args.seed_rows)
+
+    read_latencies, ping_latencies, read_errors = [], [], 0
+    deadline = time.perf_counter() + args.duration
+    transport = httpx.ASGITransport(app=backend.app)
+    writer = LongWriter(database_path, table, args.write_rows, args.hold)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def reader():
+            nonlocal read_errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get("/get_visitor_logs/", params={"limit": args.page_size})
+                if response.status_code == 200:
+                    read_latencies.append(time.perf_counter() - started)
+                else:
+                    read_errors += 1
+
+        async def pinger():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                await client.get("/")
+                ping_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        writer.start()
+        await asyncio.gather(pinger(), *(reader() for _ in range(args.readers)))
+        writer.stop()
+
+    return {
+        "journal_mode": journal_mode,
+        "write_transactions": writer.transactions,
+        "reads": summarize(read_latencies),
+        "reads_per_second": round(len(read_latencies) / args.duration, 1),
+        "read_errors": read_errors,
+        "event_loop_ping": summarize(ping_latencies),
+    }
+
+
+def main(args):
+    results = {}
+    for mode, tuning in MODES.items():
+        env = {**os.environ, "SQLITE_TUNING_ENABLED": tuning}
+        command = [sys.executable, os.path.abspath(__file__), "--run-mode", mode] + [
+            f"--{name.replace('_', '-')}={value}" for name, value in vars(args).items() if name != "run_mode"
+        ]
+        completed = subprocess.run(command, env=env, capture_output=True, text=True, check=True)
+        results[mode] = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(json.dumps({"settings": {k: v for k, v in vars(args).items() if k != "run_mode"}, "modes": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-rows", type=int, default=50_000)
+    parser.add_argument("--write-rows", type=int, default=50_000, help="Rows inserted per long write transaction")
+    parser.add_argument("--hold", type=float, default=1.0, help="Seconds each write transaction stays open after inserting")
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--run-mode", choices=MODES, help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    if parsed.run_mode:
+        result = asyncio.run(run_mode(parsed))
+        print(json.dumps(result)) # Last stdout line is read by the parent process
+    else:
+        main(parsed)
@@ -0,0 +1,115 @@
+# benchmarks/llm_throttling.py
+"""
+Fires a burst of chat completions at the throttling stub server (stub_groq_server.py) and
+compares the LLM scheduler with a plain client behind a semaphore (the old behaviour, where
+every 429 became a failed extraction).
+
+    cd backend
+    python benchmarks/llm_throttling.py --requests 60 --keys 2 --rpm 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import uvicorn
+from groq import AsyncGroq, GroqError
+
+from llm_scheduler import LLMScheduler
+from stub_groq_server import create_app
+
+PROMPT = [{"role": "user", "content": "Extract the business card as JSON."}]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_naive(base_url: str, api_keys, requests: int, concurrency: int) -> dict:
+    """One client per key (round robin), no retries: what the backend did before the scheduler."""
+    clients = [AsyncGroq(api_key=key, base_url=base_url, max_retries=0) for key in api_keys]
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def one(index: int):
+        async with semaphore:
+            try:
+                await clients[index % len(clients)].chat.completions.create(model="stub", messages=PROMPT, max_tokens=256)
+                outcomes["ok"] += 1
+            except GroqError:
+                outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return {**outcomes, "seconds": round(time.perf_counter() - started, 2)}
+
+
+async def run_scheduled(base_url: str, api_keys, requests: int, concurrency: int, client_rpm: float, client_tpm: float) -> dict:
+    scheduler = LLMScheduler.from_api_keys(
+        api_keys, base_url, 30,
+        max_concurrency=concurrency, queue_timeout_seconds=600,
+        requests_per_minute=client_rpm, tokens_per_minute=client_tpm,
+    )
+    outcomes = {"ok": 0, "failed": 0}
+
+    async def one():
+        try:
+            await scheduler.create(model="stub", messages=PROMPT, max_tokens=256)
+            outcomes["ok"] += 1
+        except GroqError:
+            outcomes["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return {**outcomes, "seconds": round(time.perf_counter() - started, 2), "scheduler": scheduler.snapshot()}
+
+
+async def main(args):
+    api_keys = [f"stub-key-{index}" for index in range(args.keys)]
+    report = {"config": vars(args)}
+    for mode in ("naive", "scheduled"):
+        # Fresh server per mode so both start with full budgets
+        app = create_app(args.rpm, args.tpm, args.latency, args.error_rate)
+        port = free_port()
+        server = start_stub_server(app, port)
+        base_url = f"http://127.0.0.1:{port}"
+        if mode == "naive":
+            result = await run_naive(base_url, api_keys, args.requests, args.concurrency)
+        else:
+            # The client budget is deliberately looser than the server's so Retry-After handling is exercised
+            result = await run_scheduled(base_url, api_keys, args.requests, args.concurrency, args.rpm * args.client_budget_factor, args.tpm * args.client_budget_factor)
+        result["server"] = dict(app.state.counters)
+        report[mode] = result
+        server.should_exit = True
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=2)
+    parser.add_argument("--rpm", type=float, default=20, help="Server-side requests per minute per key")
+    parser.add_argument("--tpm", type=float, default=30000, help="Server-side tokens per minute per key")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--client-budget-factor", type=float, default=1.5, help="Scheduler budget relative to the server's")
+    asyncio.run(main(parser.parse_args()))
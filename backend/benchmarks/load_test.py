@@ -0,0 +1,372 @@
+# benchmarks/load_test.py
+"""
+Reproducible load test of the main endpoints against a synthetic database, with the Groq client
+swapped for the local stub so no credits are spent and results don't depend on the provider.
+
+Seeds --seed-rows visitor log entries and --seed-cards business cards from a fixed RNG seed
+(plain sqlite3 bulk inserts; pass --database to keep the file and reuse it on later runs), then
+runs each scenario for --duration seconds with --concurrency clients against the app in-process
+(httpx ASGI transport, with the app's lifespan running):
+
+  extract       POST /extract_validate/ with a synthetic register scan, unique per request
+  store         POST /store_data/, alternating visitor registers and business cards
+  get_cards     GET /get_business_cards/, each client following X-Next-Cursor page by page
+  get_visitors  GET /get_visitor_logs/, likewise
+
+Per scenario it reports req/s, p50/p95/p99 latency, status counts and peak RSS; extract also
+reports LLM calls and retries per document. The report is JSON (stdout, and --output FILE), so
+two runs can be compared number by number. RSS is read from /proc/self/status (Linux only).
+
+    cd backend
+    python benchmarks/load_test.py --seed-rows 100000 --concurrency 1 8 32 --duration 10 --output load.json
+    python benchmarks/load_test.py --scenarios extract --llm-latency 2 --failure-rate 0.05 --malformed-rate 0.2
+"""
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from db_concurrency import percentile
+from upload_memory import PeakRssSampler, read_rss_bytes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["extract", "store", "get_cards", "get_visitors"]
+SEED_CHUNK_ROWS = 50_000
+
+FIRST_NAMES = ["Aisha", "Ben", "Carlos", "Divya", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jonas",
+               "Kofi", "Lena", "Mateo", "Nadia", "Omar", "Priya", "Quinn", "Rosa", "Sven", "Tara"]
+LAST_NAMES = ["Ahmed", "Baker", "Chen", "Diaz", "Evans", "Fischer", "Gupta", "Haddad", "Ito", "Jensen",
+              "Khan", "Lopez", "Murphy", "Novak", "Okafor", "Patel", "Rossi", "Silva", "Tanaka", "Weber"]
+STREETS = ["Main Street", "Station Road", "High Street", "Park Avenue", "Mill Lane", "Church Road"]
+
+
+# --- Synthetic Data ---
+
+def synthetic_visit(rng: random.Random, visit_date: date) -> dict:
+    """One register row as the LLM would return it, plus the parsed columns stored alongside it."""
+    arrived = rng.randint(7 * 60, 18 * 60)
+    duration = rng.choice([15, 30, 45, 60, 90, 120, 240])
+    left = min(arrived + duration, 23 * 60 + 59)
+    return {
+        "date": visit_date.strftime("%d/%m/%Y"),
+        "visitor_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+        "time_in": f"{arrived // 60:02d}:{arrived % 60:02d}",
+        "time_out": f"{left // 60:02d}:{left % 60:02d}",
+        "_columns": (visit_date.isoformat(), f"{arrived // 60:02d}:{arrived % 60:02d}:00",
+                     f"{left // 60:02d}:{left % 60:02d}:00", left - arrived),
+    }
+
+
+def synthetic_card(rng: random.Random, number: int) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    domain = f"{rng.choice(LAST_NAMES).lower()}-{rng.randint(1, 500)}.example.com"
+    return {
+        "name": f"{first} {last}",
+        "title": rng.choice(["Engineer", "Sales Director", "Operations Manager", "Founder"]),
+        "phone": [f"+1 415 555 {number % 10000:04d}"],
+        "email": [f"{first.lower()}.{last.lower()}{number}@{domain}"],
+        "website": [domain],
+        "address": f"{rng.randint(1, 999)} {rng.choice(STREETS)}, Springfield",
+    }
+
+
+def register_rows(rng: random.Random, rows: int) -> list:
+    visit_date = date(2026, 1, 1) + timedelta(days=rng.randint(0, 364))
+    entries = [synthetic_visit(rng, visit_date) for _ in range(rows)]
+    for entry in entries:
+        del entry["_columns"]
+    return entries
+
+
+def seed(database_path: str, visitor_rows: int, card_rows: int, seed_value: int):
+    """
+    Bulk-loads visitor logs (parsed visit columns included) and business cards with their contact
+    rows into empty tables. Newest rows get the highest ids, as if stored one after another.
+    """
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc).replace(microsecond=0, tzinfo=None)
+    first_day = date(2025, 1, 1)
+    connection = sqlite3.connect(database_path)
+    with connection:
+        for start in range(0, visitor_rows, SEED_CHUNK_ROWS):
+            rows = []
+            for index in range(start, min(visitor_rows, start + SEED_CHUNK_ROWS)):
+                visit = synthetic_visit(rng, first_day + timedelta(days=index * 730 // max(visitor_rows, 1)))
+                columns = visit.pop("_columns")
+                created_at = (now - timedelta(seconds=visitor_rows - index)).strftime("%Y-%m-%d %H:%M:%S")
+                rows.append((f"seed-{index // 20}", visit["date"], visit["visitor_name"], visit["address"], visit["time_in"],
+                             visit["time_out"], json.dumps(visit), "seed.jpg", created_at, *columns))
+            connection.executemany(
+                "INSERT INTO visitor_log_book (batch_id, date_str, visitor_name, address, time_in, time_out, raw_json_entry, "
+                "image_filename, created_at, visit_date, time_in_at, time_out_at, duration_minutes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+        for start in range(0, card_rows, SEED_CHUNK_ROWS):
+            cards, contacts = [], []
+            for card_id in range(start + 1, min(card_rows, start + SEED_CHUNK_ROWS) + 1):
+                card = synthetic_card(rng, card_id)
+                created_at = (now - timedelta(seconds=card_rows - card_id)).strftime("%Y-%m-%d %H:%M:%S")
+                cards.append((card_id, card["name"], card["title"], json.dumps(card["phone"]), json.dumps(card["email"]),
+                              json.dumps(card["website"]), card["address"], json.dumps(card), "seed.jpg", created_at))
+                domain = card["website"][0]
+                contacts.extend((
+                    (card_id, "phone", 0, card["phone"][0], "+1415555" + card["phone"][0][-4:], None),
+                    (card_id, "email", 0, card["email"][0], card["email"][0], domain),
+                    (card_id, "website", 0, domain, domain, domain),
+                ))
+            connection.executemany(
+                "INSERT INTO business_visting_cards (id, name, title, phone, email, website, address, raw_json, image_filename, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                cards,
+            )
+            connection.executemany(
+                "INSERT INTO business_card_contacts (card_id, kind, position, value, normalized, domain) VALUES (?, ?, ?, ?, ?, ?)",
+                contacts,
+            )
+    connection.close()
+
+
+def table_count(database_path: str, table: str) -> int:
+    connection = sqlite3.connect(database_path)
+    try:
+        return connection.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+    finally:
+        connection.close()
+
+
+def make_register_image(rows: int) -> bytes:
+    """An A4 page at 150 dpi with a ruled, handwritten-looking register; enough for realistic preprocessing."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(1)
+    image = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(image)
+    row_height = 1600 // max(rows + 1, 1)
+    for row in range(rows + 2):
+        top = 60 + row * row_height
+        draw.line((40, top, 1200, top), fill=(90, 90, 140), width=2)
+        if 0 < row <= rows:
+            for column, left in enumerate((50, 220, 560, 940, 1070)):
+                scribble = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789:/ ") for _ in range(rng.randint(5, 14)))
+                draw.text((left + rng.randint(0, 8), top - row_height + 10), scribble if column else f"{rng.randint(1, 28)}/03/26", fill=(20, 20, 60))
+    for left in (40, 210, 550, 930, 1060, 1200):
+        draw.line((left, 60, left, 60 + (rows + 1) * row_height), fill=(90, 90, 140), width=2)
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=85)
+    return output.getvalue()
+
+
+# --- Scenarios ---
+
+def scenario_request(name: str, args, image_bytes: bytes):
+    """Returns an async fn(client, state, rng) sending one request of the scenario and returning its status code."""
+    if name == "extract":
+        async def extract(client, state, rng):
+            # Trailing bytes after the JPEG end marker are ignored by decoders but defeat the extraction cache
+            payload = image_bytes + rng.randbytes(16)
+            response = await client.post("/extract_validate/", files={"file": ("register.jpg", payload, "image/jpeg")})
+            return response.status_code
+        return extract
+
+    if name == "store":
+        async def store(client, state, rng):
+            state["count"] = state.get("count", 0) + 1
+            if state["count"] % 2:
+                body = {"type": "visitor_register", "data": register_rows(rng, args.rows_per_register)}
+            else:
+                body = {"type": "business_card", "data": synthetic_card(rng, rng.randint(1, 10**6))}
+            response = await client.post("/store_data/", json=body)
+            return response.status_code
+        return store
+
+    path = "/get_business_cards/" if name == "get_cards" else "/get_visitor_logs/"
+
+    async def read_page(client, state, rng):
+        params = {"limit": args.page_size}
+        if state.get("cursor"):
+            params["cursor"] = state["cursor"]
+        response = await client.get(path, params=params)
+        # Walk towards older rows and start over at the end (or after --max-pages), so most pages are distinct
+        state["pages"] = state.get("pages", 0) + 1
+        state["cursor"] = response.headers.get("X-Next-Cursor") if state["pages"] % args.max_pages else None
+        return response.status_code
+    return read_page
+
+
+async def run_scenario(name: str, client, send, concurrency: int, args) -> dict:
+    latencies, statuses = [], Counter()
+
+    async def worker(index: int):
+        rng = random.Random(args.seed * 1000 + index)
+        state = {}
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status_code = str(await send(client, state, rng))
+            except Exception as e:
+                status_code = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status_code] += 1
+
+    gc.collect()
+    baseline = read_rss_bytes()
+    sampler = PeakRssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    peak = sampler.stop()
+    millis = [value * 1000 for value in latencies]
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "ok": sum(count for status_code, count in statuses.items() if status_code.startswith("2")),
+        "statuses": dict(sorted(statuses.items())),
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(millis, 0.50), 2) if millis else None,
+        "p95_ms": round(percentile(millis, 0.95), 2) if millis else None,
+        "p99_ms": round(percentile(millis, 0.99), 2) if millis else None,
+        "max_ms": round(max(millis), 2) if millis else None,
+        "baseline_rss_mb": round(baseline / 2**20, 1),
+        "peak_rss_mb": round(peak / 2**20, 1),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    database_path = os.path.abspath(args.database) if args.database else None
+    # Isolated working dir so the benchmark never touches the real data_extractor.db
+    os.chdir(tempfile.mkdtemp(prefix="load-test-"))
+    database_path = database_path or os.path.abspath("load_test.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0") # Per-request log lines would dominate the run and the output
+    # The stub has no rate limits, so the scheduler's per-key budgets must not be what's measured
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = os.environ["LLM_TOKENS_PER_MINUTE"] = "100000000"
+    if args.llm_concurrency:
+        os.environ["MAX_CONCURRENT_LLM_CALLS"] = str(args.llm_concurrency)
+    sys.path.insert(0, BACKEND_DIR)
+
+    import database
+    # Tables and plain indexes first; importing main adds the search index and triggers, which
+    # would only slow the bulk load down if they existed already
+    database.Base.metadata.create_all(bind=database.engine)
+    seeded = False
+    started = time.perf_counter()
+    if table_count(database_path, "visitor_log_book") == 0 and table_count(database_path, "business_visting_cards") == 0:
+        seed(database_path, args.seed_rows, args.seed_cards, args.seed)
+        seeded = True
+    seed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    import httpx
+    import main as backend
+    from stub_llm import StubGroqClient
+    startup_seconds = time.perf_counter() - started
+
+    visit = synthetic_visit(random.Random(args.seed), date(2026, 3, 1))
+    del visit["_columns"]
+    response = {"type": "visitor_register", "data": [visit] * args.rows_per_register}
+    stub = StubGroqClient(latency_seconds=args.llm_latency, response=response, jitter_seconds=args.llm_jitter,
+                          failure_rate=args.failure_rate, malformed_rate=args.malformed_rate, seed=args.seed)
+    backend.llm_scheduler.replace_clients([("stub", stub)])
+    completions = stub.chat.completions
+    image_bytes = make_register_image(args.rows_per_register)
+
+    results = []
+    transport = httpx.ASGITransport(app=backend.app)
+    async with backend.lifespan(backend.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in args.scenarios:
+                send = scenario_request(name, args, image_bytes)
+                for concurrency in args.concurrency:
+                    before = (completions.calls, completions.failures, completions.malformed, backend.llm_scheduler.snapshot()["retries"])
+                    result = await run_scenario(name, client, send, concurrency, args)
+                    if name == "extract":
+                        calls, failures, malformed, retries = (
+                            now - then for now, then in zip((completions.calls, completions.failures, completions.malformed,
+                                                             backend.llm_scheduler.snapshot()["retries"]), before)
+                        )
+                        documents = result["requests"]
+                        result.update({
+                            "llm_calls": calls,
+                            "llm_calls_per_document": round(calls / documents, 3) if documents else None,
+                            # Every call past the first for a document: provider retries, repairs and re-extractions
+                            "retries_per_document": round((calls - documents) / documents, 3) if documents else None,
+                            "provider_retries": retries,
+                            "stub_failures": failures,
+                            "stub_malformed": malformed,
+                        })
+                    results.append(result)
+                    print(f"{name} x{concurrency}: {result['requests_per_second']} req/s, p99 {result['p99_ms']} ms", file=sys.stderr)
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "database": {
+            "path": database_path,
+            "seeded": seeded,
+            "seed_seconds": round(seed_seconds, 2),
+            "startup_seconds": round(startup_seconds, 2),
+            "visitor_log_rows": table_count(database_path, "visitor_log_book"),
+            "business_card_rows": table_count(database_path, "business_visting_cards"),
+            "size_mb": round(os.path.getsize(database_path) / 2**20, 1),
+        },
+        "peak_rss_mb": max((result["peak_rss_mb"] for result in results), default=None),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Concurrent clients; each scenario runs once per value")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario and concurrency")
+    parser.add_argument("--seed-rows", type=int, default=10_000, help="Visitor log entries in the synthetic database")
+    parser.add_argument("--seed-cards", type=int, default=None, help="Business cards in the synthetic database (default: seed-rows / 10)")
+    parser.add_argument("--database", default=None, help="SQLite file to use; seeded only if empty, so it can be reused across runs")
+    parser.add_argument("--seed", type=int, default=7, help="RNG seed for the data, the clients and the stub's failures")
+    parser.add_argument("--rows-per-register", type=int, default=20, help="Visitor rows per extracted or stored register")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--max-pages", type=int, default=50, help="Pages a reader follows before starting over from the newest")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds the stub LLM takes per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Up to this many extra seconds per call, uniformly random")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of stub calls failing with a connection error")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Share of stub responses cut off mid-JSON")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="MAX_CONCURRENT_LLM_CALLS for the run (default: the app's setting)")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    if args.seed_cards is None:
+        args.seed_cards = args.seed_rows // 10
+    asyncio.run(main(args))
@@ -0,0 +1,171 @@
+# benchmarks/serialization_throughput.py
+"""
+Rows/second for serving a read endpoint's pages, before and after the fast serialization path.
+
+Seeds a fresh database with --rows rows, then walks the whole table page by page (keyset
+pagination, --page-size rows per page) the way a client following X-Next-Cursor would:
+
+  legacy   ORM entities -> dict comprehension over __table__.columns -> isoformat()/json.loads
+           -> stdlib json (what JSONResponse does)
+  fast     projected column tuples -> compiled row encoder -> orjson
+  msgpack  same rows encoded as msgpack (only if the package is installed)
+
+    cd backend
+    python benchmarks/serialization_throughput.py --rows 1000000 --table visitor_logs
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(database, table: str, rows: int):
+    """Bulk-loads synthetic rows with plain sqlite3; indexes are built afterwards."""
+    rng = random.Random(7)
+    database.Base.metadata.create_all(bind=database.engine) # No FTS triggers: they would only slow seeding
+    connection = sqlite3.connect(database.engine.url.database)
+    chunk = 50_000
+    with connection:
+        for start in range(0, rows, chunk):
+            count = min(chunk, rows - start)
+            if table == "visitor_logs":
+                connection.executemany(
+                    "INSERT INTO visitor_log_book (batch_id, date_str, visitor_name, address, time_in, time_out, raw_json_entry, created_at) "
+                    "VALUES (?, '2026-03-01', ?, ?, '09:00', '17:30', ?, datetime('now', ?))",
+                    (
+                        (f"batch-{(start + i) // 20}", f"Visitor {start + i}", f"{rng.randint(1, 999)} Main Street",
+                         json.dumps({"visitor_name": f"Visitor {start + i}"}), f"-{start + i} seconds")
+                        for i in range(count)
+                    ),
+                )
+            else:
+                first_id = start + 1
+                connection.executemany(
+                    "INSERT INTO business_visting_cards (id, name, title, phone, email, website, address, raw_json, created_at) "
+                    "VALUES (?, ?, 'Engineer', ?, ?, ?, '1 Main Street', '{}', datetime('now', ?))",
+                    (
+                        (first_id + i, f"Person {first_id + i}", json.dumps([f"+1 415 555 {i % 10000:04d}"]),
+                         json.dumps([f"p{first_id + i}@example.com"]), json.dumps(["example.com"]), f"-{first_id + i} seconds")
+                        for i in range(count)
+                    ),
+                )
+                connection.executemany(
+                    "INSERT INTO business_card_contacts (card_id, kind, position, value, normalized, domain) VALUES (?, ?, 0, ?, ?, ?)",
+                    (
+                        row
+                        for i in range(count)
+                        for row in (
+                            (first_id + i, "phone", f"+1 415 555 {i % 10000:04d}", f"+1415555{i % 10000:04d}", None),
+                            (first_id + i, "email", f"p{first_id + i}@example.com", f"p{first_id + i}@example.com", "example.com"),
+                            (first_id + i, "website", "example.com", "example.com", "example.com"),
+                        )
+                    ),
+                )
+    connection.close()
+    database.ensure_indexes()
+
+
+# --- Legacy Path (ORM entities + stdlib json), as the endpoints did before ---
+
+def legacy_page(db, model, cursor, limit):
+    from queries import decode_cursor, encode_cursor, _stored_text
+    from sqlalchemy import tuple_
+    created_at_text = _stored_text(model.created_at)
+    query = db.query(model)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_at_text, model.id) < tuple_(last_created_at, last_id))
+    rows = query.add_columns(created_at_text.label("created_at_text")).order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at_text, rows[-1][0].id) if has_more else None
+    return [row[0] for row in rows], next_cursor
+
+
+def legacy_dict(record):
+    record_dict = {c.name: getattr(record, c.name) for c in record.__table__.columns}
+    for key in ("phone", "email", "website"):
+        if key in record_dict:
+            record_dict[key] = json.loads(record_dict[key]) if record_dict[key] else None
+    for key in ("created_at", "updated_at"):
+        if key in record_dict:
+            record_dict[key] = record_dict[key].isoformat() if record_dict[key] else None
+    return record_dict
+
+
+def legacy_encode(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+# --- Runner ---
+
+def walk(label: str, load_page, encode, page_size: int) -> dict:
+    cursor, rows, body_bytes = None, 0, 0
+    started = time.perf_counter()
+    while True:
+        records, cursor = load_page(cursor, page_size)
+        body_bytes += len(encode(records))
+        rows += len(records)
+        if cursor is None:
+            break
+    elapsed = time.perf_counter() - started
+    return {"path": label, "rows": rows, "seconds": round(elapsed, 2), "rows_per_second": round(rows / elapsed), "body_mb": round(body_bytes / 2**20, 1)}
+
+
+def main(args):
+    os.chdir(tempfile.mkdtemp(prefix="serialization-bench-"))
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath('bench.db')}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    import database
+    import serialization
+    from queries import paginate
+
+    model = database.VisitorLogEntry if args.table == "visitor_logs" else database.BusinessCard
+    started = time.perf_counter()
+    seed(database, args.table, args.rows)
+    print(f"Seeded {args.rows} {args.table} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    db = database.SessionLocal()
+    serialize_rows = serialization.SERIALIZERS[model]
+
+    def fast_page(cursor, limit):
+        rows, next_cursor = paginate(db.query(*serialization.projected_columns(model)), model, cursor, limit)
+        return serialize_rows(db, rows), next_cursor
+
+    def legacy_full_page(cursor, limit):
+        records, next_cursor = legacy_page(db, model, cursor, limit)
+        return [legacy_dict(record) for record in records], next_cursor
+
+    results = [
+        walk("legacy", legacy_full_page, legacy_encode, args.page_size),
+        walk("fast", fast_page, lambda records: serialization.encode_body(records)[0], args.page_size),
+    ]
+    if serialization.msgpack is not None:
+        results.append(walk("fast+msgpack", fast_page, lambda records: serialization.encode_body(records, "application/msgpack")[0], args.page_size))
+    db.close()
+
+    baseline = results[0]["rows_per_second"]
+    for result in results:
+        result["speedup"] = round(result["rows_per_second"] / baseline, 2)
+    print(json.dumps({
+        "table": args.table,
+        "page_size": args.page_size,
+        "json_encoder": "orjson" if serialization.orjson is not None else "json",
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--table", choices=["visitor_logs", "business_cards"], default="visitor_logs")
+    parser.add_argument("--page-size", type=int, default=1000)
+    main(parser.parse_args())
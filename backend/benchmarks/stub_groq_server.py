@@ -0,0 +1,135 @@
+# benchmarks/stub_groq_server.py
+"""
+Local stand-in for the Groq chat completions API that enforces its own rate limits.
+
+Each API key (the Bearer token) gets requests- and tokens-per-minute budgets; a request over
+budget gets a 429 with retry-after and x-ratelimit-* headers, like the real service. Optional
+latency and random 5xx errors simulate a slow or flaky provider. Point the backend at it with
+
+    cd backend
+    python benchmarks/stub_groq_server.py --port 8081 --rpm 30 --tpm 30000
+    GROQ_BASE_URL=http://127.0.0.1:8081 GROQ_API_KEYS=a,b uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from stub_llm import DEFAULT_RESPONSE
+
+IMAGE_TOKENS = 1500 # What the stub charges per attached image
+
+
+class KeyBudget:
+    """Per-minute budget refilled continuously, as the provider's limits behave."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def try_take(self, amount: float) -> float:
+        """Takes `amount` and returns 0, or returns the seconds until it would be available."""
+        now = time.monotonic()
+        self.available = min(self.per_minute, self.available + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+        if self.available >= amount:
+            self.available -= amount
+            return 0.0
+        return (amount - self.available) * 60 / self.per_minute
+
+    def reset_seconds(self) -> float:
+        return (self.per_minute - self.available) * 60 / self.per_minute
+
+
+def count_prompt_tokens(messages) -> int:
+    tokens = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // 4
+            continue
+        for part in content or []:
+            tokens += IMAGE_TOKENS if part.get("type") == "image_url" else len(part.get("text") or "") // 4
+    return tokens
+
+
+def create_app(rpm: float, tpm: float, latency_seconds: float = 0.2, error_rate: float = 0.0, response: dict | None = None) -> FastAPI:
+    app = FastAPI(title="Stub Groq API")
+    budgets = {}
+    app.state.counters = Counter()
+    content = json.dumps(response or DEFAULT_RESPONSE)
+
+    def rate_limit_headers(request_budget: KeyBudget, token_budget: KeyBudget) -> dict:
+        return {
+            "x-ratelimit-limit-requests": str(int(rpm)),
+            "x-ratelimit-remaining-requests": str(max(0, int(request_budget.available))),
+            "x-ratelimit-reset-requests": f"{request_budget.reset_seconds():.2f}s",
+            "x-ratelimit-limit-tokens": str(int(tpm)),
+            "x-ratelimit-remaining-tokens": str(max(0, int(token_budget.available))),
+            "x-ratelimit-reset-tokens": f"{token_budget.reset_seconds():.2f}s",
+        }
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        api_key = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        body = await request.json()
+        prompt_tokens = count_prompt_tokens(body.get("messages", []))
+        completion_tokens = len(content) // 4
+        request_budget, token_budget = budgets.setdefault(api_key, (KeyBudget(rpm), KeyBudget(tpm)))
+        app.state.counters["requests"] += 1
+
+        wait = request_budget.try_take(1)
+        if wait == 0:
+            wait = token_budget.try_take(min(tpm, prompt_tokens + completion_tokens))
+            if wait > 0:
+                request_budget.available += 1 # Rejected requests don't count against the request budget
+        if wait > 0:
+            app.state.counters["throttled"] += 1
+            headers = {"retry-after": str(math.ceil(wait)), **rate_limit_headers(request_budget, token_budget)}
+            error = {"message": f"Rate limit reached for key. Please try again in {wait:.2f}s.", "type": "tokens", "code": "rate_limit_exceeded"}
+            return JSONResponse({"error": error}, status_code=429, headers=headers)
+
+        await asyncio.sleep(latency_seconds)
+        if random.random() < error_rate:
+            app.state.counters["errors"] += 1
+            return JSONResponse({"error": {"message": "Simulated upstream failure.", "type": "internal_server_error"}}, status_code=500)
+
+        app.state.counters["completed"] += 1
+        return JSONResponse(
+            {
+                "id": f"chatcmpl-stub-{app.state.counters['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            },
+            headers=rate_limit_headers(request_budget, token_budget),
+        )
+
+    @app.get("/stats")
+    async def stats():
+        return dict(app.state.counters)
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--rpm", type=float, default=30, help="Requests per minute per API key")
+    parser.add_argument("--tpm", type=float, default=30000, help="Tokens per minute per API key")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds each accepted completion takes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of accepted requests answered with a 500")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.rpm, args.tpm, args.latency, args.error_rate), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,66 @@
+# benchmarks/stub_llm.py
+
+import asyncio
+import json
+import random
+from types import SimpleNamespace
+
+import httpx
+from groq import APIConnectionError
+
+# A valid extraction result the stub returns unless told otherwise
+DEFAULT_RESPONSE = {
+    "type": "business_card",
+    "data": {
+        "name": "Jane Doe",
+        "title": "Operations Manager",
+        "phone": ["+1 555 0100"],
+        "email": ["jane.doe@example.com"],
+        "website": ["example.com"],
+        "address": "1 Main Street, Springfield",
+    },
+}
+
+
+class StubCompletions:
+    """
+    Mimics `AsyncGroq().chat.completions` with a fixed latency and response.
+    Optionally adds up to jitter_seconds of extra latency, fails a failure_rate share of calls
+    with a connection error (which the scheduler retries) and truncates a malformed_rate share
+    of responses mid-JSON (which the extraction repairs or retries). Draws come from a seeded
+    RNG, so the same seed gives the same sequence of outcomes.
+    """
+
+    def __init__(self, latency_seconds: float = 1.0, response: dict | None = None, jitter_seconds: float = 0.0,
+                 failure_rate: float = 0.0, malformed_rate: float = 0.0, seed: int | None = None):
+        self.latency_seconds = latency_seconds
+        self.response = response or DEFAULT_RESPONSE
+        self.jitter_seconds = jitter_seconds
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.calls = 0
+        self.failures = 0
+        self.malformed = 0
+        self._random = random.Random(seed)
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds + self._random.uniform(0, self.jitter_seconds))
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise APIConnectionError(request=httpx.Request("POST", "https://stub.invalid/openai/v1/chat/completions"))
+        content = json.dumps(self.response)
+        if self._random.random() < self.malformed_rate:
+            self.malformed += 1
+            content = content[:len(content) // 2]
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=len(content) // 4, total_tokens=1000 + len(content) // 4),
+        )
+
+
+class StubGroqClient:
+    """Drop-in client for `main.llm_scheduler.replace_clients` in benchmarks; never touches the network."""
+
+    def __init__(self, latency_seconds: float = 1.0, response: dict | None = None, **options):
+        self.chat = SimpleNamespace(completions=StubCompletions(latency_seconds, response, **options))
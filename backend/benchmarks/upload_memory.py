@@ -0,0 +1,122 @@
+# benchmarks/upload_memory.py
+"""
+Measures peak RSS growth of the backend while N uploads are in flight on /extract_validate/.
+
+The app runs in-process (httpx ASGI transport) with the Groq client swapped for a stub,
+so the LLM "call" just holds each request open for --llm-latency seconds. RSS is sampled
+from /proc/self/status, so this needs Linux.
+
+    cd backend
+    python benchmarks/upload_memory.py --image-mb 8 --concurrency 1 4 8 16
+"""
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_rss_bytes() -> int:
+    with open("/proc/self/status") as status_file:
+        for line in status_file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class PeakRssSampler(threading.Thread):
+    def __init__(self, interval_seconds: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval_seconds = interval_seconds
+        self.peak = read_rss_bytes()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, read_rss_bytes())
+            time.sleep(self.interval_seconds)
+
+    def stop(self) -> int:
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def make_test_image(target_mb: float) -> bytes:
+    """Noise compresses badly, so a noisy JPEG approximates a large phone photo."""
+    from PIL import Image
+    side = 1000
+    while True:
+        buffer = io.BytesIO()
+        Image.effect_noise((side, side), 80).convert("RGB").save(buffer, "JPEG", quality=95)
+        if buffer.tell() >= target_mb * 1024 * 1024 or side >= 8000:
+            return buffer.getvalue()
+        side = int(side * 1.3)
+
+
+async def run_round(client, image_bytes: bytes, concurrency: int):
+    async def one_request(i: int):
+        # Trailing bytes after the JPEG end marker are ignored by decoders but defeat the extraction cache
+        payload = image_bytes + os.urandom(16)
+        response = await client.post("/extract_validate/", files={"file": (f"bench-{i}.jpg", payload, "image/jpeg")})
+        return response.status_code
+
+    gc.collect()
+    baseline = read_rss_bytes()
+    sampler = PeakRssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*(one_request(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    peak = sampler.stop()
+    return {
+        "concurrency": concurrency,
+        "ok": sum(1 for code in statuses if code == 200),
+        "elapsed_seconds": round(elapsed, 3),
+        "baseline_rss_mb": round(baseline / 2**20, 1),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "peak_growth_mb": round((peak - baseline) / 2**20, 1),
+        "peak_growth_per_request_mb": round((peak - baseline) / 2**20 / concurrency, 2),
+    }
+
+
+async def main(args):
+    # Isolated working dir so the benchmark never touches the real data_extractor.db
+    os.chdir(tempfile.mkdtemp(prefix="upload-memory-bench-"))
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["EXTRACTION_CACHE_PERSIST"] = "false"
+    os.environ["MAX_CONCURRENT_LLM_CALLS"] = str(max(args.concurrency))
+    # The stub has no rate limits, so the scheduler's per-key budgets must not be what's measured
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = os.environ["LLM_TOKENS_PER_MINUTE"] = "100000000"
+    sys.path.insert(0, BACKEND_DIR)
+
+    import httpx
+    import main as backend
+    from stub_llm import StubGroqClient
+
+    backend.llm_scheduler.replace_clients([("stub", StubGroqClient(latency_seconds=args.llm_latency))])
+    image_bytes = make_test_image(args.image_mb)
+
+    results = []
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in args.concurrency:
+            results.append(await run_round(client, image_bytes, concurrency))
+
+    print(json.dumps({"image_bytes": len(image_bytes), "llm_latency_seconds": args.llm_latency, "rounds": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image-mb", type=float, default=8.0, help="Approximate size of the uploaded JPEG")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Seconds the stub LLM holds each request")
+    asyncio.run(main(parser.parse_args()))
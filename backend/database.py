@@ -1,21 +1,71 @@
 # database.py
 
+import functools
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
+import sys
+import uuid
+
+import anyio
+import anyio.to_thread
+from sqlalchemy import create_engine, event, inspect, insert, select, update, exists, case, or_, Column, ForeignKey, Integer, String, Text, Date, DateTime, Time, LargeBinary, Index
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert, TIME as SQLITE_TIME
+from sqlalchemy.orm import sessionmaker, declarative_base, relationship
 from sqlalchemy.sql import func
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime, timezone
 import json # To store lists/dicts as JSON strings
 
+from metrics import log
+from normalization import parse_time_of_day, parse_visit_date, visit_duration_minutes, visit_columns, normalize_phone, normalize_email, normalize_website
+
 # --- Database Configuration ---
-DATABASE_URL = "sqlite:///./data_extractor.db" # File-based SQLite DB
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data_extractor.db") # File-based SQLite DB
+# WAL lets readers proceed while a write is in progress; set false to keep SQLite's defaults
+SQLITE_TUNING_ENABLED = os.getenv("SQLITE_TUNING_ENABLED", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")) # Wait for the write lock instead of failing
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")) # Page cache per connection
+SQLITE_MMAP_SIZE_BYTES = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "8"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
 
 # Create SQLAlchemy engine
 # connect_args is needed for SQLite to allow multi-threaded access (FastAPI is async)
 engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT_SECONDS,
 )
 
+
+@event.listens_for(engine, "connect")
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Applies the per-connection pragmas; journal_mode=WAL persists in the database file itself."""
+    if not SQLITE_TUNING_ENABLED or engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL") # Durable across app crashes; only an OS crash can lose the last commits
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+# Every blocking Session call made from an async endpoint goes through run_in_db_thread.
+# The limiter matches the pool so queued work waits here rather than holding a thread on pool_timeout.
+_db_thread_limiter = anyio.CapacityLimiter(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+
+async def run_in_db_thread(fn, *args, **kwargs):
+    """Runs fn(*args, **kwargs) on a worker thread so queries and commits never block the event loop."""
+    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_db_thread_limiter)
+
 # Create a session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,6 +74,11 @@ Base = declarative_base()
 
 # --- Database Models ---
 
+# Times of day are stored as 'HH:MM:SS' on SQLite (the default adds microseconds), so the text sorts and reads as written
+TimeOfDay = Time().with_variant(
+    SQLITE_TIME(storage_format="%(hour)02d:%(minute)02d:%(second)02d", regexp=r"(\d+):(\d+):(\d+)"), "sqlite"
+)
+
 class BusinessCard(Base):
     __tablename__ = "business_visting_cards"
 
@@ -40,6 +95,31 @@ class BusinessCard(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Normalized phone/email/website rows; reads use these instead of decoding the JSON columns above
+    contacts = relationship("BusinessCardContact", order_by="(BusinessCardContact.kind, BusinessCardContact.position)", viewonly=True)
+
+    __table_args__ = (
+        # Backs keyset pagination and created_at range filters (see queries.py)
+        Index("ix_business_visting_cards_created_at_id", "created_at", "id"),
+    )
+
+class BusinessCardContact(Base):
+    __tablename__ = "business_card_contacts"
+
+    id = Column(Integer, primary_key=True)
+    card_id = Column(Integer, ForeignKey("business_visting_cards.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String, nullable=False) # phone | email | website
+    position = Column(Integer, nullable=False) # Index in the card's original list
+    value = Column(String, nullable=False) # As extracted
+    normalized = Column(String, nullable=True) # E.164 phone, lowercased email, host/path website; None if unparseable
+    domain = Column(String, nullable=True) # Email domain or website host
+
+    __table_args__ = (
+        Index("ix_business_card_contacts_card_id", "card_id", "kind", "position"),
+        Index("ix_business_card_contacts_kind_normalized", "kind", "normalized", "card_id"),
+        Index("ix_business_card_contacts_kind_domain", "kind", "domain", "card_id"),
+    )
+
 class VisitorLogEntry(Base):
     __tablename__ = "visitor_log_book"
 
@@ -54,6 +134,95 @@ class VisitorLogEntry(Base):
     raw_json_entry = Column(Text, nullable=False) # Store JSON for this specific entry
     image_filename = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Parsed from date_str / time_in / time_out when stored (see normalization.visit_columns); None if unreadable
+    visit_date = Column(Date, nullable=True)
+    time_in_at = Column(TimeOfDay, nullable=True)
+    time_out_at = Column(TimeOfDay, nullable=True)
+    duration_minutes = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_visitor_log_book_created_at_id", "created_at", "id"),
+        # "On site on day X between two times" is a range scan on (visit_date, time_in_at);
+        # arrival-hour and duration filters across all days use the other two
+        Index("ix_visitor_log_book_visit_date_time_in_at", "visit_date", "time_in_at"),
+        Index("ix_visitor_log_book_time_in_at", "time_in_at"),
+        Index("ix_visitor_log_book_duration_minutes", "duration_minutes"),
+    )
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    # Bumped by add_documents_bulk in the writing transaction; read endpoints derive ETags from it
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # One row per one-off data migration that has completed (see run_migration_once)
+    name = Column(String, primary_key=True)
+    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+
+    # sha256(model | prompt version | image sha256), see extraction_cache.make_cache_key
+    cache_key = Column(String, primary_key=True)
+    image_sha256 = Column(String, index=True, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    model_name = Column(String, nullable=False)
+    result_json = Column(Text, nullable=False) # Validated {"type": ..., "data": ...} payload
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ExtractionJob(Base):
+    __tablename__ = "extraction_jobs"
+
+    id = Column(String, primary_key=True) # UUID string handed back to the client
+    status = Column(String, index=True, nullable=False, default="queued") # queued | running | succeeded | failed
+    filename = Column(String, nullable=True)
+    mime_type = Column(String, nullable=False)
+    image_data = Column(LargeBinary, nullable=True) # Kept until the job finishes so restarts can re-run it
+    result_json = Column(Text, nullable=True) # Validated {"type": ..., "data": ...} payload
+    error_status_code = Column(Integer, nullable=True)
+    error_detail = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # Lease of a running job: the worker process that claimed it and when that process last renewed it
+    worker_id = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+# --- Analytics Rollup Tables ---
+# Kept up to date by add_documents_bulk below so the dashboard reads O(buckets) rows.
+# analytics.py serves them and can rebuild them from the base tables.
+
+class DailyRollup(Base):
+    __tablename__ = "analytics_daily"
+
+    # Visits count on their visit date as written in the register (VisitorLogEntry.visit_date), so
+    # they agree with the visit_date filters; entries whose date couldn't be read, and all cards,
+    # count on the UTC day they were stored (created_at)
+    day = Column(Date, primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+    cards = Column(Integer, nullable=False, default=0)
+    duration_minutes_total = Column(Integer, nullable=False, default=0) # Sum over entries with readable time_in/time_out
+    duration_samples = Column(Integer, nullable=False, default=0)
+
+class HourlyRollup(Base):
+    __tablename__ = "analytics_hourly"
+
+    day = Column(Date, primary_key=True) # Same day as DailyRollup
+    hour = Column(Integer, primary_key=True) # Hour of arrival parsed from time_in, 0-23
+    arrivals = Column(Integer, nullable=False, default=0)
+
+class VisitorRollup(Base):
+    __tablename__ = "analytics_visitors"
+
+    visitor_key = Column(String, primary_key=True) # Case/whitespace-folded visitor name
+    visitor_name = Column(String, nullable=False) # Most recently stored spelling
+    visits = Column(Integer, nullable=False, default=0, index=True)
+    last_visit_day = Column(Date, nullable=True)
 
 # --- Database Utility Functions ---
 
@@ -62,10 +231,230 @@ def create_db_and_tables():
     print("Attempting to create database tables...")
     try:
         Base.metadata.create_all(bind=engine)
+        ensure_columns()
+        ensure_indexes()
+        ensure_search_indexes()
+        run_migration_once("backfill_business_card_contacts", backfill_business_card_contacts)
+        run_migration_once("backfill_visit_columns", backfill_visit_columns)
+        run_migration_once("rollups_by_visit_date", rebuild_rollups_now)
         print("Database tables checked/created successfully.")
     except Exception as e:
         print(f"Error creating database tables: {e}")
 
+def ensure_columns() -> dict[str, list[str]]:
+    """
+    create_all() doesn't alter existing tables either, so columns added to a model are missing
+    from older databases. Adds the nullable ones (SQLite does this without rewriting the table)
+    and returns the added column names per table.
+    """
+    inspector = inspect(engine)
+    added: dict[str, list[str]] = {}
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable or column.server_default is not None:
+                    print(f"Warning: column {table.name}.{column.name} is missing and can't be added automatically.")
+                    continue
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                )
+                added.setdefault(table.name, []).append(column.name)
+                print(f"Added column {table.name}.{column.name}.")
+    return added
+
+def run_migration_once(name: str, migrate) -> bool:
+    """
+    Runs migrate() unless schema_migrations records that it already completed, then records it,
+    so a data migration scans its table on one boot instead of every boot. migrate() must be safe
+    to repeat: a crash before the marker is written runs it again. Returns whether it ran.
+    """
+    with engine.connect() as connection:
+        if connection.execute(select(SchemaMigration.name).where(SchemaMigration.name == name)).first():
+            return False
+    migrate()
+    with engine.begin() as connection:
+        connection.execute(sqlite_insert(SchemaMigration).values(name=name).on_conflict_do_nothing())
+    return True
+
+def ensure_indexes():
+    """
+    create_all() skips tables that already exist, so indexes added to existing models
+    would never reach older databases. Create any that are missing.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+# --- Full-text Search Indexes ---
+# External-content FTS5 tables over the searchable columns, kept in sync by triggers so every
+# insert/update/delete path (ORM, set-based INSERTs, manual SQL) updates them in the same transaction.
+# The unicode61 table serves word/prefix queries; the trigram table serves substring and fuzzy queries.
+SEARCH_INDEXES = {
+    "business_cards": {"table": BusinessCard.__tablename__, "columns": ["name", "title", "address", "email", "website"]},
+    "visitor_logs": {"table": VisitorLogEntry.__tablename__, "columns": ["visitor_name", "address"]},
+}
+FTS_TOKENIZERS = {"fts": "unicode61 remove_diacritics 2", "trigram": "trigram"}
+FTS_PREFIX_LENGTHS = "2 3" # Extra prefix indexes so short prefix queries don't scan the term list
+search_index_kinds: set[str] = set() # Filled by ensure_search_indexes() at startup
+
+def search_index_name(index_key: str, kind: str) -> str:
+    return f"{index_key}_{kind}"
+
+def _search_index_ddl(index_key: str, kind: str) -> list[str]:
+    spec = SEARCH_INDEXES[index_key]
+    fts_table, base_table, columns = search_index_name(index_key, kind), spec["table"], spec["columns"]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    options = f"tokenize='{FTS_TOKENIZERS[kind]}'" + (f", prefix='{FTS_PREFIX_LENGTHS}'" if kind == "fts" else "")
+    delete_old = f"INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({column_list}, content='{base_table}', content_rowid='id', {options})",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {base_table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {base_table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {base_table} BEGIN {delete_old} {insert_new} END",
+    ]
+
+def ensure_search_indexes() -> set[str]:
+    """
+    Creates the FTS5 tables and sync triggers that don't exist yet, backfilling any new table
+    from its base table. Returns the kinds that are available ("fts", "trigram"); the trigram
+    tokenizer needs SQLite 3.34+, and neither exists on non-SQLite databases.
+    """
+    available: set[str] = set()
+    if engine.dialect.name != "sqlite":
+        return available
+    for kind in FTS_TOKENIZERS:
+        try:
+            with engine.begin() as connection:
+                for index_key in SEARCH_INDEXES:
+                    fts_table = search_index_name(index_key, kind)
+                    table_exists = connection.exec_driver_sql(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts_table,)
+                    ).first()
+                    for statement in _search_index_ddl(index_key, kind):
+                        connection.exec_driver_sql(statement)
+                    if not table_exists:
+                        connection.exec_driver_sql(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+                        print(f"Built search index {fts_table}.")
+            available.add(kind)
+        except Exception as e:
+            print(f"Warning: '{kind}' search index unavailable ({e}).")
+    search_index_kinds.update(available)
+    return available
+
+# --- Contact Backfill ---
+CONTACT_BACKFILL_CHUNK_ROWS = 5000
+
+def backfill_business_card_contacts() -> int:
+    """
+    Migration for cards stored before business_card_contacts existed: derives contact rows from
+    the JSON list columns of every card that has list values but no contacts yet. Safe to re-run;
+    startup runs it once per database (cards stored since get their contacts when written).
+    """
+    has_lists = or_(*((column.isnot(None)) & (column != "[]") for column in (BusinessCard.phone, BusinessCard.email, BusinessCard.website)))
+    missing_contacts = ~exists().where(BusinessCardContact.card_id == BusinessCard.id)
+    db = SessionLocal()
+    backfilled, last_id = 0, 0
+    try:
+        while True:
+            cards = (
+                db.query(BusinessCard.id, BusinessCard.phone, BusinessCard.email, BusinessCard.website)
+                .filter(BusinessCard.id > last_id, has_lists, missing_contacts)
+                .order_by(BusinessCard.id)
+                .limit(CONTACT_BACKFILL_CHUNK_ROWS)
+                .all()
+            )
+            if not cards:
+                break
+            contact_rows = []
+            for card_id, *json_lists in cards:
+                card_data = {}
+                for kind, stored in zip(CONTACT_KINDS, json_lists):
+                    try:
+                        card_data[kind] = json.loads(stored) if stored else None
+                    except (json.JSONDecodeError, TypeError):
+                        card_data[kind] = None
+                contact_rows.extend(business_card_contact_rows(card_id, card_data))
+            if contact_rows:
+                db.execute(insert(BusinessCardContact), contact_rows)
+            db.commit()
+            backfilled += len(cards)
+            last_id = cards[-1].id
+        if backfilled:
+            print(f"Backfilled contacts for {backfilled} business cards.")
+        return backfilled
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+# --- Visit Column Backfill ---
+VISIT_BACKFILL_CHUNK_ROWS = 5000
+VISIT_COLUMNS = ("visit_date", "time_in_at", "time_out_at", "duration_minutes")
+
+def backfill_visit_columns(reparse: bool = False) -> int:
+    """
+    Migration for entries stored before the typed visit columns existed: parses date_str / time_in /
+    time_out of every row that has raw values but no typed ones. Startup runs it once per database;
+    rows whose strings can't be read stay NULL rather than being rescanned on every boot.
+    reparse=True re-derives every row, e.g. after changing VISIT_DATE_FORMATS (python database.py
+    reparse-visits). Returns the number of rows updated.
+    """
+    typed = [getattr(VisitorLogEntry, name) for name in VISIT_COLUMNS]
+    unparsed = (
+        VisitorLogEntry.visit_date.is_(None) & VisitorLogEntry.time_in_at.is_(None) & VisitorLogEntry.time_out_at.is_(None)
+        & or_(VisitorLogEntry.date_str.isnot(None), VisitorLogEntry.time_in.isnot(None), VisitorLogEntry.time_out.isnot(None))
+    )
+    db = SessionLocal()
+    updated, last_id = 0, 0
+    try:
+        while True:
+            query = db.query(VisitorLogEntry.id, VisitorLogEntry.date_str, VisitorLogEntry.time_in, VisitorLogEntry.time_out, *typed)
+            query = query.filter(VisitorLogEntry.id > last_id)
+            if not reparse:
+                query = query.filter(unparsed)
+            rows = query.order_by(VisitorLogEntry.id).limit(VISIT_BACKFILL_CHUNK_ROWS).all()
+            if not rows:
+                break
+            changes = []
+            for row_id, date_str, time_in, time_out, *current in rows:
+                values = visit_columns({"date": date_str, "time_in": time_in, "time_out": time_out})
+                if [values[name] for name in VISIT_COLUMNS] != current:
+                    changes.append({"id": row_id, **values})
+            if changes:
+                db.execute(update(VisitorLogEntry), changes)
+                bump_table_versions(db, [VisitorLogEntry.__tablename__]) # Cached pages and ETags predate the new values
+            db.commit()
+            updated += len(changes)
+            last_id = rows[-1].id
+        if updated:
+            print(f"Backfilled visit date/time columns for {updated} visitor log entries.")
+        return updated
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def rebuild_rollups_now() -> dict:
+    """Recomputes the analytics rollups from the base tables (see analytics.rebuild_rollups)."""
+    from analytics import rebuild_rollups # analytics imports this module
+    db = SessionLocal()
+    try:
+        counts = rebuild_rollups(db)
+        print(f"Rebuilt analytics rollups: {counts}")
+        return counts
+    finally:
+        db.close()
+
 def get_db():
     """Dependency function to get a database session for FastAPI endpoints."""
     db = SessionLocal()
@@ -74,57 +463,207 @@ def get_db():
     finally:
         db.close()
 
+# --- Rollup Maintenance ---
+
+def new_rollup_deltas() -> dict:
+    return {"daily": {}, "hourly": Counter(), "visitors": {}}
+
+def _daily_bucket(deltas: dict, day: date) -> dict:
+    return deltas["daily"].setdefault(day, {"visits": 0, "cards": 0, "duration_minutes_total": 0, "duration_samples": 0})
+
+def accumulate_visitor_rollups(deltas: dict, stored_day: date, log_entries: list[dict], visit_days: list[date | None] | None = None):
+    """
+    Adds the rollup contribution of visitor entries (register-shaped dicts) stored on `stored_day`.
+    Each entry counts on its visit date: visit_days[i] when given (the parsed visit_date column),
+    else parsed from its "date"; stored_day when there is none.
+    """
+    if visit_days is None:
+        visit_days = [parse_visit_date(entry.get("date")) for entry in log_entries]
+    for entry, visit_day in zip(log_entries, visit_days):
+        day = visit_day or stored_day
+        daily = _daily_bucket(deltas, day)
+        daily["visits"] += 1
+        duration = visit_duration_minutes(entry.get("time_in"), entry.get("time_out"))
+        if duration is not None:
+            daily["duration_minutes_total"] += duration
+            daily["duration_samples"] += 1
+        arrival = parse_time_of_day(entry.get("time_in"))
+        if arrival is not None:
+            deltas["hourly"][(day, arrival.hour)] += 1
+        name = " ".join((entry.get("visitor_name") or "").split())
+        if name:
+            visitor = deltas["visitors"].setdefault(name.casefold(), {"visitor_name": name, "visits": 0, "last_visit_day": day})
+            visitor["visits"] += 1
+            if day >= visitor["last_visit_day"]:
+                visitor["visitor_name"], visitor["last_visit_day"] = name, day
+
+def accumulate_card_rollups(deltas: dict, day: date, card_count: int = 1):
+    _daily_bucket(deltas, day)["cards"] += card_count
+
+def apply_rollup_deltas(db: SessionLocal, deltas: dict):
+    """Upserts accumulated deltas into the rollup tables inside the caller's transaction."""
+    for day, counts in deltas["daily"].items():
+        stmt = sqlite_insert(DailyRollup).values(day=day, **counts)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["day"],
+            set_={column: getattr(DailyRollup, column) + stmt.excluded[column] for column in counts},
+        ))
+    for (day, hour), arrivals in deltas["hourly"].items():
+        stmt = sqlite_insert(HourlyRollup).values(day=day, hour=hour, arrivals=arrivals)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["day", "hour"],
+            set_={"arrivals": HourlyRollup.arrivals + stmt.excluded.arrivals},
+        ))
+    for key, visitor in deltas["visitors"].items():
+        stmt = sqlite_insert(VisitorRollup).values(visitor_key=key, **visitor)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["visitor_key"],
+            # Registers can be stored out of visit-date order: keep the latest day, and take the incoming
+            # spelling only when it is at least as recent (same rule as accumulate_visitor_rollups)
+            set_={
+                "visits": VisitorRollup.visits + stmt.excluded.visits,
+                "visitor_name": case(
+                    (or_(VisitorRollup.last_visit_day.is_(None), stmt.excluded.last_visit_day >= VisitorRollup.last_visit_day), stmt.excluded.visitor_name),
+                    else_=VisitorRollup.visitor_name,
+                ),
+                "last_visit_day": func.max(func.coalesce(VisitorRollup.last_visit_day, stmt.excluded.last_visit_day), stmt.excluded.last_visit_day),
+            },
+        ))
+
+def _utc_today() -> date:
+    # created_at defaults to SQLite CURRENT_TIMESTAMP, which is UTC
+    return datetime.now(timezone.utc).date()
+
 # --- Data Insertion Functions ---
 
-def add_business_card(db: SessionLocal, card_data: dict, filename: str | None = None):
-    """Adds a validated business card record to the database."""
-    try:
-        db_card = BusinessCard(
-            name=card_data.get("name"),
-            title=card_data.get("title"),
-            # Convert lists to JSON strings for storage
-            phone=json.dumps(card_data.get("phone")) if card_data.get("phone") is not None else None,
-            email=json.dumps(card_data.get("email")) if card_data.get("email") is not None else None,
-            website=json.dumps(card_data.get("website")) if card_data.get("website") is not None else None,
-            address=card_data.get("address"),
-            raw_json=json.dumps(card_data), # Store the whole validated dict
-            image_filename=filename
-        )
-        db.add(db_card)
-        db.commit()
-        db.refresh(db_card)
-        print(f"Successfully added Business Card ID: {db_card.id}")
-        return db_card
-    except Exception as e:
-        db.rollback()
-        print(f"Error adding business card to DB: {e}")
-        raise # Re-raise the exception to be caught by the endpoint handler
+def business_card_row(card_data: dict, filename: str | None = None) -> dict:
+    """Column values for one validated business card (lists are stored as JSON strings)."""
+    return {
+        "name": card_data.get("name"),
+        "title": card_data.get("title"),
+        # Convert lists to JSON strings for storage
+        "phone": json.dumps(card_data.get("phone")) if card_data.get("phone") is not None else None,
+        "email": json.dumps(card_data.get("email")) if card_data.get("email") is not None else None,
+        "website": json.dumps(card_data.get("website")) if card_data.get("website") is not None else None,
+        "address": card_data.get("address"),
+        "raw_json": json.dumps(card_data), # Store the whole validated dict
+        "image_filename": filename,
+    }
+
+CONTACT_KINDS = ("phone", "email", "website")
+
+def _normalize_contact(kind: str, value: str) -> tuple[str | None, str | None]:
+    if kind == "phone":
+        return normalize_phone(value), None
+    if kind == "email":
+        return normalize_email(value)
+    return normalize_website(value)
+
+def business_card_contact_rows(card_id: int, card_data: dict) -> list[dict]:
+    """business_card_contacts rows for a card's phone/email/website lists, in list order."""
+    rows = []
+    for kind in CONTACT_KINDS:
+        for position, value in enumerate(card_data.get(kind) or []):
+            if value is None or not str(value).strip():
+                continue
+            value = str(value).strip()
+            normalized, domain = _normalize_contact(kind, value)
+            rows.append({"card_id": card_id, "kind": kind, "position": position, "value": value, "normalized": normalized, "domain": domain})
+    return rows
+
+def visitor_log_rows(log_entries: list[dict], batch_id: str, filename: str | None = None) -> list[dict]:
+    """Column values for each validated visitor register entry of one batch."""
+    return [
+        {
+            "batch_id": batch_id,
+            "date_str": entry_data.get("date"), # Keep consistent naming
+            "visitor_name": entry_data.get("visitor_name"),
+            "address": entry_data.get("address"),
+            "time_in": entry_data.get("time_in"),
+            "time_out": entry_data.get("time_out"),
+            "raw_json_entry": json.dumps(entry_data), # Store JSON for this entry
+            "image_filename": filename,
+            **visit_columns(entry_data),
+        }
+        for entry_data in log_entries
+    ]
+
+def _insert_returning_ids(db: SessionLocal, model, rows: list[dict]) -> list[int]:
+    """
+    Set-based INSERT of many rows in one statement (multi-row VALUES via SQLAlchemy's
+    insertmanyvalues), returning the generated ids in the same order as `rows`.
+    """
+    if not rows:
+        return []
+    result = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars())
+
+def bump_table_versions(db: SessionLocal, table_names: list[str]):
+    """Marks tables as changed inside the caller's transaction, so the new version commits with the data."""
+    for table_name in table_names:
+        stmt = sqlite_insert(TableVersion).values(table_name=table_name, version=1)
+        db.execute(stmt.on_conflict_do_update(index_elements=["table_name"], set_={"version": TableVersion.version + 1}))
+
+def get_table_version(db: SessionLocal, table_name: str) -> int:
+    return db.query(TableVersion.version).filter(TableVersion.table_name == table_name).scalar() or 0
+
+def add_documents_bulk(db: SessionLocal, documents: list[dict]) -> list[dict]:
+    """
+    Stores many pre-validated documents in a single transaction with one set-based INSERT
+    per table. Each document is {"type": "business_card"|"visitor_register", "data": ..., "filename": ...}.
+    Returns one result per document, in input order. Any database error rolls back everything.
+    """
+    card_rows, card_positions = [], []
+    log_rows, log_positions = [], [] # log_positions: (document index, batch_id, entry count)
+    deltas = new_rollup_deltas()
+    today = _utc_today()
+
+    for index, document in enumerate(documents):
+        if document["type"] == "business_card":
+            card_rows.append(business_card_row(document["data"], document.get("filename")))
+            card_positions.append(index)
+            accumulate_card_rollups(deltas, today)
+        elif document["type"] == "visitor_register":
+            batch_id = str(uuid.uuid4())
+            rows = visitor_log_rows(document["data"], batch_id, document.get("filename"))
+            log_rows.extend(rows)
+            log_positions.append((index, batch_id, len(document["data"])))
+            accumulate_visitor_rollups(deltas, today, document["data"], [row["visit_date"] for row in rows])
 
-def add_visitor_log_entries(db: SessionLocal, log_entries: list[dict], batch_id: str, filename: str | None = None):
-    """Adds multiple validated visitor log entries to the database for a single batch."""
-    added_ids = []
     try:
-        for entry_data in log_entries:
-            db_entry = VisitorLogEntry(
-                batch_id=batch_id,
-                date_str=entry_data.get("date"), # Keep consistent naming
-                visitor_name=entry_data.get("visitor_name"),
-                address=entry_data.get("address"),
-                time_in=entry_data.get("time_in"),
-                time_out=entry_data.get("time_out"),
-                raw_json_entry=json.dumps(entry_data), # Store JSON for this entry
-                image_filename=filename
-            )
-            db.add(db_entry)
+        card_ids = _insert_returning_ids(db, BusinessCard, card_rows)
+        contact_rows = [
+            row
+            for card_id, index in zip(card_ids, card_positions)
+            for row in business_card_contact_rows(card_id, documents[index]["data"])
+        ]
+        if contact_rows:
+            db.execute(insert(BusinessCardContact), contact_rows)
+        log_ids = _insert_returning_ids(db, VisitorLogEntry, log_rows)
+        apply_rollup_deltas(db, deltas)
+        bump_table_versions(db, [model.__tablename__ for model, rows in ((BusinessCard, card_rows), (VisitorLogEntry, log_rows)) if rows])
         db.commit()
-        # Note: Refreshing multiple objects added in a loop isn't straightforward
-        # without querying them back. We'll just return the count or batch_id.
-        print(f"Successfully added {len(log_entries)} Visitor Log Entries for Batch ID: {batch_id}")
-        # Query back the added entries to get their IDs if needed (optional)
-        # added_records = db.query(VisitorLogEntry).filter(VisitorLogEntry.batch_id == batch_id).all()
-        # added_ids = [record.id for record in added_records]
-        return {"batch_id": batch_id, "entries_added": len(log_entries)} #, "ids": added_ids}
     except Exception as e:
         db.rollback()
-        print(f"Error adding visitor log entries to DB: {e}")
-        raise # Re-raise the exception
\ No newline at end of file
+        print(f"Error bulk-adding documents to DB: {e}")
+        raise
+
+    results: list[dict] = [{} for _ in documents]
+    for index, card_id in zip(card_positions, card_ids):
+        results[index] = {"type": "business_card", "database_id": card_id}
+    offset = 0
+    for index, batch_id, count in log_positions:
+        results[index] = {"type": "visitor_register", "batch_id": batch_id, "entries_added": count, "ids": log_ids[offset:offset + count]}
+        offset += count
+    log(f"Bulk stored {len(card_ids)} business cards and {len(log_ids)} visitor log entries.")
+    return results
+
+
+if __name__ == "__main__":
+    # python database.py reparse-visits: re-derive the typed visit columns, e.g. after changing VISIT_DATE_FORMATS
+    if sys.argv[1:] != ["reparse-visits"]:
+        print("Usage: python database.py reparse-visits")
+        sys.exit(1)
+    create_db_and_tables()
+    print(f"Re-parsed visit columns of {backfill_visit_columns(reparse=True)} visitor log entries.")
+    rebuild_rollups_now() # Visits are counted on their visit date, which may just have changed
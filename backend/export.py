@@ -0,0 +1,87 @@
+# export.py
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, time
+from typing import Any, Callable, Dict, Iterator
+
+from sqlalchemy.orm import Query
+
+from database import SessionLocal
+
+# --- Configuration ---
+EXPORT_CHUNK_ROWS = 2000 # Rows fetched per cursor round trip and written per response chunk
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+JSON_LIST_COLUMNS = {"phone", "email", "website"} # Stored as JSON text on business cards
+
+
+def _plain_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+def _export_rows(model, apply_filters: Callable[[Query], Query]) -> Iterator[tuple]:
+    """
+    Streams column tuples (no ORM objects) through a server-side cursor, EXPORT_CHUNK_ROWS
+    at a time. Opens its own session because it outlives the request handler.
+    """
+    db = SessionLocal()
+    try:
+        query = apply_filters(db.query(*model.__table__.columns)).order_by(model.id)
+        for row in query.yield_per(EXPORT_CHUNK_ROWS):
+            yield row
+    finally:
+        db.close()
+
+
+def _encode_chunks(model, rows: Iterator[tuple], export_format: str) -> Iterator[bytes]:
+    """Serializes rows into CSV (with header) or NDJSON, one bytes chunk per EXPORT_CHUNK_ROWS rows."""
+    column_names = [column.name for column in model.__table__.columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(column_names)
+
+    pending = 0
+    for row in rows:
+        if export_format == "csv":
+            writer.writerow([_plain_value(value) for value in row])
+        else:
+            record: Dict[str, Any] = {name: _plain_value(value) for name, value in zip(column_names, row)}
+            for key in JSON_LIST_COLUMNS.intersection(record):
+                if record[key]:
+                    try:
+                        record[key] = json.loads(record[key])
+                    except (json.JSONDecodeError, TypeError):
+                        pass # Export the stored text as-is
+            buffer.write(json.dumps(record))
+            buffer.write("\n")
+        pending += 1
+        if pending >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 -> gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(model, apply_filters: Callable[[Query], Query], export_format: str, gzip: bool = False) -> Iterator[bytes]:
+    """Constant-memory export of `model` rows matching `apply_filters`, as a byte stream."""
+    chunks = _encode_chunks(model, _export_rows(model, apply_filters), export_format)
+    return _gzip_chunks(chunks) if gzip else chunks
+
+
+def export_headers(table_name: str, export_format: str, gzip: bool) -> Dict[str, str]:
+    filename = f"{table_name}.{export_format}" + (".gz" if gzip else "")
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
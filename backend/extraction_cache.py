@@ -0,0 +1,151 @@
+# extraction_cache.py
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+from database import SessionLocal, ExtractionCacheEntry
+
+# --- Configuration ---
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+EXTRACTION_CACHE_PERSIST = os.getenv("EXTRACTION_CACHE_PERSIST", "true").lower() in ("1", "true", "yes")
+
+
+def hash_image(image_bytes: bytes) -> str:
+    """Returns the SHA-256 hex digest of the raw uploaded image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def make_cache_key(image_sha256: str, prompt_version: str, model_name: str) -> str:
+    """Combines image hash, prompt version and model into one content-addressed key."""
+    return hashlib.sha256(f"{model_name}|{prompt_version}|{image_sha256}".encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Two-tier cache of validated extraction results.
+    Tier 1 is an in-process LRU bounded by the total size of the stored JSON;
+    tier 2 is the `extraction_cache` SQLite table, which survives restarts.
+    """
+
+    def __init__(self, max_bytes: int, persist: bool = True):
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self._entries: "OrderedDict[str, tuple[str, str]]" = OrderedDict() # key -> (image_sha256, json)
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    # --- Memory tier ---
+
+    def _remember(self, key: str, image_sha256: str, payload: str):
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= len(self._entries.pop(key)[1])
+            if len(payload) > self.max_bytes:
+                return # Never let a single oversized result flush the whole tier
+            self._entries[key] = (image_sha256, payload)
+            self._current_bytes += len(payload)
+            while self._current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    # --- Public API ---
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        """Returns the cached result for `key`, checking memory first, then SQLite."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return json.loads(entry[1])
+
+        if self.persist:
+            db = SessionLocal()
+            try:
+                row = db.get(ExtractionCacheEntry, key)
+            except Exception as e:
+                print(f"Warning: extraction cache lookup failed: {e}")
+                row = None
+            finally:
+                db.close()
+            if row is not None:
+                self._remember(key, row.image_sha256, row.result_json)
+                with self._lock:
+                    self.stats["persistent_hits"] += 1
+                return json.loads(row.result_json)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, image_sha256: str, prompt_version: str, model_name: str, result: Dict[str, Any]):
+        """Stores a validated extraction result in both tiers. Failures are logged, never raised."""
+        payload = json.dumps(result)
+        self._remember(key, image_sha256, payload)
+        with self._lock:
+            self.stats["stores"] += 1
+        if not self.persist:
+            return
+        db = SessionLocal()
+        try:
+            db.merge(ExtractionCacheEntry(
+                cache_key=key,
+                image_sha256=image_sha256,
+                prompt_version=prompt_version,
+                model_name=model_name,
+                result_json=payload,
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Warning: could not persist extraction cache entry: {e}")
+        finally:
+            db.close()
+
+    def invalidate(self, image_sha256: str | None = None) -> int:
+        """
+        Drops cached results for one image hash (any prompt/model), or everything when
+        `image_sha256` is None. Returns the number of persistent rows removed.
+        """
+        removed = 0
+        if self.persist:
+            db = SessionLocal()
+            try:
+                query = db.query(ExtractionCacheEntry)
+                if image_sha256:
+                    query = query.filter(ExtractionCacheEntry.image_sha256 == image_sha256)
+                removed = query.delete(synchronize_session=False)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        with self._lock:
+            if image_sha256 is None:
+                self._entries.clear()
+                self._current_bytes = 0
+            else:
+                for key in [k for k, (sha, _) in self._entries.items() if sha == image_sha256]:
+                    self._current_bytes -= len(self._entries.pop(key)[1])
+        return removed
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and memory-tier occupancy."""
+        with self._lock:
+            return {
+                **self.stats,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._current_bytes,
+                "memory_max_bytes": self.max_bytes,
+                "persistent": self.persist,
+            }
+
+
+extraction_cache = ExtractionCache(EXTRACTION_CACHE_MAX_BYTES, persist=EXTRACTION_CACHE_PERSIST)
@@ -0,0 +1,293 @@
+# jobs.py
+
+import os
+import json
+import uuid
+import socket
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import HTTPException, status
+from sqlalchemy import or_
+
+from database import SessionLocal, ExtractionJob, run_in_db_thread
+from metrics import trace
+
+# --- Configuration ---
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_EVENTS_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_EVENTS_POLL_INTERVAL_SECONDS", "1.0"))
+JOB_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("JOB_HEARTBEAT_INTERVAL_SECONDS", "10"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60")) # A running job whose lease is older than this is re-queued
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# Runner signature: (image_bytes, mime_type) -> validated {"type": ..., "data": ...}
+JobRunner = Callable[[bytes, str], Awaitable[Dict[str, Any]]]
+
+
+def job_to_dict(job: ExtractionJob) -> Dict[str, Any]:
+    """Public view of a job; the stored image is never returned."""
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "attempts": job.attempts,
+        "result": json.loads(job.result_json) if job.result_json else None,
+        "error": {"status_code": job.error_status_code, "detail": job.error_detail} if job.status == JOB_FAILED else None,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class JobManager:
+    """
+    In-process worker pool for extraction jobs persisted in the `extraction_jobs` table.
+    Job ids flow through an asyncio.Queue; the table is the source of truth.
+
+    Several processes (uvicorn workers, or old and new ones during a rolling restart) can share
+    the table, so a running job is leased: it records the claiming process's worker_id, and that
+    process renews heartbeat_at every JOB_HEARTBEAT_INTERVAL_SECONDS. Only jobs whose lease is
+    older than JOB_LEASE_SECONDS (their process died) are moved back to 'queued'.
+    """
+
+    def __init__(self, worker_count: int):
+        self.worker_count = worker_count
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._heartbeat_task: asyncio.Task | None = None
+        self._runner: JobRunner | None = None
+        self._listeners: Dict[str, set[asyncio.Event]] = {} # job id -> events of waiting SSE streams
+
+    # --- Lifecycle ---
+
+    async def start(self, runner: JobRunner):
+        """Recovers interrupted jobs and starts the workers. Call once at app startup."""
+        self._runner = runner
+        self._queue = asyncio.Queue()
+        for job_id in await run_in_db_thread(self._recover_jobs):
+            self._queue.put_nowait(job_id)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        print(f"Job manager {self.worker_id} started with {self.worker_count} workers, {self._queue.qsize()} jobs queued.")
+
+    async def stop(self):
+        tasks = self._workers + ([self._heartbeat_task] if self._heartbeat_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers, self._heartbeat_task = [], None
+        # Hand interrupted jobs back right away instead of making them wait for the lease to expire
+        await run_in_db_thread(self._release_jobs)
+
+    def _recover_jobs(self, include_queued: bool = True) -> list[str]:
+        """
+        Moves running jobs with an expired lease back to 'queued' and returns their ids, followed
+        (with include_queued) by every other queued id, oldest first.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=JOB_LEASE_SECONDS)
+        expired_lease = (
+            (ExtractionJob.status == JOB_RUNNING)
+            # Jobs claimed before leases existed have no heartbeat; their start time stands in for it
+            & or_(ExtractionJob.heartbeat_at < cutoff, ExtractionJob.heartbeat_at.is_(None) & (ExtractionJob.started_at < cutoff))
+        )
+        db = SessionLocal()
+        try:
+            expired = [row.id for row in db.query(ExtractionJob.id).filter(expired_lease).order_by(ExtractionJob.created_at).all()]
+            if expired:
+                recovered = db.query(ExtractionJob).filter(ExtractionJob.id.in_(expired), expired_lease).update(
+                    {ExtractionJob.status: JOB_QUEUED, ExtractionJob.started_at: None, ExtractionJob.worker_id: None, ExtractionJob.heartbeat_at: None},
+                    synchronize_session=False,
+                )
+                db.commit()
+                if recovered:
+                    print(f"Re-queued {recovered} extraction jobs whose worker stopped renewing its lease.")
+            if not include_queued:
+                return expired # Another process may have re-queued some first; claiming sorts that out
+            rows = db.query(ExtractionJob.id).filter(ExtractionJob.status == JOB_QUEUED).order_by(ExtractionJob.created_at).all()
+            return [row.id for row in rows]
+        finally:
+            db.close()
+
+    def _renew_leases(self) -> int:
+        db = SessionLocal()
+        try:
+            renewed = db.query(ExtractionJob).filter(ExtractionJob.status == JOB_RUNNING, ExtractionJob.worker_id == self.worker_id).update(
+                {ExtractionJob.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False
+            )
+            db.commit()
+            return renewed
+        finally:
+            db.close()
+
+    def _release_jobs(self):
+        db = SessionLocal()
+        try:
+            released = db.query(ExtractionJob).filter(ExtractionJob.status == JOB_RUNNING, ExtractionJob.worker_id == self.worker_id).update(
+                {ExtractionJob.status: JOB_QUEUED, ExtractionJob.started_at: None, ExtractionJob.worker_id: None, ExtractionJob.heartbeat_at: None},
+                synchronize_session=False,
+            )
+            db.commit()
+            if released:
+                print(f"Released {released} interrupted extraction jobs for another worker.")
+        finally:
+            db.close()
+
+    async def _heartbeat(self):
+        """Renews this process's leases, and picks up jobs abandoned by processes that died since startup."""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL_SECONDS)
+            try:
+                await run_in_db_thread(self._renew_leases)
+                for job_id in await run_in_db_thread(self._recover_jobs, False):
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                print(f"Job manager: lease heartbeat failed: {e}")
+
+    # --- Submission & Lookup ---
+
+    async def submit(self, image_bytes: bytes, mime_type: str, filename: str | None = None) -> Dict[str, Any]:
+        """Persists a new job and hands it to the workers. Returns without waiting for the extraction."""
+        if self._queue is None:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Job workers are not running.")
+        view = await run_in_db_thread(self._insert_job, image_bytes, mime_type, filename)
+        self._queue.put_nowait(view["job_id"])
+        return view
+
+    async def get(self, job_id: str) -> Dict[str, Any] | None:
+        return await run_in_db_thread(self._load_job, job_id)
+
+    def _insert_job(self, image_bytes: bytes, mime_type: str, filename: str | None) -> Dict[str, Any]:
+        db = SessionLocal()
+        try:
+            job = ExtractionJob(id=str(uuid.uuid4()), status=JOB_QUEUED, filename=filename, mime_type=mime_type, image_data=image_bytes)
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            view = job_to_dict(job)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return view
+
+    def _load_job(self, job_id: str) -> Dict[str, Any] | None:
+        db = SessionLocal()
+        try:
+            job = db.get(ExtractionJob, job_id)
+            return job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def wait_for_change(self, job_id: str, timeout: float = JOB_EVENTS_POLL_INTERVAL_SECONDS):
+        """
+        Waits until this process updates the job or `timeout` elapses. The timeout keeps
+        SSE streams correct when the job is being run by another worker process.
+        """
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            listeners = self._listeners.get(job_id)
+            if listeners is not None:
+                listeners.discard(event)
+                if not listeners:
+                    del self._listeners[job_id]
+
+    def _notify(self, job_id: str):
+        for event in self._listeners.get(job_id, ()):
+            event.set()
+
+    # --- Workers ---
+
+    def _claim(self, job_id: str) -> ExtractionJob | None:
+        """Atomically flips a queued job to running, leased to this process, so only one worker (or process) runs it."""
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            claimed = db.query(ExtractionJob).filter(ExtractionJob.id == job_id, ExtractionJob.status == JOB_QUEUED).update(
+                {
+                    ExtractionJob.status: JOB_RUNNING,
+                    ExtractionJob.started_at: now,
+                    ExtractionJob.attempts: ExtractionJob.attempts + 1,
+                    ExtractionJob.worker_id: self.worker_id,
+                    ExtractionJob.heartbeat_at: now,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            if not claimed:
+                return None
+            job = db.get(ExtractionJob, job_id)
+            db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str, result: Dict[str, Any] | None = None, error_status_code: int | None = None, error_detail: str | None = None):
+        db = SessionLocal()
+        try:
+            # Only while this process still holds the lease; if it lapsed, the job was handed to another worker
+            finished = db.query(ExtractionJob).filter(
+                ExtractionJob.id == job_id, ExtractionJob.status == JOB_RUNNING, ExtractionJob.worker_id == self.worker_id
+            ).update(
+                {
+                    ExtractionJob.status: JOB_SUCCEEDED if result is not None else JOB_FAILED,
+                    ExtractionJob.result_json: json.dumps(result) if result is not None else None,
+                    ExtractionJob.error_status_code: error_status_code,
+                    ExtractionJob.error_detail: error_detail,
+                    ExtractionJob.image_data: None, # Free the stored upload once it can no longer be re-run
+                    ExtractionJob.finished_at: datetime.now(timezone.utc),
+                    ExtractionJob.worker_id: None,
+                    ExtractionJob.heartbeat_at: None,
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            if not finished:
+                print(f"Job {job_id}: lease lost before the result was saved; another worker owns it now.")
+        finally:
+            db.close()
+
+    async def _worker(self, worker_index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await run_in_db_thread(self._claim, job_id)
+                if job is None:
+                    continue # Already claimed elsewhere or no longer queued
+                self._notify(job_id)
+                try:
+                    with trace(job_id): # The extraction's log lines and timings carry the job id
+                        result = await self._runner(job.image_data, job.mime_type)
+                    await run_in_db_thread(self._finish, job_id, result=result)
+                except HTTPException as e:
+                    await run_in_db_thread(self._finish, job_id, error_status_code=e.status_code, error_detail=str(e.detail))
+                except asyncio.CancelledError:
+                    raise # Shutdown: stop() releases the job back to 'queued'
+                except Exception as e:
+                    print(f"Job worker {worker_index}: unexpected error on job {job_id}: {e}")
+                    await run_in_db_thread(self._finish, job_id, error_status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, error_detail=f"Unexpected error: {e}")
+                self._notify(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker {worker_index}: failed to process job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+job_manager = JobManager(JOB_WORKERS)
@@ -0,0 +1,436 @@
+# llm_scheduler.py
+"""
+Rate-limit-aware scheduling of Groq chat completions.
+
+Every call goes through three gates before it is sent:
+  1. an AIMD concurrency limit (grows by ~1 per window of successes, halves on a 429/503),
+  2. per-key token buckets for requests and tokens per minute, and
+  3. a per-key pause set from Retry-After / x-ratelimit-* headers.
+With several API keys the call goes to whichever key can send soonest. 429s, 5xx and connection
+errors are retried with jittered exponential backoff (or exactly the Retry-After the server asked for).
+"""
+
+import asyncio
+import email.utils
+import inspect
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Dict, List, Tuple
+
+from groq import AsyncGroq, APIConnectionError, APIStatusError
+
+from metrics import log
+
+# --- Configuration ---
+# Comma-separated keys to spread load across; falls back to the single GROQ_API_KEY.
+GROQ_API_KEYS = [key.strip() for key in os.getenv("GROQ_API_KEYS", os.getenv("GROQ_API_KEY") or "").split(",") if key.strip()]
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None # e.g. http://127.0.0.1:8081 for benchmarks/stub_groq_server.py
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))  # per key
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))   # per key
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+# Rough prompt cost of one attached image, used until the response reports real usage
+LLM_IMAGE_TOKEN_ESTIMATE = int(os.getenv("LLM_IMAGE_TOKEN_ESTIMATE", "1500"))
+
+THROTTLE_STATUS_CODES = (429, 503)
+_DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class LLMCapacityTimeout(Exception):
+    """No concurrency slot or rate-limit budget became free within the queue timeout."""
+
+
+# --- Header Parsing ---
+
+def parse_duration_seconds(value: str | None) -> float | None:
+    """Groq reset durations ('2m59.56s', '7.66s', '120ms') or plain seconds ('12')."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def parse_retry_after(headers) -> float | None:
+    """Seconds to wait from retry-after-ms, or retry-after as seconds or an HTTP date."""
+    if headers is None:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    seconds = parse_duration_seconds(retry_after)
+    if seconds is not None:
+        return seconds
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_request_tokens(completion_kwargs: Dict[str, Any]) -> int:
+    """Prompt text at ~4 characters per token, a flat cost per image, plus the completion budget."""
+    characters, images = 0, 0
+    for message in completion_kwargs.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            characters += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                characters += len(part.get("text") or "")
+    return characters // 4 + images * LLM_IMAGE_TOKEN_ESTIMATE + int(completion_kwargs.get("max_tokens") or 1024)
+
+
+# --- Limiters ---
+
+class TokenBucket:
+    """Refills continuously up to `capacity`; a per-minute limit is TokenBucket(limit, limit / 60)."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float):
+        """Consumes tokens; callers check wait_time() first. May go negative when reconciling actual usage."""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def cap(self, remaining: float):
+        """Trusts the server's remaining budget when it is lower than ours."""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit that grows by one per `limit` successful calls and halves on throttling.
+    Only calls started after the last decrease can trigger another one, so a burst of 429s
+    from the same overloaded moment halves the limit once rather than collapsing it.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.decreases = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Waits for a free slot; returns the start time to pass back to on_throttle()."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, started_at: float):
+        if started_at < self.last_decrease:
+            return
+        self.limit = max(float(self.minimum), self.limit / 2)
+        self.last_decrease = time.monotonic()
+        self.decreases += 1
+
+
+# --- Keys ---
+
+class ApiKeySlot:
+    """One API key: its client, its own RPM/TPM buckets and any pause the server asked for."""
+
+    def __init__(self, name: str, client: Any, requests_per_minute: float, tokens_per_minute: float):
+        self.name = name
+        self.client = client
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.paused_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def wait_time(self, estimated_tokens: int) -> float:
+        return max(self.paused_until - time.monotonic(), self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+
+    def reserve(self, estimated_tokens: int):
+        self.requests.take(1)
+        self.tokens.take(estimated_tokens)
+
+    def refund(self, estimated_tokens: int):
+        """Returns a reservation's tokens when the request failed without being throttled."""
+        self.tokens.give_back(estimated_tokens)
+
+    def pause_for(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def apply_rate_limit_headers(self, headers):
+        """Syncs the buckets with x-ratelimit-remaining-* and pauses the key when a budget is spent."""
+        if headers is None:
+            return
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            bucket.cap(remaining)
+            reset_seconds = parse_duration_seconds(headers.get(f"x-ratelimit-reset-{kind}"))
+            if remaining <= 0 and reset_seconds:
+                # Reset is when the whole budget is back; the next unit returns after reset / limit
+                try:
+                    limit = float(headers.get(f"x-ratelimit-limit-{kind}") or 0)
+                except ValueError:
+                    limit = 0
+                self.pause_for(reset_seconds / limit if limit > 1 else reset_seconds)
+
+
+# --- Scheduler ---
+
+class _SlotHoldingStream:
+    """
+    Wraps a streamed completion so the concurrency slot is released when the stream is
+    exhausted, fails or is closed. Retries only cover the request itself, not a broken stream.
+    """
+
+    def __init__(self, stream: Any, release):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._release = release
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None and inspect.isawaitable(closing := close()):
+                await closing
+        finally:
+            await release()
+
+
+
+class LLMScheduler:
+    """Drop-in for `client.chat.completions.create` across one or more keys."""
+
+    def __init__(
+        self,
+        clients: List[Tuple[str, Any]],
+        max_concurrency: int,
+        queue_timeout_seconds: float,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_attempts = max(1, max_attempts)
+        self.limiter = AIMDLimiter(max_concurrency, LLM_MIN_CONCURRENCY, max_concurrency)
+        self.slots: List[ApiKeySlot] = []
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failed": 0, "queue_timeouts": 0}
+        self._latencies: deque = deque(maxlen=1000)
+        self.replace_clients(clients)
+
+    @classmethod
+    def from_api_keys(cls, api_keys: List[str], base_url: str | None, timeout_seconds: float, **kwargs) -> "LLMScheduler":
+        # The SDK's own retries would hide 429s from the scheduler, so they are turned off
+        clients = [
+            (f"key-{index + 1}...{api_key[-4:]}", AsyncGroq(api_key=api_key, base_url=base_url, timeout=timeout_seconds, max_retries=0))
+            for index, api_key in enumerate(api_keys)
+        ]
+        return cls(clients, **kwargs)
+
+    def replace_clients(self, clients: List[Tuple[str, Any]]):
+        """Swaps the key pool (benchmarks use this to plug in a stub client)."""
+        self.slots = [ApiKeySlot(name, client, self.requests_per_minute, self.tokens_per_minute) for name, client in clients]
+
+    @property
+    def available(self) -> bool:
+        return bool(self.slots)
+
+    async def _admit(self, estimated_tokens: int) -> Tuple[ApiKeySlot, float]:
+        """Concurrency slot first, then the key that can send soonest. Holds the slot on return."""
+        started_at = await self.limiter.acquire()
+        try:
+            while True:
+                slot = min(self.slots, key=lambda candidate: candidate.wait_time(estimated_tokens))
+                wait = slot.wait_time(estimated_tokens)
+                if wait <= 0:
+                    slot.reserve(estimated_tokens)
+                    return slot, started_at
+                await asyncio.sleep(wait)
+        except BaseException:
+            await self.limiter.release()
+            raise
+
+    def _backoff_seconds(self, attempt: int) -> float:
+        """Full jitter: uniform between 0 and the capped exponential delay."""
+        return random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    async def create(self, **completion_kwargs):
+        """
+        Sends one chat completion, retrying throttling and transient failures.
+        Raises LLMCapacityTimeout if no budget frees up within the queue timeout,
+        or the last Groq error once attempts are exhausted (non-retryable errors immediately).
+        """
+        estimated_tokens = estimate_request_tokens(completion_kwargs)
+        call_started = time.monotonic()
+        self.stats["calls"] += 1
+        for attempt in range(self.max_attempts):
+            try:
+                slot, started_at = await asyncio.wait_for(self._admit(estimated_tokens), timeout=self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                self.stats["queue_timeouts"] += 1
+                raise LLMCapacityTimeout("Extraction capacity exhausted, please retry shortly.")
+            slot.stats["requests"] += 1
+            delay = None
+            holds_slot = False
+            try:
+                completion, headers = await self._send(slot, completion_kwargs)
+            except APIStatusError as e:
+                headers = getattr(e.response, "headers", None)
+                if e.status_code not in THROTTLE_STATUS_CODES:
+                    slot.refund(estimated_tokens) # Before the headers, so the server's remaining budget wins
+                slot.apply_rate_limit_headers(headers)
+                if e.status_code not in THROTTLE_STATUS_CODES and e.status_code < 500:
+                    slot.stats["errors"] += 1
+                    self.stats["failed"] += 1
+                    raise
+                if e.status_code in THROTTLE_STATUS_CODES:
+                    slot.stats["throttled"] += 1
+                    self.stats["throttled"] += 1
+                    self.limiter.on_throttle(started_at)
+                    retry_after = parse_retry_after(headers)
+                    if retry_after is not None:
+                        # Honour the server's pause exactly (plus a little jitter so waiters don't stampede)
+                        delay = retry_after + random.uniform(0, min(1.0, retry_after * 0.1))
+                        slot.pause_for(delay)
+                else:
+                    slot.stats["errors"] += 1
+                last_error = e
+            except APIConnectionError as e: # Includes timeouts
+                slot.refund(estimated_tokens)
+                slot.stats["errors"] += 1
+                last_error = e
+            else:
+                self.limiter.on_success()
+                self._reconcile(slot, estimated_tokens, completion, headers)
+                self._latencies.append(time.monotonic() - call_started) # Includes queueing and retries
+                if completion_kwargs.get("stream"):
+                    # The body is still being generated; keep the slot until the caller is done reading
+                    holds_slot = True
+                    return _SlotHoldingStream(completion, self.limiter.release)
+                return completion
+            finally:
+                if not holds_slot:
+                    await self.limiter.release()
+
+            if attempt + 1 >= self.max_attempts:
+                break
+            self.stats["retries"] += 1
+            if delay is None:
+                delay = self._backoff_seconds(attempt)
+            log(f"LLM call via {slot.name} failed ({last_error.__class__.__name__}); retry {attempt + 1} in {delay:.2f}s.")
+            await asyncio.sleep(delay)
+
+        self.stats["failed"] += 1
+        raise last_error
+
+    async def _send(self, slot: ApiKeySlot, completion_kwargs: Dict[str, Any]):
+        """Returns (completion, response headers); headers are None for clients without raw responses (stubs)."""
+        raw_api = getattr(slot.client.chat.completions, "with_raw_response", None)
+        if raw_api is None:
+            return await slot.client.chat.completions.create(**completion_kwargs), None
+        raw = await raw_api.create(**completion_kwargs)
+        return await raw.parse(), raw.headers
+
+    def _reconcile(self, slot: ApiKeySlot, estimated_tokens: int, completion, headers):
+        """Replaces the token estimate with the reported usage, then syncs with the server's view."""
+        usage = getattr(completion, "usage", None)
+        total_tokens = getattr(usage, "total_tokens", None)
+        if total_tokens is not None:
+            slot.stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            slot.stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+            difference = estimated_tokens - total_tokens
+            if difference > 0:
+                slot.tokens.give_back(difference)
+            else:
+                slot.tokens.take(-difference)
+        slot.apply_rate_limit_headers(headers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        latencies = sorted(self._latencies)
+        return {
+            **self.stats,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.limiter.in_flight,
+            "concurrency_decreases": self.limiter.decreases,
+            "call_latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "call_latency_p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else None,
+            "keys": [
+                {
+                    "name": slot.name,
+                    **slot.stats,
+                    "paused_for_seconds": round(max(0.0, slot.paused_until - now), 2),
+                    "request_budget": round(slot.requests.tokens, 1),
+                    "token_budget": round(slot.tokens.tokens, 1),
+                }
+                for slot in self.slots
+            ],
+        }
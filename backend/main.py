@@ -1,42 +1,90 @@
 # backend/main.py
 
 import os
+import asyncio
 import base64
 import json
-import uuid
-from typing import Dict, List, Any, Union # Added Union
+import zipfile
+import functools
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Dict, List, Any, Union, Callable, Awaitable, Tuple # Added Union
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, status, Depends, Body
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, status, Depends, Body, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware # Import CORS
-from groq import Groq, GroqError
+from groq import GroqError, RateLimitError
 from dotenv import load_dotenv
 import mimetypes
 from sqlalchemy.orm import Session
 from pydantic import BaseModel # For request body validation
 
+load_dotenv() # Load before local modules so their module-level config sees .env values
+
 # Import database setup, models, and functions
 import database
-from database import SessionLocal, engine, get_db, add_business_card, add_visitor_log_entries
+from database import SessionLocal, engine, get_db, run_in_db_thread, add_documents_bulk, get_table_version
 
 # Import validation functions
-from validation import validate_business_card_data, validate_visitor_register_data
+from validation import validate_business_card_data, validate_visitor_register_data, repair_and_validate_llm_output, validation_failure_reason
+from extraction_cache import extraction_cache, hash_image, make_cache_key
+from jobs import job_manager, FINISHED_STATUSES
+from serialization import projected_columns, business_card_dicts, visitor_log_dicts, load_dicts_by_id, encode_body, wants_msgpack
+from response_cache import response_cache, CachedPage, make_etag, etag_matches
+from search import search_records, SearchUnavailable, DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from writer import group_writer, WRITE_BEHIND_ENABLED
+from streaming import IncrementalExtractionParser, check_streamed_entry
+from llm_scheduler import LLMScheduler, LLMCapacityTimeout, GROQ_API_KEYS, GROQ_BASE_URL, parse_retry_after
+import preprocessing
+import tiling
+import metrics
+from metrics import log, preview, stage, db_operation, observe_llm_call
+from uploads import (UploadSizeLimitMiddleware, read_upload_limited, MAX_UPLOAD_BYTES,
+                     MAX_BATCH_UPLOAD_BYTES, MULTIPART_OVERHEAD_BYTES)
 
 # --- Initial Setup ---
 database.create_db_and_tables()
-load_dotenv()
 
 # --- Configuration ---
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
 MAX_RETRIES = 3
+# After local repair fails, ask once per attempt for a text-only fix of the JSON before re-sending the image.
+LLM_REPAIR_PROMPT_ENABLED = os.getenv("LLM_REPAIR_PROMPT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Bump whenever the extraction/reflection prompts change so cached results are not reused.
+PROMPT_VERSION = "1"
+# What the LLM actually sees depends on the prompt, image preprocessing and tiling; all key the cache.
+EXTRACTION_PIPELINE_VERSION = f"{PROMPT_VERSION}/{preprocessing.config_signature()}/{tiling.config_signature()}"
+# Global cap on in-flight LLM calls for this worker; extra requests queue for a slot.
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "4"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+DISCONNECT_POLL_INTERVAL_SECONDS = 0.5
+# Parallel extractions per batch request (still subject to MAX_CONCURRENT_LLM_CALLS overall).
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", str(MAX_CONCURRENT_LLM_CALLS)))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BULK_STORE_MAX_DOCUMENTS = int(os.getenv("BULK_STORE_MAX_DOCUMENTS", "1000"))
+ALLOWED_IMAGE_MIME_TYPES = ["image/jpeg", "image/png", "image/webp"]
+ALLOWED_DOCUMENT_MIME_TYPES = ALLOWED_IMAGE_MIME_TYPES + tiling.MULTI_PAGE_MIME_TYPES
+ZIP_MIME_TYPES = ["application/zip", "application/x-zip-compressed"]
 
 
 # --- FastAPI App Initialization ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background extraction workers live for the lifetime of the app
+    await job_manager.start(run_extraction_job)
+    if WRITE_BEHIND_ENABLED:
+        group_writer.start()
+    yield
+    await job_manager.stop()
+    await asyncio.to_thread(group_writer.stop) # Drain queued writes before exit
+
+
 app = FastAPI(
     title="Image Data Extractor API with DB Storage",
     description="Extracts info from images, allows user validation via frontend, and stores data.",
-    version="1.3.0" # Version bump
+    version="1.3.0", # Version bump
+    lifespan=lifespan
 )
 
 # --- CORS Middleware ---
@@ -53,40 +101,119 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Allows all methods (GET, POST, etc.)
     allow_headers=["*"], # Allows all headers
+    expose_headers=["X-Next-Cursor", "ETag", "X-Request-ID", "Server-Timing"], # Let the browser read the pagination cursor and page version
 )
 
+# --- Upload Size Limits ---
+# Oversized bodies are refused before multipart parsing spools them to disk.
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    limits={
+        "/extract_validate/": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/extract_validate/stream/": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/jobs/extract/": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/extract_validate/batch/": MAX_BATCH_UPLOAD_BYTES,
+    },
+)
+
+# --- Tracing & Metrics ---
+# Outermost, so request timings include upload limiting and CORS; see metrics.py.
+app.add_middleware(metrics.TraceMiddleware)
+
 
 # --- Groq Client Initialization ---
-# (Keep the existing Groq client initialization logic)
-if not GROQ_API_KEY:
+# All calls go through the scheduler: AIMD concurrency (at most MAX_CONCURRENT_LLM_CALLS), per-key
+# RPM/TPM budgets, Retry-After handling and backoff, spread across GROQ_API_KEYS.
+if not GROQ_API_KEYS:
     print("Error: GROQ_API_KEY environment variable not set.")
-    groq_client = None
-else:
-    try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    except Exception as e:
-        print(f"Error initializing Groq client: {e}")
-        groq_client = None
+try:
+    llm_scheduler = LLMScheduler.from_api_keys(
+        GROQ_API_KEYS,
+        GROQ_BASE_URL,
+        LLM_REQUEST_TIMEOUT_SECONDS,
+        max_concurrency=MAX_CONCURRENT_LLM_CALLS,
+        queue_timeout_seconds=LLM_QUEUE_TIMEOUT_SECONDS,
+    )
+    print(f"LLM scheduler ready with {len(llm_scheduler.slots)} API key(s).")
+except Exception as e:
+    print(f"Error initializing Groq client: {e}")
+    llm_scheduler = LLMScheduler([], max_concurrency=MAX_CONCURRENT_LLM_CALLS, queue_timeout_seconds=LLM_QUEUE_TIMEOUT_SECONDS)
+
+preprocess_semaphore = asyncio.Semaphore(preprocessing.IMAGE_PREPROCESS_CONCURRENCY)
 
 # --- Helper Function ---
 def encode_image_to_base64(image_bytes: bytes) -> str:
     return base64.b64encode(image_bytes).decode('utf-8')
 
 
-# --- Shared Extraction & Validation Logic ---
-async def perform_extraction_and_validation(
-    image_bytes: bytes,
-    image_mime_type: str,
-    base64_image: str
-) -> Dict[str, Any]:
+def build_image_data_url(image_bytes: bytes, image_mime_type: str) -> str:
+    """Builds the data URL sent to the LLM. Built once per extraction and reused on every retry."""
+    return f"data:{image_mime_type};base64,{encode_image_to_base64(image_bytes)}"
+
+
+def resolve_upload_mime_type(filename: str | None, content_type: str | None) -> str | None:
+    """Prefers the client-declared content type, falling back to the file extension."""
+    guessed_mime_type, _ = mimetypes.guess_type(filename or "")
+    return content_type or guessed_mime_type
+
+
+async def create_llm_completion(**completion_kwargs):
     """
-    Handles the core logic of calling Groq, parsing, validating, and retrying.
-    Returns the validated data structure or raises HTTPException on failure.
+    Runs a single chat completion through the LLM scheduler (rate limits, retries, concurrency cap).
+    Gives up with a 503 if no capacity frees up within LLM_QUEUE_TIMEOUT_SECONDS or the provider
+    keeps throttling after every retry.
     """
-    if not groq_client:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Groq client unavailable.")
+    try:
+        return await llm_scheduler.create(**completion_kwargs)
+    except LLMCapacityTimeout as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except RateLimitError as e:
+        retry_after = parse_retry_after(getattr(e.response, "headers", None))
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="LLM provider rate limit reached, please retry shortly.",
+            headers={"Retry-After": str(max(1, round(retry_after)))} if retry_after else None,
+        )
+
+
+async def run_until_disconnected(request: Request, coro):
+    """
+    Awaits `coro` as a task, cancelling it if the client disconnects first
+    so abandoned uploads stop holding LLM slots.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                log("Client disconnected, cancelling extraction.")
+                task.cancel()
+                # 499 (client closed request); nobody is listening for the response anyway.
+                raise HTTPException(status_code=499, detail="Client closed request.")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# --- Shared Extraction & Validation Logic ---
+class ExtractionTruncated(HTTPException):
+    """The answer hit max_tokens; the same image would be cut off again, so it has to be tiled instead."""
+
+    def __init__(self, tiles: int = 1):
+        if tiles < tiling.TILE_MAX_BANDS:
+            advice = f"Retry with tiles={min(tiling.TILE_MAX_BANDS, max(2, tiles * 2))}."
+        else:
+            advice = f"It is still too dense at the maximum of {tiling.TILE_MAX_BANDS} tiles per page; upload it as smaller images."
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"The LLM response was cut off at the output token limit (the page is too dense for one call). {advice}"
+        )
+
 
-    base_prompt_text = """
+# Sent with the image on the first attempt (and on streamed extractions)
+EXTRACTION_PROMPT = """
     Analyze the provided image. First, determine if it is primarily a 'business_card' or a 'visitor_register'.
     Then, extract the relevant information based on the identified type and structure the output STRICTLY as a JSON object.
 
@@ -97,14 +224,75 @@ async def perform_extraction_and_validation(
     Use null for missing fields. Use lists for phone/email/website. Ensure the entire response is ONLY the JSON object.
     """
 
+
+EXTRACTION_SCHEMA_TEXT = """
+Business Card: {"type": "business_card", "data": {"name": string|null, "title": string|null, "phone": list[string]|null, "email": list[string]|null, "website": list[string]|null, "address": string|null}}
+Visitor Register: {"type": "visitor_register", "data": list[{"date": string|null, "visitor_name": string|null, "address": string|null, "time_in": string|null, "time_out": string|null}]}
+Unknown: {"type": "unknown", "data": null}
+"""
+
+
+async def repair_llm_output_with_text_prompt(response_content: str, error: str | None) -> Tuple[Dict[str, Any] | None, str | None]:
+    """
+    Asks the model to restructure its own previous answer to the schema, text only (no image),
+    which is far cheaper than another vision call. Returns (validated output, None) or (None, error).
+    Groq errors here are not fatal: the caller falls back to another vision attempt.
+    """
+    repair_prompt = f"""
+    The JSON below was extracted from a document image but failed validation: '{error}'.
+    Rewrite it so it STRICTLY follows one of these structures:
+    {EXTRACTION_SCHEMA_TEXT}
+    Keep every value that is present, do not invent new values, and use null for anything missing.
+    Respond ONLY with the single, valid JSON object.
+
+    {response_content}
+    """
+    started = perf_counter()
+    try:
+        completion = await create_llm_completion(
+            model=GROQ_MODEL_NAME,
+            messages=[{"role": "user", "content": repair_prompt}],
+            response_format={"type": "json_object"},
+            max_tokens=4096,
+            temperature=0.0,
+        )
+    except (GroqError, HTTPException) as e:
+        observe_llm_call("repair", 0.0, perf_counter() - started, "error")
+        if isinstance(e, HTTPException):
+            raise
+        log(f"Groq API Error during text-only repair: {e}", always=True)
+        return None, error
+    llm_seconds = perf_counter() - started
+    repaired_content = completion.choices[0].message.content
+    log(f"Raw LLM repair response: {preview(repaired_content)}")
+    with stage("validate"):
+        repaired_data, repair_error, _ = repair_and_validate_llm_output(repaired_content)
+    observe_llm_call("repair", 0.0, llm_seconds, "valid" if repaired_data is not None else "invalid", getattr(completion, "usage", None))
+    if repaired_data is None:
+        metrics.VALIDATION_FAILURES.inc(kind="repair", reason=validation_failure_reason(repair_error))
+    return repaired_data, repair_error
+
+
+async def perform_extraction_and_validation(
+    image_data_url: str
+) -> Dict[str, Any]:
+    """
+    Handles the core logic of calling Groq, parsing, validating, and retrying.
+    `image_data_url` is the already-encoded image (see build_image_data_url).
+    Returns the validated data structure or raises HTTPException on failure.
+    """
+    if not llm_scheduler.available:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Groq client unavailable.")
+
     last_error = None
     extracted_data = None
 
     for attempt in range(MAX_RETRIES):
-        print(f"--- Extraction Attempt {attempt + 1} of {MAX_RETRIES} ---")
-        current_prompt = base_prompt_text
+        temperature = 0.1 + (attempt * 0.05)
+        log(f"--- Extraction Attempt {attempt + 1} of {MAX_RETRIES} (temperature {temperature:.2f}) ---")
+        current_prompt = EXTRACTION_PROMPT
         if last_error:
-            print(f"Retrying due to validation error: {last_error}")
+            log(f"Retrying due to validation error: {last_error}")
             reflection_prompt = f"""
             The previous attempt failed validation: '{last_error}'.
             Re-analyze the image and STRICTLY follow the required JSON structure:
@@ -115,110 +303,622 @@ async def perform_extraction_and_validation(
             """
             current_prompt = reflection_prompt
 
+        started, llm_seconds = perf_counter(), None
         try:
-            completion = groq_client.chat.completions.create(
+            completion = await create_llm_completion(
                 model=GROQ_MODEL_NAME,
                 messages=[
                     {
                         "role": "user",
                         "content": [
                             {"type": "text", "text": current_prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:{image_mime_type};base64,{base64_image}"}},
+                            {"type": "image_url", "image_url": {"url": image_data_url}},
                         ],
                     }
                 ],
                 response_format={"type": "json_object"},
                 max_tokens=4096,
-                temperature=0.1 + (attempt * 0.05),
+                temperature=temperature,
             )
+            llm_seconds = perf_counter() - started
             response_content = completion.choices[0].message.content
-            print(f"Raw LLM response (Attempt {attempt + 1}): {response_content}")
+            log(f"Raw LLM response (Attempt {attempt + 1}): {preview(response_content)}")
 
-            try:
-                llm_output = json.loads(response_content)
-                if not isinstance(llm_output, dict) or "type" not in llm_output or "data" not in llm_output:
-                    last_error = "LLM response missing 'type' or 'data' keys."
-                    continue
-
-                doc_type = llm_output.get("type")
-                data_payload = llm_output.get("data")
-                is_valid = False
-                validation_error = None
-
-                if doc_type == "business_card":
-                    if isinstance(data_payload, dict): is_valid, validation_error = validate_business_card_data(data_payload)
-                    else: validation_error = "Expected 'data' dictionary for business_card."
-                elif doc_type == "visitor_register":
-                    if isinstance(data_payload, list): is_valid, validation_error = validate_visitor_register_data(data_payload)
-                    else: validation_error = "Expected 'data' list for visitor_register."
-                elif doc_type == "unknown":
-                    is_valid = True
-                else:
-                    validation_error = f"Unrecognized document type '{doc_type}'."
-
-                if is_valid:
-                    print("Extraction and validation successful.")
-                    extracted_data = llm_output
-                    last_error = None
-                    break
-                else:
-                    last_error = validation_error
-                    print(f"Validation failed: {last_error}")
-
-            except json.JSONDecodeError:
-                last_error = "LLM response was not valid JSON."
-                print(f"JSON Decode Error (Attempt {attempt + 1}).")
-                continue
+            with stage("validate"):
+                extracted_data, last_error, repairs = repair_and_validate_llm_output(response_content)
+            if repairs:
+                log(f"Repaired LLM response locally: {'; '.join(repairs)}")
+            truncated = extracted_data is None and getattr(completion.choices[0], "finish_reason", None) == "length"
+            outcome = "valid" if extracted_data is not None else ("truncated" if truncated else "invalid")
+            observe_llm_call("vision", temperature, llm_seconds, outcome, getattr(completion, "usage", None))
+            if extracted_data is None:
+                metrics.VALIDATION_FAILURES.inc(kind="vision", reason="truncated" if truncated else validation_failure_reason(last_error))
+            if truncated:
+                # More rows than fit in max_tokens: a retry would be cut off again and a text repair would drop rows
+                metrics.EXTRACTIONS.inc(outcome="truncated", attempts=attempt + 1)
+                raise ExtractionTruncated()
+            if extracted_data is None and LLM_REPAIR_PROMPT_ENABLED and response_content and response_content.strip():
+                # The transcription is usually fine and only the JSON is off: fix it without resending the image
+                log(f"Validation failed ({last_error}); requesting a text-only repair.")
+                # On failure keep the original error: it is what the next vision attempt should be told about
+                extracted_data, _ = await repair_llm_output_with_text_prompt(response_content, last_error)
+            if extracted_data is not None:
+                log("Extraction and validation successful.")
+                last_error = None
+                break
+            log(f"Validation failed: {last_error}")
 
+        except HTTPException:
+            if llm_seconds is None:
+                observe_llm_call("vision", temperature, perf_counter() - started, "error")
+            raise # Queue timeouts must not be retried as parsing errors
         except GroqError as e:
-            print(f"Groq API Error (Attempt {attempt + 1}): {e}")
+            observe_llm_call("vision", temperature, perf_counter() - started, "error")
+            metrics.EXTRACTIONS.inc(outcome="error", attempts=attempt + 1)
+            log(f"Groq API Error (Attempt {attempt + 1}): {e}", always=True)
             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Groq API error: {e}")
         except Exception as e:
-            print(f"Unexpected Error during LLM call/parsing (Attempt {attempt + 1}): {e}")
+            if llm_seconds is None:
+                observe_llm_call("vision", temperature, perf_counter() - started, "error")
+            log(f"Unexpected Error during LLM call/parsing (Attempt {attempt + 1}): {e}", always=True)
             last_error = f"Unexpected error: {e}"
 
     if last_error or extracted_data is None:
+        metrics.EXTRACTIONS.inc(outcome="failed", attempts=MAX_RETRIES)
         detail = f"Failed to extract valid data after {MAX_RETRIES} attempts."
         if last_error: detail += f" Last error: {last_error}"
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
 
+    metrics.EXTRACTIONS.inc(outcome="valid", attempts=attempt + 1)
     return extracted_data # Return the successfully validated data
 
 
+async def prepare_image_data_url(image_bytes: bytes, image_mime_type: str, image_sha256: str) -> str:
+    """Preprocesses an upload (see preprocessing.py) and returns the data URL sent to the LLM."""
+    # Pillow work is CPU-bound; keep it off the event loop and bound how many bitmaps are live at once
+    async with preprocess_semaphore:
+        with stage("preprocess"):
+            processed_bytes, processed_mime_type, report = await asyncio.to_thread(
+                preprocessing.preprocess_image, image_bytes, image_mime_type
+            )
+    if report["applied"]:
+        savings = ", ".join(f"{step['step']} -{step['bytes_saved']}B" for step in report["steps"])
+        log(f"Preprocessed image {image_sha256[:12]}: {report['original_bytes']}B -> {report['output_bytes']}B ({savings})")
+    with stage("encode"):
+        return build_image_data_url(processed_bytes, processed_mime_type)
+
+
+async def extract_with_cache(
+    image_bytes: bytes,
+    image_mime_type: str
+) -> Dict[str, Any]:
+    """
+    Cache-aware entry point for extraction from a raw upload.
+    Identical uploads (same bytes, pipeline version and model) are served from the cache;
+    on a miss the image is preprocessed, encoded and run through perform_extraction_and_validation.
+    Only results that passed validation are ever stored.
+    """
+    image_sha256 = hash_image(image_bytes)
+    cache_key = make_cache_key(image_sha256, EXTRACTION_PIPELINE_VERSION, GROQ_MODEL_NAME)
+    cached = await run_in_db_thread(extraction_cache.get, cache_key)
+    if cached is not None:
+        log(f"Extraction cache hit for image {image_sha256[:12]}.")
+        return cached
+
+    image_data_url = await prepare_image_data_url(image_bytes, image_mime_type, image_sha256)
+    # Only the encoded payload is needed for the (slow) LLM call, so drop this reference to the raw
+    # buffer. extract_document keeps its own until the call succeeds: a page that turns out too
+    # dense has to be cut into bands from the original bytes.
+    del image_bytes
+
+    validated_data = await perform_extraction_and_validation(image_data_url=image_data_url)
+    await run_in_db_thread(extraction_cache.put, cache_key, image_sha256, EXTRACTION_PIPELINE_VERSION, GROQ_MODEL_NAME, validated_data)
+    return validated_data
+
+
+# --- Tiled Extraction ---
+def tile_label(tile: tiling.Tile) -> str:
+    label = f"Page {tile.page + 1}"
+    return f"{label}, band {tile.band + 1}/{tile.bands}" if tile.bands > 1 else label
+
+
+def merge_tile_results(results: List[Tuple[tiling.Tile, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    One result for a tiled document: visitor rows of all tiles merged in page/band order with
+    seam duplicates removed (tiles read as 'unknown', e.g. a blank band, add nothing).
+    """
+    if len(results) == 1:
+        return results[0][1]
+    registers = [(tile, result) for tile, result in results if result["type"] == "visitor_register"]
+    others = [tile for tile, result in results if result["type"] not in ("visitor_register", "unknown")]
+    if not registers:
+        if others:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Only visitor registers can be extracted from multi-page or tiled documents; upload business cards one image at a time."
+            )
+        return {"type": "unknown", "data": None}
+    if others:
+        log(f"Ignoring {len(others)} tile(s) not read as a visitor register: {', '.join(tile_label(tile) for tile in others)}.")
+    rows = tiling.merge_visitor_rows([result["data"] for _, result in registers], [tile for tile, _ in registers])
+    is_valid, error = validate_visitor_register_data(rows)
+    if not is_valid:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Merged register failed validation: {error}")
+    log(f"Merged {sum(len(result['data']) for _, result in registers)} rows from {len(registers)} tiles into {len(rows)}.")
+    return {"type": "visitor_register", "data": rows}
+
+
+async def extract_tiles(tiles: List[tiling.Tile], split_dense_pages: bool) -> List[Tuple[tiling.Tile, Dict[str, Any]]]:
+    """
+    Extracts tiles in parallel (TILE_MAX_PARALLEL per document, still under the LLM scheduler's
+    limits) through the cached single-image path. A whole page that turns out too dense for one
+    call is split into bands once when `split_dense_pages` is set. Results keep page/band order.
+    """
+    semaphore = asyncio.Semaphore(tiling.TILE_MAX_PARALLEL)
+
+    async def extract_tile(tile: tiling.Tile) -> List[Tuple[tiling.Tile, Dict[str, Any]]]:
+        async with semaphore:
+            try:
+                return [(tile, await extract_with_cache(image_bytes=tile.image_bytes, image_mime_type=tile.mime_type))]
+            except ExtractionTruncated:
+                if not split_dense_pages or tile.bands > 1:
+                    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"{tile_label(tile)}: {ExtractionTruncated(tile.bands).detail}")
+            except HTTPException as e:
+                raise HTTPException(status_code=e.status_code, detail=f"{tile_label(tile)}: {e.detail}")
+        log(f"{tile_label(tile)} is too dense for one call; extracting it in bands.")
+        async with preprocess_semaphore:
+            with stage("tile_split"):
+                bands = await asyncio.to_thread(tiling.split_image_into_bands, tile.image_bytes, tile.mime_type)
+        band_results = await gather_or_cancel([extract_tile(band._replace(page=tile.page)) for band in bands])
+        return [pair for pairs in band_results for pair in pairs]
+
+    results = await gather_or_cancel([extract_tile(tile) for tile in tiles])
+    return [pair for pairs in results for pair in pairs]
+
+
+async def gather_or_cancel(coroutines: List[Awaitable[Any]]) -> List[Any]:
+    """asyncio.gather that cancels the remaining work as soon as one of them fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def extract_document(document_bytes: bytes, mime_type: str, tiles: int | None = None) -> Dict[str, Any]:
+    """
+    Entry point for every extraction upload.
+    - Single images go through extract_with_cache. If the page is too dense for one call
+      (the answer hits max_tokens) it is re-extracted as overlapping bands instead of retried.
+    - PDFs and multi-page TIFFs are split into pages, each handled the same way.
+    - `tiles` >= 2 cuts every page into that many bands up front; `tiles` == 1 disables tiling.
+    Tiled results are merged into one visitor_register and cached under the whole upload's hash.
+    """
+    if mime_type in ALLOWED_IMAGE_MIME_TYPES and (tiles is None or tiles == 1):
+        try:
+            return await extract_with_cache(image_bytes=document_bytes, image_mime_type=mime_type)
+        except ExtractionTruncated:
+            if tiles == 1:
+                raise
+            log("Image is too dense for one call; extracting it in bands.")
+        return await extract_in_tiles(document_bytes, mime_type, dense_image=True)
+    return await extract_in_tiles(document_bytes, mime_type, tiles=tiles)
+
+
+async def extract_in_tiles(document_bytes: bytes, mime_type: str, tiles: int | None = None, dense_image: bool = False) -> Dict[str, Any]:
+    """
+    Tiled extraction of a whole upload: its pages cut into `tiles` bands (None: whole pages, split
+    further only if too dense), or with dense_image, a single image already known to be too dense
+    for one call, cut into automatically sized bands.
+    """
+    if dense_image:
+        split, bands, split_dense_pages = tiling.split_image_into_bands, None, False
+    else:
+        split, bands, split_dense_pages = tiling.split_document, tiles, tiles is None
+
+    image_sha256 = hash_image(document_bytes)
+    # Auto mode shares the plain key, so a dense image that needed tiling is a cache hit next time
+    pipeline_version = EXTRACTION_PIPELINE_VERSION if tiles is None else f"{EXTRACTION_PIPELINE_VERSION}/tiles{tiles}"
+    cache_key = make_cache_key(image_sha256, pipeline_version, GROQ_MODEL_NAME)
+    cached = await run_in_db_thread(extraction_cache.get, cache_key)
+    if cached is not None:
+        log(f"Extraction cache hit for document {image_sha256[:12]}.")
+        return cached
+
+    try:
+        async with preprocess_semaphore:
+            with stage("tile_split"):
+                document_tiles = await asyncio.to_thread(split, document_bytes, mime_type, bands)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    del document_bytes # The encoded tiles are all that's needed from here on
+    log(f"Extracting {len(document_tiles)} tile(s) from {len({tile.page for tile in document_tiles})} page(s).")
+
+    validated_data = merge_tile_results(await extract_tiles(document_tiles, split_dense_pages))
+    await run_in_db_thread(extraction_cache.put, cache_key, image_sha256, pipeline_version, GROQ_MODEL_NAME, validated_data)
+    return validated_data
+
+
 # --- NEW Endpoint: Extract & Validate Only ---
 @app.post("/extract_validate/",
           summary="Extract & Validate Image Info (No DB Storage)",
-          description="Uploads image, extracts/validates data using LLM (with retries), returns validated JSON for frontend review.",
+          description="Uploads image, extracts/validates data using LLM (with retries), returns validated JSON for frontend review. "
+                      "Multi-page PDFs/TIFFs and dense pages are extracted as tiles in parallel and merged into one visitor register; "
+                      "tiles=N cuts each page into N overlapping bands (tiles=1 disables tiling).",
           response_description="JSON containing 'type' and 'data' if successful.")
 async def extract_and_validate_only(
-    file: UploadFile = File(..., description="Image file (JPG, PNG, WEBP)")
+    request: Request,
+    file: UploadFile = File(..., description="Image file (JPG, PNG, WEBP) or multi-page document (PDF, TIFF)"),
+    tiles: int | None = None
 ):
     # --- Input Validation ---
-    allowed_mime_types = ["image/jpeg", "image/png", "image/webp"]
-    file_mime_type, _ = mimetypes.guess_type(file.filename)
-    actual_mime_type = file.content_type or file_mime_type
-    if actual_mime_type not in allowed_mime_types:
+    actual_mime_type = resolve_upload_mime_type(file.filename, file.content_type)
+    if actual_mime_type not in ALLOWED_DOCUMENT_MIME_TYPES:
         raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type.")
+    if tiles is not None and not 1 <= tiles <= tiling.TILE_MAX_BANDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"tiles must be between 1 and {tiling.TILE_MAX_BANDS}.")
 
     # --- Image Processing ---
     try:
-        image_bytes = await file.read()
-        base64_image = encode_image_to_base64(image_bytes)
-        image_mime_type = actual_mime_type
+        with stage("upload_read"):
+            image_bytes = await read_upload_limited(file, MAX_UPLOAD_BYTES)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error reading image: {e}")
 
-    # --- Call shared extraction logic ---
-    validated_data = await perform_extraction_and_validation(
-        image_bytes=image_bytes,
-        image_mime_type=image_mime_type,
-        base64_image=base64_image
-    )
+    # --- Call shared extraction logic (cancelled if the client goes away) ---
+    extraction = extract_document(document_bytes=image_bytes, mime_type=actual_mime_type, tiles=tiles)
+    del image_bytes # The coroutine now owns the only reference: released once split into tiles, else when extraction ends
+    validated_data = await run_until_disconnected(request, extraction)
 
     # Return the validated data without storing
     return JSONResponse(status_code=status.HTTP_200_OK, content=validated_data)
 
 
+# --- Streaming Extraction ---
+async def stream_extraction_events(image_bytes: bytes, image_mime_type: str):
+    """
+    SSE events for one upload: 'type' as soon as the document type has been generated, one 'row'
+    per visitor register entry as soon as it is complete and valid, then 'done' with the full
+    validated result (what the client should review and store) or 'error'.
+    Streamed rows are a preview. If the complete response fails validation, the usual repair and
+    retry path runs and 'done' carries its result with "rows_replaced": true. A response cut off at
+    max_tokens is neither repaired nor retried (both would lose rows): the image is extracted as
+    bands instead, as on /extract_validate/.
+    """
+    try:
+        image_sha256 = hash_image(image_bytes)
+        cache_key = make_cache_key(image_sha256, EXTRACTION_PIPELINE_VERSION, GROQ_MODEL_NAME)
+        cached = await run_in_db_thread(extraction_cache.get, cache_key)
+        if cached is not None:
+            log(f"Extraction cache hit for image {image_sha256[:12]}.")
+            yield format_stream_event({"type": cached["type"]}, "sse", event="type")
+            if cached["type"] == "visitor_register":
+                for index, entry in enumerate(cached["data"]):
+                    yield format_stream_event({"index": index, "entry": entry}, "sse", event="row")
+            rows = len(cached["data"]) if cached["type"] == "visitor_register" else 0
+            yield format_stream_event({**cached, "source": "cache", "rows_streamed": rows, "rows_replaced": False}, "sse", event="done")
+            return
+
+        if not llm_scheduler.available:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Groq client unavailable.")
+        # image_bytes stays referenced until the answer is in: a truncated one means tiling from the original
+        image_data_url = await prepare_image_data_url(image_bytes, image_mime_type, image_sha256)
+
+        parser = IncrementalExtractionParser()
+        rows_streamed = 0
+        usage = None
+        finish_reason = None
+        started = perf_counter()
+        # JSON mode can't be combined with streaming on Groq; the prompt alone asks for JSON
+        # and the local repair step below handles fences or stray text around it.
+        stream = await create_llm_completion(
+            model=GROQ_MODEL_NAME,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": EXTRACTION_PROMPT},
+                        {"type": "image_url", "image_url": {"url": image_data_url}},
+                    ],
+                }
+            ],
+            max_tokens=4096,
+            temperature=0.1,
+            stream=True,
+        )
+        try:
+            async for chunk in stream:
+                usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage # Groq reports usage on the last chunk
+                if chunk.choices and getattr(chunk.choices[0], "finish_reason", None):
+                    finish_reason = chunk.choices[0].finish_reason
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                for event in parser.feed(delta):
+                    if event[0] == "type":
+                        yield format_stream_event({"type": event[1]}, "sse", event="type")
+                    elif parser.document_type in (None, "visitor_register"):
+                        entry, _ = check_streamed_entry(event[2])
+                        if entry is not None:
+                            yield format_stream_event({"index": event[1], "entry": entry}, "sse", event="row")
+                            rows_streamed += 1
+        finally:
+            await stream.aclose()
+        llm_seconds = perf_counter() - started
+        log(f"Raw streamed LLM response: {preview(parser.text)}")
+
+        with stage("validate"):
+            validated_data, last_error, repairs = repair_and_validate_llm_output(parser.text)
+        truncated = validated_data is None and finish_reason == "length"
+        outcome = "valid" if validated_data is not None else ("truncated" if truncated else "invalid")
+        observe_llm_call("stream", 0.1, llm_seconds, outcome, usage)
+        if validated_data is None:
+            metrics.VALIDATION_FAILURES.inc(kind="stream", reason="truncated" if truncated else validation_failure_reason(last_error))
+        if repairs:
+            log(f"Repaired LLM response locally: {'; '.join(repairs)}")
+        source = "stream"
+        if truncated:
+            log("Streamed response was cut off at the output token limit; extracting the image in bands.")
+            metrics.EXTRACTIONS.inc(outcome="truncated", attempts=1)
+            del image_data_url
+            validated_data = await extract_in_tiles(image_bytes, image_mime_type, dense_image=True) # Caches the merged result
+            yield format_stream_event({**validated_data, "source": "tiles", "rows_streamed": rows_streamed, "rows_replaced": True}, "sse", event="done")
+            return
+        del image_bytes
+        if validated_data is None and LLM_REPAIR_PROMPT_ENABLED and parser.text.strip():
+            log(f"Streamed response failed validation ({last_error}); requesting a text-only repair.")
+            validated_data, _ = await repair_llm_output_with_text_prompt(parser.text, last_error)
+            source = "repair"
+        if validated_data is None:
+            log(f"Streamed response failed validation ({last_error}); falling back to full extraction.")
+            validated_data = await perform_extraction_and_validation(image_data_url=image_data_url)
+            source = "retry"
+        await run_in_db_thread(extraction_cache.put, cache_key, image_sha256, EXTRACTION_PIPELINE_VERSION, GROQ_MODEL_NAME, validated_data)
+        yield format_stream_event(
+            {**validated_data, "source": source, "rows_streamed": rows_streamed, "rows_replaced": source != "stream"},
+            "sse", event="done"
+        )
+    except HTTPException as e:
+        yield format_stream_event({"status_code": e.status_code, "detail": e.detail}, "sse", event="error")
+    except GroqError as e:
+        log(f"Groq API Error during streamed extraction: {e}", always=True)
+        yield format_stream_event({"status_code": status.HTTP_502_BAD_GATEWAY, "detail": f"Groq API error: {e}"}, "sse", event="error")
+
+
+@app.post("/extract_validate/stream/",
+          summary="Extract & Validate Image Info as a Stream (No DB Storage)",
+          description="Like /extract_validate/, but streams Server-Sent Events: 'type' once the document type is known, "
+                      "a 'row' for each visitor register entry as soon as it is extracted and valid, then 'done' with the "
+                      "complete validated result (or 'error').",
+          response_description="text/event-stream of type/row/done events.")
+async def extract_and_validate_stream(
+    file: UploadFile = File(..., description="Image file (JPG, PNG, WEBP)")
+):
+    actual_mime_type = resolve_upload_mime_type(file.filename, file.content_type)
+    if actual_mime_type not in ALLOWED_IMAGE_MIME_TYPES:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type.")
+    try:
+        with stage("upload_read"):
+            image_bytes = await read_upload_limited(file, MAX_UPLOAD_BYTES)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error reading image: {e}")
+
+    # A disconnecting client cancels the generator, which closes the LLM stream and frees its slot
+    return StreamingResponse(
+        stream_extraction_events(image_bytes, actual_mime_type),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def run_extraction_job(image_bytes: bytes, image_mime_type: str) -> Dict[str, Any]:
+    """Job runner used by the background worker pool (see jobs.py)."""
+    return await extract_document(document_bytes=image_bytes, mime_type=image_mime_type)
+
+
+# --- Batch Extraction Helpers ---
+# A batch item is (display name, mime type, async reader returning the image bytes).
+BatchItem = Tuple[str, str | None, Callable[[], Awaitable[bytes]]]
+
+
+def _zip_member_reader(archive: zipfile.ZipFile, member: zipfile.ZipInfo, lock: asyncio.Lock):
+    async def read() -> bytes:
+        # Check the declared size first so a zip bomb is never inflated into memory
+        if member.file_size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"File exceeds the upload limit of {MAX_UPLOAD_BYTES} bytes.")
+        # ZipFile shares one underlying file handle, so members are decompressed one at a time.
+        async with lock:
+            return await asyncio.to_thread(archive.read, member)
+    return read
+
+
+def collect_batch_items(files: List[UploadFile]) -> List[BatchItem]:
+    """
+    Expands the uploaded files (zip archives are opened, not extracted) into batch items.
+    Image bytes are only read when a worker picks the item up, so memory stays bounded.
+    """
+    items: List[BatchItem] = []
+    for upload in files:
+        mime_type = resolve_upload_mime_type(upload.filename, upload.content_type)
+        if mime_type in ZIP_MIME_TYPES or (upload.filename or "").lower().endswith(".zip"):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"'{upload.filename}' is not a valid zip archive.")
+            lock = asyncio.Lock()
+            for member in archive.infolist():
+                base_name = os.path.basename(member.filename)
+                # Skip directories and OS metadata (e.g. __MACOSX/, .DS_Store)
+                if member.is_dir() or member.filename.startswith("__MACOSX/") or base_name.startswith("."):
+                    continue
+                member_mime_type, _ = mimetypes.guess_type(member.filename)
+                items.append((f"{upload.filename}/{member.filename}", member_mime_type, _zip_member_reader(archive, member, lock)))
+        else:
+            items.append((upload.filename, mime_type, functools.partial(read_upload_limited, upload, MAX_UPLOAD_BYTES)))
+    return items
+
+
+async def process_batch_item(index: int, item: BatchItem) -> Dict[str, Any]:
+    """Runs one batch item through the cached extraction path; never raises."""
+    filename, mime_type, read = item
+    result = {"index": index, "filename": filename}
+    if mime_type not in ALLOWED_DOCUMENT_MIME_TYPES:
+        return {**result, "status": "error", "status_code": status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "detail": "Unsupported file type."}
+    try:
+        with stage("upload_read"):
+            document_bytes = await read()
+        validated_data = await extract_document(document_bytes=document_bytes, mime_type=mime_type)
+        del document_bytes
+        return {**result, "status": "ok", "result": validated_data}
+    except HTTPException as e:
+        return {**result, "status": "error", "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        log(f"Unexpected error processing batch item '{filename}': {e}", always=True)
+        return {**result, "status": "error", "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR, "detail": f"Unexpected error: {e}"}
+
+
+def format_stream_event(payload: Dict[str, Any], output_format: str, event: str = "result") -> str:
+    if output_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps(payload) + "\n"
+
+
+async def stream_batch_results(items: List[BatchItem], output_format: str):
+    """
+    Extracts items with at most BATCH_MAX_PARALLEL workers and yields each result as soon
+    as it completes (completion order, not upload order), followed by a summary event.
+    If the client disconnects, the generator is closed and the workers are cancelled.
+    """
+    results: asyncio.Queue = asyncio.Queue()
+    pending = iter(enumerate(items)) # Shared by all workers; next() is atomic on the event loop
+
+    async def worker():
+        for index, item in pending:
+            await results.put(await process_batch_item(index, item))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(BATCH_MAX_PARALLEL, len(items))))]
+    succeeded = 0
+    try:
+        for _ in range(len(items)):
+            result = await results.get()
+            if result["status"] == "ok":
+                succeeded += 1
+            yield format_stream_event(result, output_format)
+        summary = {"total": len(items), "succeeded": succeeded, "failed": len(items) - succeeded}
+        yield format_stream_event(summary, output_format, event="done")
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+# --- NEW Endpoint: Batch Extract & Validate ---
+@app.post("/extract_validate/batch/",
+          summary="Batch Extract & Validate Images (No DB Storage)",
+          description="Uploads many images and/or zip archives of images, extracts/validates them in parallel "
+                      "and streams one result per image in completion order as NDJSON (default) or SSE.",
+          response_description="Stream of per-image results followed by a summary.")
+async def extract_and_validate_batch(
+    files: List[UploadFile] = File(..., description="Image files (JPG, PNG, WEBP) or zip archives of images"),
+    output_format: str = "ndjson"
+):
+    if output_format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="output_format must be 'ndjson' or 'sse'.")
+
+    items = collect_batch_items(files)
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No images found in the upload.")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"Batch exceeds the limit of {BATCH_MAX_ITEMS} images.")
+
+    media_type = "text/event-stream" if output_format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_batch_results(items, output_format),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Flush each result through proxies
+    )
+
+
+# --- Background Extraction Jobs ---
+@app.post("/jobs/extract/",
+          status_code=status.HTTP_202_ACCEPTED,
+          summary="Submit Background Extraction Job",
+          description="Stores the upload and queues it for extraction by the background workers. Returns a job id immediately.",
+          response_description="Job id plus URLs for polling and SSE status updates.")
+async def submit_extraction_job(
+    file: UploadFile = File(..., description="Image file (JPG, PNG, WEBP) or multi-page document (PDF, TIFF)")
+):
+    actual_mime_type = resolve_upload_mime_type(file.filename, file.content_type)
+    if actual_mime_type not in ALLOWED_DOCUMENT_MIME_TYPES:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Unsupported file type.")
+    try:
+        with stage("upload_read"):
+            image_bytes = await read_upload_limited(file, MAX_UPLOAD_BYTES)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Error reading image: {e}")
+
+    try:
+        job = await job_manager.submit(image_bytes=image_bytes, mime_type=actual_mime_type, filename=file.filename)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log(f"Error submitting extraction job: {e}", always=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to queue extraction job.")
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            **job,
+            "status_url": f"/jobs/{job['job_id']}",
+            "events_url": f"/jobs/{job['job_id']}/events",
+        }
+    )
+
+
+@app.get("/jobs/{job_id}",
+         summary="Get Extraction Job Status",
+         description="Returns the job status, plus the validated result or error once it has finished.")
+async def get_extraction_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found.")
+    return job
+
+
+@app.get("/jobs/{job_id}/events",
+         summary="Stream Extraction Job Status (SSE)",
+         description="Server-Sent Events stream emitting a 'status' event on every status change and closing once the job has finished.")
+async def stream_extraction_job_events(job_id: str):
+    if await job_manager.get(job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found.")
+
+    async def event_stream():
+        last_status = None
+        while True:
+            job = await job_manager.get(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield format_stream_event(job, "sse", event="status")
+            if last_status in FINISHED_STATUSES:
+                return
+            await job_manager.wait_for_change(job_id)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # --- Pydantic Model for Store Request Body ---
 class StoreDataRequest(BaseModel):
     type: str
@@ -226,99 +926,329 @@ class StoreDataRequest(BaseModel):
     # Add filename if you want to store it from frontend confirmation step
     # filename: Optional[str] = None
 
+
+class BulkStoreDocument(StoreDataRequest):
+    filename: str | None = None
+
+
+class BulkStoreRequest(BaseModel):
+    documents: List[BulkStoreDocument]
+    # When true, one invalid document rejects the whole request; otherwise valid ones are stored
+    atomic: bool = False
+
+
+def check_document_for_storage(doc_type: str, data_payload: Any) -> str | None:
+    """Returns why a document can't be stored, or None if it is a storable business card/register."""
+    if doc_type == "business_card":
+        if not isinstance(data_payload, dict):
+            return "Invalid data format for business_card, expected dictionary."
+        is_valid, error = validate_business_card_data(data_payload)
+    elif doc_type == "visitor_register":
+        if not isinstance(data_payload, list):
+            return "Invalid data format for visitor_register, expected list."
+        is_valid, error = validate_visitor_register_data(data_payload)
+    else:
+        return f"Invalid document type '{doc_type}' for storage."
+    return None if is_valid else f"Data validation failed before storage: {error}"
+
 # backend/main.py (ADD THESE NEW ENDPOINTS)
 
-from sqlalchemy import func, cast, Date # Import Date type for casting
-from datetime import date, datetime # Import date for type hinting
+from datetime import date, datetime, time # Import date for type hinting
+from fastapi import Query
+
+from queries import (filter_business_cards, filter_visitor_logs, paginate,
+                     DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+from analytics import get_dashboard_analytics
+from export import stream_export, export_headers, EXPORT_FORMATS
+
+
+DOCUMENT_TABLES = {"business_card": database.BusinessCard.__tablename__, "visitor_register": database.VisitorLogEntry.__tablename__}
+
+
+async def store_documents(db: Session, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Stores validated documents via the group-commit writer (coalesced with concurrent stores into
+    one transaction), or directly on a DB thread when WRITE_BEHIND_ENABLED is off.
+    Either way it returns only after the data is committed.
+    """
+    with db_operation("insert"):
+        if WRITE_BEHIND_ENABLED:
+            results = await group_writer.store(documents)
+        else:
+            results = await run_in_db_thread(add_documents_bulk, db=db, documents=documents)
+    # Table versions already changed with the commit; dropping the stale pages now just frees memory early
+    for doc_type in {document["type"] for document in documents}:
+        if doc_type in DOCUMENT_TABLES:
+            response_cache.invalidate(DOCUMENT_TABLES[doc_type])
+    return results
+
+
+def load_conditional_page(
+    db: Session,
+    model,
+    load_page: Callable[..., Tuple[List[Dict[str, Any]], str | None]],
+    signature: str,
+    if_none_match: str | None,
+    accept: str | None,
+    cursor: str | None,
+    limit: int,
+    filters: Dict[str, Any],
+) -> Tuple[str, CachedPage | None]:
+    """
+    Runs on a DB thread. The table version and the page are read in the same read transaction,
+    so the ETag always describes the body. Returns (etag, None) when the client's copy is current,
+    otherwise (etag, page) served from the response cache or freshly loaded and encoded.
+    """
+    table_name = model.__tablename__
+    version = get_table_version(db, table_name)
+    etag = make_etag(table_name, version, signature)
+    if etag_matches(if_none_match, etag):
+        return etag, None
+    page = response_cache.get(table_name, version, signature)
+    if page is None:
+        with db_operation("page_query"):
+            result_list, next_cursor = load_page(db, cursor, limit, **filters)
+        body, media_type = encode_body(result_list, accept)
+        page = CachedPage(body, media_type, next_cursor)
+        response_cache.put(table_name, version, signature, page)
+    return etag, page
+
+
+async def conditional_page_response(request: Request, db: Session, model, load_page, cursor: str | None, limit: int, **filters) -> Response:
+    """
+    Read-endpoint response with an ETag. `If-None-Match` with the current tag gets a 304;
+    `Cache-Control: no-cache` makes browsers revalidate instead of refetching the whole page.
+    The body stays a plain list (what the frontend expects); the next cursor goes in a header.
+    """
+    accept = request.headers.get("accept")
+    response_format = "msgpack" if wants_msgpack(accept) else "json"
+    signature = f"{response_format}?{sorted(request.query_params.multi_items())}"
+    etag, page = await run_in_db_thread(
+        load_conditional_page, db, model, load_page, signature, request.headers.get("if-none-match"), accept, cursor, limit, filters
+    )
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if page is None:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    return Response(content=page.body, media_type=page.media_type, headers=headers)
+
+
+def load_business_card_page(db: Session, cursor: str | None, limit: int, **filters) -> Tuple[List[Dict[str, Any]], str | None]:
+    """Runs on a DB thread (see run_in_db_thread): projected query, keyset page and row encoding."""
+    query = filter_business_cards(db.query(*projected_columns(database.BusinessCard)), **filters)
+    rows, next_cursor = paginate(query, database.BusinessCard, cursor, limit)
+    return business_card_dicts(db, rows), next_cursor
+
 
 # --- NEW Endpoint: Get Business Cards ---
 @app.get("/get_business_cards/",
          summary="Get Stored Business Cards",
-         description="Retrieves all stored business card records, optionally filtered by creation date.",
+         description="Retrieves stored business card records newest first, one page at a time. "
+                     "Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.",
          response_description="A list of business card records.")
 async def get_business_cards(
+    request: Request,
     start_date: date | None = None, # Optional query parameter for start date
-    end_date: date | None = None,   # Optional query parameter for end date
+    end_date: date | None = None,   # Optional query parameter for end date (inclusive)
+    name: str | None = Query(None, description="Name prefix"),
+    company: str | None = Query(None, description="Substring of title, website, email or address"),
+    email_domain: str | None = Query(None, description="Email domain, e.g. example.com"),
+    email: str | None = Query(None, description="Exact email address (case-insensitive)"),
+    phone: str | None = Query(None, description="Phone number in any format; matched on its E.164 form"),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
     try:
-        query = db.query(database.BusinessCard)
-
-        # Apply date filtering based on created_at column
-        if start_date:
-            # Cast created_at to Date for comparison
-            query = query.filter(cast(database.BusinessCard.created_at, Date) >= start_date)
-        if end_date:
-            query = query.filter(cast(database.BusinessCard.created_at, Date) <= end_date)
-
-        records = query.order_by(database.BusinessCard.created_at.desc()).all()
-
-        # Convert records to a list of dicts for JSON response
-        # Handle potential JSON decoding for list fields
-        result_list = []
-        for record in records:
-            card_dict = {c.name: getattr(record, c.name) for c in record.__table__.columns}
-            # Decode JSON string fields back into lists/null
-            for key in ['phone', 'email', 'website']:
-                if card_dict[key]:
-                    try:
-                        card_dict[key] = json.loads(card_dict[key])
-                    except (json.JSONDecodeError, TypeError):
-                         # Keep as string if decoding fails, or set to None/error indicator
-                        print(f"Warning: Could not decode JSON for key '{key}' in card ID {card_dict['id']}")
-                        card_dict[key] = None # Or keep original string: pass
-                else:
-                     card_dict[key] = None # Ensure null if original was null/empty
-            # Convert datetime objects to ISO format strings
-            card_dict['created_at'] = record.created_at.isoformat() if record.created_at else None
-            card_dict['updated_at'] = record.updated_at.isoformat() if record.updated_at else None
-            result_list.append(card_dict)
-
-        return JSONResponse(content=result_list)
+        return await conditional_page_response(
+            request, db, database.BusinessCard, load_business_card_page, cursor, limit,
+            start_date=start_date, end_date=end_date, name=name, company=company, email_domain=email_domain,
+            email=email, phone=phone
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"Error fetching business cards: {e}")
+        log(f"Error fetching business cards: {e}", always=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch business card data.")
 
 
+def load_visitor_log_page(db: Session, cursor: str | None, limit: int, **filters) -> Tuple[List[Dict[str, Any]], str | None]:
+    """Runs on a DB thread (see run_in_db_thread): projected query, keyset page and row encoding."""
+    query = filter_visitor_logs(db.query(*projected_columns(database.VisitorLogEntry)), **filters)
+    rows, next_cursor = paginate(query, database.VisitorLogEntry, cursor, limit)
+    return visitor_log_dicts(db, rows), next_cursor
+
+
 # --- NEW Endpoint: Get Visitor Logs ---
 @app.get("/get_visitor_logs/",
          summary="Get Stored Visitor Log Entries",
-         description="Retrieves all stored visitor log entries, optionally filtered by creation date.",
+         description="Retrieves stored visitor log entries newest first, one page at a time. "
+                     "Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.",
          response_description="A list of visitor log entries.")
 async def get_visitor_logs(
+    request: Request,
     start_date: date | None = None,
     end_date: date | None = None,
+    visitor_name: str | None = Query(None, description="Visitor name prefix"),
+    batch_id: str | None = None,
+    visit_date_from: date | None = Query(None, description="Earliest visit date as written in the register"),
+    visit_date_to: date | None = Query(None, description="Latest visit date (inclusive)"),
+    on_site_from: time | None = Query(None, description="With on_site_until: visitors present at some point in this window, e.g. 14:00"),
+    on_site_until: time | None = Query(None, description="e.g. 16:00"),
+    arrived_from: time | None = Query(None, description="Earliest time in (any day)"),
+    arrived_until: time | None = Query(None, description="Latest time in (any day)"),
+    min_duration_minutes: int | None = Query(None, ge=0),
+    max_duration_minutes: int | None = Query(None, ge=0),
+    cursor: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
     try:
-        query = db.query(database.VisitorLogEntry)
-
-        if start_date:
-            query = query.filter(cast(database.VisitorLogEntry.created_at, Date) >= start_date)
-        if end_date:
-            query = query.filter(cast(database.VisitorLogEntry.created_at, Date) <= end_date)
-
-        records = query.order_by(database.VisitorLogEntry.created_at.desc()).all()
-
-        # Convert records to list of dicts
-        result_list = []
-        for record in records:
-             log_dict = {c.name: getattr(record, c.name) for c in record.__table__.columns}
-             # created_at is already handled by default JSON encoding if it's a datetime object
-             # but let's be explicit for consistency
-             log_dict['created_at'] = record.created_at.isoformat() if record.created_at else None
-             # raw_json_entry can remain a string if needed, or decode if frontend requires object
-             # try:
-             #     log_dict['raw_json_entry'] = json.loads(log_dict['raw_json_entry'])
-             # except (json.JSONDecodeError, TypeError):
-             #     pass # Keep as string if fails
-             result_list.append(log_dict)
-
-        return JSONResponse(content=result_list)
+        return await conditional_page_response(
+            request, db, database.VisitorLogEntry, load_visitor_log_page, cursor, limit,
+            start_date=start_date, end_date=end_date, visitor_name=visitor_name, batch_id=batch_id,
+            visit_date_from=visit_date_from, visit_date_to=visit_date_to, on_site_from=on_site_from, on_site_until=on_site_until,
+            arrived_from=arrived_from, arrived_until=arrived_until,
+            min_duration_minutes=min_duration_minutes, max_duration_minutes=max_duration_minutes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(f"Error fetching visitor logs: {e}")
+        log(f"Error fetching visitor logs: {e}", always=True)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch visitor log data.")
 
+# --- NEW Endpoint: Full-text Search ---
+SEARCH_RESULT_TYPES = {"business_cards": ("business_card", database.BusinessCard), "visitor_logs": ("visitor_log", database.VisitorLogEntry)}
+
+
+def run_search(db: Session, **search_args) -> List[Dict[str, Any]]:
+    """Runs on a DB thread: ranked FTS5 lookup, then the matching records through the fast serialization path."""
+    with db_operation("search"):
+        hits = search_records(db, **search_args)
+        records = {
+            index_key: load_dicts_by_id(db, model, [hit["id"] for hit in hits if hit["index"] == index_key])
+            for index_key, (_, model) in SEARCH_RESULT_TYPES.items()
+        }
+    return [
+        {"type": SEARCH_RESULT_TYPES[hit["index"]][0], "score": hit["score"], "match": hit["match"], "record": records[hit["index"]][hit["id"]]}
+        for hit in hits
+    ]
+
+
+@app.get("/search/",
+         summary="Search Visitors and Business Cards",
+         description="Ranked full-text search (SQLite FTS5, bm25) over card names, titles, addresses, emails and websites "
+                     "and visitor names and addresses. mode=prefix matches word prefixes, mode=fuzzy matches trigrams "
+                     "(substrings and typos), mode=auto tops up prefix hits with fuzzy ones.",
+         response_description="Matching records, best first.")
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text, e.g. 'acme' or 'jon smi'"),
+    mode: str = Query("auto", description="auto, prefix or fuzzy"),
+    scope: str = Query("all", description="all, business_cards or visitor_logs"),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    start_date: date | None = None,
+    end_date: date | None = None,
+    db: Session = Depends(get_db)
+):
+    try:
+        results = await run_in_db_thread(
+            run_search, db, query_text=q, mode=mode, scope=scope, limit=limit, start_date=start_date, end_date=end_date
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except SearchUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    except Exception as e:
+        log(f"Error running search: {e}", always=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Search failed.")
+    return {"query": q, "mode": mode, "scope": scope, "results": results}
+
+# --- NEW Endpoint: Dashboard Analytics ---
+@app.get("/analytics/",
+         summary="Get Dashboard Analytics",
+         description="Pre-aggregated visits/cards per day, arrivals per hour, top visitors and average visit duration, "
+                     "served from rollup tables maintained at write time.",
+         response_description="Aggregates for the Visualize dashboard.")
+async def get_analytics(
+    start_date: date | None = None,
+    end_date: date | None = None,
+    top_n: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    try:
+        return await run_in_db_thread(get_dashboard_analytics, db, start_date=start_date, end_date=end_date, top_n=top_n)
+    except Exception as e:
+        log(f"Error fetching analytics: {e}", always=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to fetch analytics.")
+
+# --- NEW Endpoints: Bulk Export ---
+def _check_export_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}.")
+
+
+def export_response(model, apply_filters, export_format: str, gzip: bool) -> StreamingResponse:
+    media_type = "application/gzip" if gzip else EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        stream_export(model, apply_filters, export_format, gzip=gzip),
+        media_type=media_type,
+        headers=export_headers(model.__tablename__, export_format, gzip)
+    )
+
+
+@app.get("/export/business_cards/",
+         summary="Export Business Cards",
+         description="Streams every matching business card as CSV or NDJSON (optionally gzipped) using a "
+                     "server-side cursor, so memory use is constant regardless of table size.")
+async def export_business_cards(
+    format: str = Query("csv", description="csv or ndjson"),
+    gzip: bool = False,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    name: str | None = Query(None, description="Name prefix"),
+    company: str | None = Query(None, description="Substring of title, website, email or address"),
+    email_domain: str | None = Query(None, description="Email domain, e.g. example.com"),
+    email: str | None = Query(None, description="Exact email address (case-insensitive)"),
+    phone: str | None = Query(None, description="Phone number in any format; matched on its E.164 form"),
+):
+    _check_export_format(format)
+    apply_filters = functools.partial(
+        filter_business_cards, start_date=start_date, end_date=end_date, name=name, company=company, email_domain=email_domain,
+        email=email, phone=phone
+    )
+    return export_response(database.BusinessCard, apply_filters, format, gzip)
+
+
+@app.get("/export/visitor_logs/",
+         summary="Export Visitor Log Entries",
+         description="Streams every matching visitor log entry as CSV or NDJSON (optionally gzipped) using a "
+                     "server-side cursor, so memory use is constant regardless of table size.")
+async def export_visitor_logs(
+    format: str = Query("csv", description="csv or ndjson"),
+    gzip: bool = False,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    visitor_name: str | None = Query(None, description="Visitor name prefix"),
+    batch_id: str | None = None,
+    visit_date_from: date | None = Query(None, description="Earliest visit date as written in the register"),
+    visit_date_to: date | None = Query(None, description="Latest visit date (inclusive)"),
+    on_site_from: time | None = Query(None, description="With on_site_until: visitors present at some point in this window, e.g. 14:00"),
+    on_site_until: time | None = Query(None, description="e.g. 16:00"),
+    arrived_from: time | None = Query(None, description="Earliest time in (any day)"),
+    arrived_until: time | None = Query(None, description="Latest time in (any day)"),
+    min_duration_minutes: int | None = Query(None, ge=0),
+    max_duration_minutes: int | None = Query(None, ge=0),
+):
+    _check_export_format(format)
+    apply_filters = functools.partial(
+        filter_visitor_logs, start_date=start_date, end_date=end_date, visitor_name=visitor_name, batch_id=batch_id,
+        visit_date_from=visit_date_from, visit_date_to=visit_date_to, on_site_from=on_site_from, on_site_until=on_site_until,
+        arrived_from=arrived_from, arrived_until=arrived_until,
+        min_duration_minutes=min_duration_minutes, max_duration_minutes=max_duration_minutes
+    )
+    return export_response(database.VisitorLogEntry, apply_filters, format, gzip)
+
 # --- (Your existing endpoints: /extract_validate/, /store_data/, /) ---
 # ...
 
@@ -335,7 +1265,7 @@ async def store_validated_data(
     data_payload = payload.data
     # original_filename = payload.filename # If you pass filename
 
-    print(f"Received request to store data of type: {doc_type}")
+    log(f"Received request to store data of type: {doc_type}")
 
     try:
         if doc_type == "business_card":
@@ -346,12 +1276,12 @@ async def store_validated_data(
             if not is_valid:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Data validation failed before storage: {error}")
 
-            db_record = add_business_card(db=db, card_data=data_payload) # Add filename if needed
+            stored = await store_documents(db, [{"type": "business_card", "data": data_payload, "filename": None}])
             return JSONResponse(
                 status_code=status.HTTP_201_CREATED,
                 content={
                     "message": "Business card data stored successfully.",
-                    "database_id": db_record.id,
+                    "database_id": stored[0]["database_id"],
                 }
             )
         elif doc_type == "visitor_register":
@@ -365,8 +1295,7 @@ async def store_validated_data(
             if not data_payload:
                  return JSONResponse(status_code=status.HTTP_200_OK, content={"message": "Received empty visitor log, nothing stored."})
 
-            batch_id = str(uuid.uuid4())
-            result = add_visitor_log_entries(db=db, log_entries=data_payload, batch_id=batch_id) # Add filename if needed
+            result = (await store_documents(db, [{"type": "visitor_register", "data": data_payload, "filename": None}]))[0]
             return JSONResponse(
                 status_code=status.HTTP_201_CREATED,
                 content={
@@ -385,13 +1314,124 @@ async def store_validated_data(
         raise http_exc
     except Exception as e:
         # Catch potential DB errors during insertion
-        print(f"Database insertion error during store: {e}")
+        log(f"Database insertion error during store: {e}", always=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to store data in the database: {e}"
         )
 
 
+# --- NEW Endpoint: Bulk Store Validated Data ---
+@app.post("/store_data/bulk/",
+          summary="Store Many Pre-Validated Documents",
+          description="Stores many reviewed documents in one transaction using set-based inserts. "
+                      "Invalid documents are reported per index; with atomic=true any invalid document rejects the request.",
+          response_description="Per-document results with generated ids and batch_ids.")
+async def store_validated_data_bulk(
+    payload: BulkStoreRequest = Body(...),
+    db: Session = Depends(get_db)
+):
+    if len(payload.documents) > BULK_STORE_MAX_DOCUMENTS:
+        raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"At most {BULK_STORE_MAX_DOCUMENTS} documents per request.")
+
+    results: List[Dict[str, Any]] = []
+    storable = [] # (index, document) pairs that passed validation
+    for index, document in enumerate(payload.documents):
+        if document.type == "unknown" or (document.type == "visitor_register" and document.data == []):
+            results.append({"index": index, "status": "skipped", "detail": "Nothing to store."})
+            continue
+        error = check_document_for_storage(document.type, document.data)
+        if error:
+            results.append({"index": index, "status": "error", "detail": error})
+        else:
+            results.append(None) # Filled in after the insert
+            storable.append((index, {"type": document.type, "data": document.data, "filename": document.filename}))
+
+    failed = [result for result in results if result and result["status"] == "error"]
+    if payload.atomic and failed:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"message": "Validation failed; nothing stored.", "errors": failed})
+
+    if storable:
+        try:
+            stored = await store_documents(db, [document for _, document in storable])
+        except Exception as e:
+            log(f"Database insertion error during bulk store: {e}", always=True)
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to store data in the database: {e}")
+        for (index, _), outcome in zip(storable, stored):
+            results[index] = {"index": index, "status": "stored", **outcome}
+
+    stored_count = sum(1 for result in results if result["status"] == "stored")
+    return JSONResponse(
+        status_code=status.HTTP_201_CREATED if stored_count else status.HTTP_200_OK,
+        content={
+            "stored": stored_count,
+            "failed": len(failed),
+            "skipped": sum(1 for result in results if result["status"] == "skipped"),
+            "results": results,
+        }
+    )
+
+
+# --- Admin Endpoints: Extraction Cache ---
+@app.get("/admin/extraction_cache/",
+         summary="Extraction Cache Statistics",
+         description="Returns hit/miss counters and memory usage of the extraction result cache.")
+async def get_extraction_cache_stats():
+    return extraction_cache.snapshot()
+
+
+@app.delete("/admin/extraction_cache/",
+            summary="Invalidate Extraction Cache",
+            description="Removes cached results for one image (by SHA-256 of its bytes) or the whole cache when no hash is given.")
+async def invalidate_extraction_cache(image_sha256: str | None = None):
+    try:
+        removed = await run_in_db_thread(extraction_cache.invalidate, image_sha256=image_sha256)
+    except Exception as e:
+        log(f"Error invalidating extraction cache: {e}", always=True)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to invalidate extraction cache.")
+    return {"message": "Extraction cache invalidated.", "persistent_entries_removed": removed}
+
+
+# --- Admin Endpoints: LLM Scheduler ---
+@app.get("/admin/llm_scheduler/",
+         summary="Read LLM Scheduler Statistics",
+         description="Current adaptive concurrency limit, retries, throttling and per-key budgets of the Groq scheduler.")
+async def get_llm_scheduler_stats():
+    return llm_scheduler.snapshot()
+
+
+# --- Admin Endpoints: Response Cache ---
+@app.get("/admin/response_cache/",
+         summary="Read Response Cache Statistics",
+         description="Hit/miss counters, size and last seen table versions of the cache behind /get_business_cards/ and /get_visitor_logs/.")
+async def get_response_cache_stats():
+    return response_cache.snapshot()
+
+
+# --- Admin Endpoints: Write-behind Writer ---
+@app.get("/admin/writer/",
+         summary="Group-commit Writer Metrics",
+         description="Queue depth, batch sizes and commit/acknowledgement latency of the write-behind writer.")
+async def get_writer_stats():
+    return {"enabled": WRITE_BEHIND_ENABLED, **group_writer.snapshot()}
+
+
+# --- Metrics Endpoint ---
+# The admin snapshots above are exported as gauges next to the pipeline histograms and counters
+metrics.registry.add_collector("llm_scheduler", lambda: llm_scheduler.snapshot())
+metrics.registry.add_collector("extraction_cache", extraction_cache.snapshot)
+metrics.registry.add_collector("response_cache", response_cache.snapshot)
+metrics.registry.add_collector("group_writer", group_writer.snapshot)
+
+
+@app.get("/metrics",
+         summary="Prometheus Metrics",
+         description="Request, pipeline-stage, LLM-call (latency, tokens, outcome per temperature) and database timing "
+                     "histograms and counters for this worker, in the Prometheus text exposition format.")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # --- Root Endpoint ---
 @app.get("/", include_in_schema=False)
 async def root():
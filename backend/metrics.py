@@ -0,0 +1,300 @@
+# metrics.py
+"""
+Pipeline instrumentation: Prometheus-style counters and histograms for /metrics, per-request
+trace ids and sampled logging.
+
+Metrics live in this process (one set per worker) behind locks, since observations also come from
+DB and preprocessing threads, and are rendered in the Prometheus text exposition format without a
+client library. Every HTTP request, and every background job, runs inside a Trace whose id follows
+it through asyncio tasks and worker threads via a ContextVar. log() prints routine lines only for
+the sampled share of traces (LOG_SAMPLE_RATE), prefixed with the trace id; errors are always printed.
+"""
+
+import bisect
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# --- Configuration ---
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))              # Share of requests whose routine log lines are printed
+LOG_LLM_RESPONSE_CHARS = int(os.getenv("LOG_LLM_RESPONSE_CHARS", "300"))   # Raw LLM output echoed in logs (0: none, -1: all)
+TRACE_HEADER = "x-request-id"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+# --- Metric Types ---
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(_escape(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; per label set it keeps one count per bucket plus sum and count."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {} # [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(_escape(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in series_items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                bucket_label = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, bucket_label)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {_number(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, prefix: str, snapshot: Callable[[], Dict[str, Any]]):
+        """Exports the numeric top-level values of an existing stats snapshot as gauges named prefix_key."""
+        self._collectors.append((prefix, snapshot))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, snapshot in self._collectors:
+            try:
+                values = snapshot()
+            except Exception as e:
+                print(f"Warning: metrics collector '{prefix}' failed: {e}")
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    name = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}"
+                    lines.extend([f"# TYPE {name} gauge", f"{name} {_number(value)}"])
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# --- Pipeline Metrics ---
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Time until the response (including a streamed body) completed.", ("method", "route")
+)
+STAGE_DURATION = registry.histogram(
+    "extraction_stage_duration_seconds", "Time per extraction pipeline stage (upload_read, preprocess, encode, tile_split, validate).", ("stage",)
+)
+LLM_CALL_DURATION = registry.histogram(
+    "llm_call_duration_seconds", "Latency of each LLM call (including scheduler queueing and provider retries) by outcome.",
+    ("kind", "temperature", "outcome")
+)
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens reported by the provider.", ("kind", "direction"))
+VALIDATION_FAILURES = registry.counter("llm_validation_failures_total", "LLM responses that failed validation after local repair.", ("kind", "reason"))
+EXTRACTIONS = registry.counter("extractions_total", "Vision extractions by result and number of attempts used.", ("outcome", "attempts"))
+DB_OPERATION_DURATION = registry.histogram("db_operation_duration_seconds", "Time of database inserts and queries.", ("operation",))
+
+
+# --- Tracing ---
+
+class Trace:
+    """One request or job: its id, whether its routine log lines are printed, and time per stage."""
+
+    def __init__(self, trace_id: str | None = None, sampled: bool | None = None):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.sampled = random.random() < LOG_SAMPLE_RATE if sampled is None else sampled
+        self.timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_timing(self, name: str, seconds: float):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, so browser dev tools show where the time went."""
+        with self._lock:
+            return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items())
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def valid_trace_id(value: str | None) -> str | None:
+    """A client-supplied X-Request-ID is reused only if it is short and plain (it ends up in logs)."""
+    return value if value and _TRACE_ID_PATTERN.match(value) else None
+
+
+@contextmanager
+def trace(trace_id: str | None = None) -> Iterator[Trace]:
+    current = Trace(trace_id)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def timed(histogram: Histogram, timing_name: str, **labels) -> Iterator[None]:
+    """Observes the block's duration in `histogram` and adds it to the current trace's timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        current = _current_trace.get()
+        if current is not None:
+            current.add_timing(timing_name, elapsed)
+
+
+def stage(name: str):
+    return timed(STAGE_DURATION, name, stage=name)
+
+
+def db_operation(name: str):
+    return timed(DB_OPERATION_DURATION, f"db_{name}", operation=name)
+
+
+def observe_llm_call(kind: str, temperature: float, seconds: float, outcome: str, usage: Any = None):
+    """Records one LLM call: latency by kind/temperature/outcome and the tokens it used."""
+    LLM_CALL_DURATION.observe(seconds, kind=kind, temperature=f"{temperature:.2f}", outcome=outcome)
+    current = _current_trace.get()
+    if current is not None:
+        current.add_timing("llm", seconds)
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, kind=kind, direction="prompt")
+        LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, kind=kind, direction="completion")
+
+
+# --- Logging ---
+
+def log(message: str, always: bool = False):
+    """
+    Prints a log line tagged with the current trace id. Routine lines are printed only for sampled
+    traces (or at LOG_SAMPLE_RATE outside any trace); pass always=True for errors and warnings.
+    """
+    current = _current_trace.get()
+    if always or (current.sampled if current is not None else random.random() < LOG_SAMPLE_RATE):
+        print(f"[{current.id}] {message}" if current is not None else message)
+
+
+def preview(text: str | None) -> str:
+    """A raw LLM response shortened to LOG_LLM_RESPONSE_CHARS for logging."""
+    if text is None or LOG_LLM_RESPONSE_CHARS < 0 or len(text) <= LOG_LLM_RESPONSE_CHARS:
+        return str(text)
+    return f"{text[:LOG_LLM_RESPONSE_CHARS]}... ({len(text)} chars)"
+
+
+# --- Middleware ---
+
+class TraceMiddleware:
+    """
+    Pure ASGI middleware (so streamed responses are timed to their last byte): runs each HTTP
+    request in a Trace, returns its id as X-Request-ID along with a Server-Timing header of the
+    stages measured before the response started, counts the request by route template and
+    status, and logs one summary line per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = next((value.decode("latin-1") for name, value in scope.get("headers", []) if name == TRACE_HEADER.encode()), None)
+        status_code = 500
+        started = time.perf_counter()
+
+        with trace(valid_trace_id(incoming)) as current:
+            async def send_with_trace(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((TRACE_HEADER.encode(), current.id.encode()))
+                    timing = current.server_timing()
+                    if timing:
+                        headers.append((b"server-timing", timing.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                elapsed = time.perf_counter() - started
+                route = getattr(scope.get("route"), "path", None) or "unmatched" # Templates keep label cardinality bounded
+                HTTP_REQUESTS.inc(method=scope["method"], route=route, status=status_code)
+                HTTP_REQUEST_DURATION.observe(elapsed, method=scope["method"], route=route)
+                stages = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in current.timings.items())
+                log(f"{scope['method']} {scope['path']} {status_code} {elapsed * 1000:.1f}ms {stages}".rstrip())
@@ -0,0 +1,132 @@
+# normalization.py
+
+import os
+import re
+from datetime import date, datetime, time
+from typing import Any, Dict, Tuple
+
+# Accepts what the LLM typically transcribes from registers: "9:05", "09.05", "9:05 AM", "9 pm", "17:30:00"
+_TIME_PATTERN = re.compile(r"^\s*(\d{1,2})(?:\s*[:.h]\s*(\d{2}))?(?:\s*[:.]\s*(\d{2}))?\s*([ap])?\.?\s*m?\.?\s*$", re.IGNORECASE)
+
+
+def parse_time_of_day(value: str | None) -> time | None:
+    """Parses a free-form register time into a `time`, or None if it can't be read."""
+    if not value:
+        return None
+    match = _TIME_PATTERN.match(value)
+    if not match:
+        return None
+    hour, minute, second, meridiem = match.groups()
+    hour, minute, second = int(hour), int(minute or 0), int(second or 0)
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.lower() == "p" else 0)
+    elif minute == 0 and match.group(2) is None:
+        return None # A bare number like "9" is too ambiguous without am/pm
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return time(hour, minute, second)
+
+
+def visit_duration_minutes(time_in: str | None, time_out: str | None) -> int | None:
+    """Minutes between time_in and time_out on the same day; None if either is unreadable or out precedes in."""
+    start, end = parse_time_of_day(time_in), parse_time_of_day(time_out)
+    if start is None or end is None:
+        return None
+    minutes = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+    return minutes if minutes >= 0 else None
+
+
+# --- Visit Date Parsing ---
+# strptime formats tried in order for a register's date column; the first that matches wins, so put the
+# local convention first (day-first by default: "05/03/2024" is 5 March). Commas are ignored when parsing.
+VISIT_DATE_FORMATS = [
+    fmt.strip() for fmt in os.getenv(
+        "VISIT_DATE_FORMATS", "%d/%m/%Y,%d-%m-%Y,%d.%m.%Y,%Y-%m-%d,%d/%m/%y,%d-%m-%y,%d.%m.%y,%d %b %Y,%d %B %Y,%b %d %Y,%B %d %Y"
+    ).split(",") if fmt.strip()
+]
+_ORDINAL_SUFFIX_PATTERN = re.compile(r"(?<=\d)(st|nd|rd|th)\b", re.IGNORECASE)
+
+
+def parse_visit_date(value: str | None) -> date | None:
+    """Parses a register date ("05/03/2024", "5th March, 2024") with VISIT_DATE_FORMATS, or None."""
+    if not value:
+        return None
+    text = " ".join(_ORDINAL_SUFFIX_PATTERN.sub("", value.replace(",", " ")).split())
+    for fmt in VISIT_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def visit_columns(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Typed values of a register entry for the visit_date / time_in_at / time_out_at / duration_minutes
+    columns; each is None when its source string is missing or unreadable. The strings themselves
+    are stored unchanged next to them.
+    """
+    return {
+        "visit_date": parse_visit_date(entry.get("date")),
+        "time_in_at": parse_time_of_day(entry.get("time_in")),
+        "time_out_at": parse_time_of_day(entry.get("time_out")),
+        "duration_minutes": visit_duration_minutes(entry.get("time_in"), entry.get("time_out")),
+    }
+
+
+# --- Contact Normalization ---
+# Country calling code assumed for numbers written without one (e.g. "1" or "91"); empty = leave those unnormalized
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv("DEFAULT_PHONE_COUNTRY_CODE", "").lstrip("+")
+_PHONE_EXTENSION_PATTERN = re.compile(r"\s*(?:ext\.?|x|#)\s*\d+\s*$", re.IGNORECASE)
+_URL_SCHEME_PATTERN = re.compile(r"^[a-z][a-z0-9+.-]*://", re.IGNORECASE)
+
+
+def normalize_phone(value: str | None) -> str | None:
+    """
+    Best-effort E.164 ("+14155550123") from a transcribed phone number. Numbers starting with
+    + or 00 keep their country code; others get DEFAULT_PHONE_COUNTRY_CODE with a leading trunk 0
+    dropped. Returns None if there is no plausible number (E.164 allows 8 to 15 digits).
+    """
+    if not value:
+        return None
+    text = _PHONE_EXTENSION_PATTERN.sub("", value.strip())
+    digits = re.sub(r"\D", "", text)
+    if text.startswith("+"):
+        number = digits
+    elif digits.startswith("00"):
+        number = digits[2:]
+    elif DEFAULT_PHONE_COUNTRY_CODE:
+        number = DEFAULT_PHONE_COUNTRY_CODE + digits.lstrip("0")
+    else:
+        return None
+    return f"+{number}" if 8 <= len(number) <= 15 else None
+
+
+def normalize_email(value: str | None) -> Tuple[str | None, str | None]:
+    """(lowercased address, domain) or (None, None) if it doesn't look like an address."""
+    if not value:
+        return None, None
+    address = value.strip().lower()
+    if address.startswith("mailto:"):
+        address = address[len("mailto:"):]
+    local, _, domain = address.rpartition("@")
+    if not local or not domain or " " in address:
+        return None, None
+    return address, domain
+
+
+def normalize_website(value: str | None) -> Tuple[str | None, str | None]:
+    """(host + path without scheme, 'www.' or trailing slash, lowercased host) or (None, None)."""
+    if not value:
+        return None, None
+    url = _URL_SCHEME_PATTERN.sub("", value.strip())
+    host, _, path = url.partition("/")
+    host = host.split(":")[0].lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    if "." not in host or " " in host:
+        return None, None
+    path = path.split("?")[0].split("#")[0].rstrip("/")
+    return (f"{host}/{path}" if path else host), host
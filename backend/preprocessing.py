@@ -0,0 +1,107 @@
+# preprocessing.py
+
+import io
+import os
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image, ImageOps
+
+# --- Configuration ---
+IMAGE_PREPROCESS_ENABLED = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() in ("1", "true", "yes")
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048")) # Longest side in pixels, 0 disables
+IMAGE_GRAYSCALE = os.getenv("IMAGE_GRAYSCALE", "false").lower() in ("1", "true", "yes")
+IMAGE_AUTOCONTRAST = os.getenv("IMAGE_AUTOCONTRAST", "false").lower() in ("1", "true", "yes")
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "JPEG").upper() # JPEG or WEBP
+IMAGE_OUTPUT_QUALITY = int(os.getenv("IMAGE_OUTPUT_QUALITY", "85"))
+# Decoded bitmaps dominate peak memory (a 12 MP photo is ~36 MB as RGB), so cap parallel decodes
+IMAGE_PREPROCESS_CONCURRENCY = int(os.getenv("IMAGE_PREPROCESS_CONCURRENCY", "2"))
+
+OUTPUT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def config_signature() -> str:
+    """
+    Short description of the active settings. Preprocessing changes what the LLM sees,
+    so this is folded into the extraction cache key.
+    """
+    if not IMAGE_PREPROCESS_ENABLED:
+        return "raw"
+    return (f"max{IMAGE_MAX_DIMENSION}-{'gray' if IMAGE_GRAYSCALE else 'color'}"
+            f"-{'ac' if IMAGE_AUTOCONTRAST else 'noac'}-{IMAGE_OUTPUT_FORMAT.lower()}{IMAGE_OUTPUT_QUALITY}")
+
+
+def _pixel_bytes(image: Image.Image) -> int:
+    """Size of the decoded bitmap, used to report what each in-memory step saves."""
+    return image.width * image.height * len(image.getbands())
+
+
+def _record(steps: List[Dict[str, Any]], step: str, before: int, after: int):
+    steps.append({"step": step, "bytes_before": before, "bytes_after": after, "bytes_saved": before - after})
+
+
+def preprocess_image(image_bytes: bytes, mime_type: str) -> Tuple[bytes, str, Dict[str, Any]]:
+    """
+    Shrinks an upload before it is base64-encoded for the LLM:
+    EXIF auto-rotate -> downscale to IMAGE_MAX_DIMENSION -> optional grayscale/autocontrast
+    -> re-encode as IMAGE_OUTPUT_FORMAT at IMAGE_OUTPUT_QUALITY.
+
+    Returns (bytes, mime_type, report). The report lists per-step byte savings: decoded
+    bitmap size for the in-memory steps, encoded size for the final re-encode. If the image
+    cannot be decoded, or re-encoding would not make it smaller, the original is returned.
+    """
+    report: Dict[str, Any] = {"original_bytes": len(image_bytes), "output_bytes": len(image_bytes), "steps": [], "applied": False}
+    if not IMAGE_PREPROCESS_ENABLED:
+        return image_bytes, mime_type, report
+
+    output_format = IMAGE_OUTPUT_FORMAT if IMAGE_OUTPUT_FORMAT in OUTPUT_MIME_TYPES else "JPEG"
+    steps = report["steps"]
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        if IMAGE_MAX_DIMENSION and image.format == "JPEG":
+            # Let libjpeg decode at a reduced scale instead of inflating the full-size bitmap
+            image.draft("RGB", (IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+        image.load()
+
+        before = _pixel_bytes(image)
+        image = ImageOps.exif_transpose(image)
+        _record(steps, "exif_transpose", before, _pixel_bytes(image))
+
+        if IMAGE_MAX_DIMENSION and max(image.size) > IMAGE_MAX_DIMENSION:
+            before = _pixel_bytes(image)
+            image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.Resampling.LANCZOS)
+            _record(steps, "downscale", before, _pixel_bytes(image))
+
+        if IMAGE_GRAYSCALE and image.mode != "L":
+            before = _pixel_bytes(image)
+            image = ImageOps.grayscale(image)
+            _record(steps, "grayscale", before, _pixel_bytes(image))
+        elif image.mode not in ("RGB", "L"):
+            # Neither JPEG nor lossy WEBP keeps alpha/palette; flatten onto white like a paper page
+            before = _pixel_bytes(image)
+            rgba = image.convert("RGBA")
+            flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+            flattened.paste(rgba, mask=rgba.getchannel("A"))
+            image = flattened
+            _record(steps, "flatten", before, _pixel_bytes(image))
+
+        if IMAGE_AUTOCONTRAST:
+            # Pixel count is unchanged, but stretched contrast helps faint handwriting
+            before = _pixel_bytes(image)
+            image = ImageOps.autocontrast(image, cutoff=1)
+            _record(steps, "autocontrast", before, _pixel_bytes(image))
+
+        output = io.BytesIO()
+        image.save(output, format=output_format, quality=IMAGE_OUTPUT_QUALITY, optimize=True)
+        encoded = output.getvalue()
+    except Exception as e:
+        print(f"Warning: image preprocessing failed, sending original upload: {e}")
+        report["error"] = str(e)
+        return image_bytes, mime_type, report
+
+    _record(steps, f"encode_{output_format.lower()}", len(image_bytes), len(encoded))
+    if len(encoded) >= len(image_bytes):
+        return image_bytes, mime_type, report # Already compact (e.g. a small PNG); keep the original
+
+    report["output_bytes"] = len(encoded)
+    report["applied"] = True
+    return encoded, OUTPUT_MIME_TYPES[output_format], report
@@ -0,0 +1,178 @@
+# queries.py
+
+import base64
+import json
+from datetime import date, time, timedelta
+from typing import Any, List, Tuple
+
+from sqlalchemy import String, or_, select, tuple_, type_coerce
+from sqlalchemy.orm import Query
+
+from database import BusinessCard, BusinessCardContact, VisitorLogEntry
+from normalization import normalize_email, normalize_phone
+
+# --- Pagination Configuration ---
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+# --- Helpers ---
+
+def _stored_text(column):
+    """
+    SQLite keeps DateTime columns as ISO-8601 text. Comparing that text directly (rather than
+    through cast()/date()) leaves the predicate sargable, so the created_at index is used.
+    """
+    return type_coerce(column, String)
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def created_at_range(column, start_date: date | None, end_date: date | None) -> List[Any]:
+    """
+    Half-open day range [start_date 00:00, end_date + 1 day 00:00) on a created_at column.
+    A bare 'YYYY-MM-DD' sorts before every timestamp of that day, so no time-of-day
+    formatting assumptions are needed.
+    """
+    predicates = []
+    if start_date:
+        predicates.append(_stored_text(column) >= start_date.isoformat())
+    if end_date:
+        predicates.append(_stored_text(column) < (end_date + timedelta(days=1)).isoformat())
+    return predicates
+
+
+# --- Cursors ---
+
+def encode_cursor(created_at_text: str, row_id: int) -> str:
+    """Opaque keyset cursor holding the (created_at, id) of the last row returned."""
+    return base64.urlsafe_b64encode(json.dumps([created_at_text, row_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverse of encode_cursor. Raises ValueError on anything malformed."""
+    try:
+        created_at_text, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(created_at_text, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor contents.")
+    return created_at_text, row_id
+
+
+def paginate(query: Query, model, cursor: str | None, limit: int) -> Tuple[List[Any], str | None]:
+    """
+    Keyset pagination, newest first, ordered by (created_at, id) so it walks the
+    (created_at, id) index. `query` selects columns (see serialization.projected_columns), one
+    of them labelled "id". Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    created_at_text = _stored_text(model.created_at)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_at_text, model.id) < tuple_(last_created_at, last_id))
+
+    rows = (
+        query.add_columns(created_at_text.label("created_at_text"))
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit + 1) # One extra row tells us whether another page exists
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at_text, rows[-1].id) if has_more else None
+    return rows, next_cursor
+
+
+# --- Per-table Filters ---
+
+def _cards_with_contact(kind: str, normalized: str | None = None, domain: str | None = None):
+    """Card ids with a matching contact, answered from the (kind, normalized|domain, card_id) indexes."""
+    query = select(BusinessCardContact.card_id).where(BusinessCardContact.kind == kind)
+    if normalized is not None:
+        query = query.where(BusinessCardContact.normalized == normalized)
+    if domain is not None:
+        query = query.where(BusinessCardContact.domain == domain)
+    return query
+
+
+def filter_business_cards(
+    query: Query,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    name: str | None = None,
+    company: str | None = None,
+    email_domain: str | None = None,
+    email: str | None = None,
+    phone: str | None = None,
+) -> Query:
+    query = query.filter(*created_at_range(BusinessCard.created_at, start_date, end_date))
+    if name:
+        query = query.filter(BusinessCard.name.like(f"{_like_escape(name)}%", escape="\\"))
+    if company:
+        # Cards have no dedicated company field; it shows up in the title, website, email or address
+        pattern = f"%{_like_escape(company)}%"
+        query = query.filter(or_(
+            BusinessCard.title.like(pattern, escape="\\"),
+            BusinessCard.website.like(pattern, escape="\\"),
+            BusinessCard.email.like(pattern, escape="\\"),
+            BusinessCard.address.like(pattern, escape="\\"),
+        ))
+    if email_domain:
+        query = query.filter(BusinessCard.id.in_(_cards_with_contact("email", domain=email_domain.lstrip("@").lower())))
+    if email:
+        query = query.filter(BusinessCard.id.in_(_cards_with_contact("email", normalized=normalize_email(email)[0] or email.strip().lower())))
+    if phone:
+        normalized_phone = normalize_phone(phone)
+        if normalized_phone is None:
+            raise ValueError("phone must include a country code (or set DEFAULT_PHONE_COUNTRY_CODE).")
+        query = query.filter(BusinessCard.id.in_(_cards_with_contact("phone", normalized=normalized_phone)))
+    return query
+
+
+def filter_visitor_logs(
+    query: Query,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    visitor_name: str | None = None,
+    batch_id: str | None = None,
+    visit_date_from: date | None = None,
+    visit_date_to: date | None = None,
+    on_site_from: time | None = None,
+    on_site_until: time | None = None,
+    arrived_from: time | None = None,
+    arrived_until: time | None = None,
+    min_duration_minutes: int | None = None,
+    max_duration_minutes: int | None = None,
+) -> Query:
+    """
+    start_date/end_date filter on when the entry was stored; the visit_* and time filters use the
+    typed columns parsed from the register (entries whose date or times couldn't be read never match them).
+    on_site_from/on_site_until select visitors present at some point in that window: arrived by
+    on_site_until and not signed out before on_site_from (no sign-out counts as still on site).
+    """
+    query = query.filter(*created_at_range(VisitorLogEntry.created_at, start_date, end_date))
+    if visitor_name:
+        query = query.filter(VisitorLogEntry.visitor_name.like(f"{_like_escape(visitor_name)}%", escape="\\"))
+    if batch_id:
+        query = query.filter(VisitorLogEntry.batch_id == batch_id)
+    if visit_date_from:
+        query = query.filter(VisitorLogEntry.visit_date >= visit_date_from)
+    if visit_date_to:
+        query = query.filter(VisitorLogEntry.visit_date <= visit_date_to)
+    if on_site_from or on_site_until:
+        query = query.filter(VisitorLogEntry.time_in_at.isnot(None))
+    if on_site_until:
+        query = query.filter(VisitorLogEntry.time_in_at <= on_site_until)
+    if on_site_from:
+        query = query.filter(or_(VisitorLogEntry.time_out_at.is_(None), VisitorLogEntry.time_out_at >= on_site_from))
+    if arrived_from:
+        query = query.filter(VisitorLogEntry.time_in_at >= arrived_from)
+    if arrived_until:
+        query = query.filter(VisitorLogEntry.time_in_at <= arrived_until)
+    if min_duration_minutes is not None:
+        query = query.filter(VisitorLogEntry.duration_minutes >= min_duration_minutes)
+    if max_duration_minutes is not None:
+        query = query.filter(VisitorLogEntry.duration_minutes <= max_duration_minutes)
+    return query
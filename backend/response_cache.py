@@ -0,0 +1,112 @@
+# response_cache.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Tuple
+
+# --- Configuration ---
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+
+class CachedPage(NamedTuple):
+    body: bytes
+    media_type: str
+    next_cursor: str | None
+
+
+def make_etag(table_name: str, version: int, signature: str) -> str:
+    """
+    Weak ETag for one page of a table: changes whenever the table version does (every write
+    through database.add_documents_bulk), and differs per query string and response format.
+    """
+    digest = hashlib.sha256(signature.encode("utf-8")).hexdigest()[:16]
+    return f'W/"{table_name}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for GET): '*' or any listed tag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class ResponseCache:
+    """
+    In-process LRU of serialized read-endpoint pages, bounded by total body size.
+    Keys carry the table version, so a write makes older entries unreachable; they are
+    purged as soon as a newer version of that table is seen (or invalidate() is called).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, int, str], CachedPage]" = OrderedDict()
+        self._latest_versions: Dict[str, int] = {}
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def _drop(self, key: Tuple[str, int, str]):
+        self._current_bytes -= len(self._entries.pop(key).body)
+
+    def _observe_version(self, table_name: str, version: int):
+        """Purges entries for older versions of the table the first time a newer one shows up."""
+        if version > self._latest_versions.get(table_name, -1):
+            self._latest_versions[table_name] = version
+            stale = [key for key in self._entries if key[0] == table_name and key[1] < version]
+            for key in stale:
+                self._drop(key)
+            self.stats["invalidations"] += len(stale)
+
+    def get(self, table_name: str, version: int, signature: str) -> CachedPage | None:
+        key = (table_name, version, signature)
+        with self._lock:
+            self._observe_version(table_name, version)
+            page = self._entries.get(key)
+            if page is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return page
+
+    def put(self, table_name: str, version: int, signature: str, page: CachedPage):
+        key = (table_name, version, signature)
+        with self._lock:
+            self._observe_version(table_name, version)
+            if version < self._latest_versions[table_name] or len(page.body) > self.max_bytes:
+                return # Already stale, or large enough to flush everything else
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = page
+            self._current_bytes += len(page.body)
+            self.stats["stores"] += 1
+            while self._current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted.body)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, table_name: str | None = None):
+        """Drops every entry for `table_name` (or all tables), e.g. right after a local write."""
+        with self._lock:
+            stale = [key for key in self._entries if table_name is None or key[0] == table_name]
+            for key in stale:
+                self._drop(key)
+            self.stats["invalidations"] += len(stale)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "table_versions": dict(self._latest_versions),
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
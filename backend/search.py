@@ -0,0 +1,123 @@
+# search.py
+
+import re
+from datetime import date
+from typing import Any, Dict, List
+
+from sqlalchemy import column, func, literal_column, table
+from sqlalchemy.orm import Session
+
+from database import BusinessCard, VisitorLogEntry, SEARCH_INDEXES, search_index_name, search_index_kinds
+from queries import created_at_range
+
+# --- Search Configuration ---
+SEARCH_MODES = ("auto", "prefix", "fuzzy") # auto: prefix matches first, topped up with fuzzy ones
+SEARCH_SCOPES = ("all",) + tuple(SEARCH_INDEXES)
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+SEARCH_MODELS = {"business_cards": BusinessCard, "visitor_logs": VisitorLogEntry}
+# bm25 column weights: a hit in a name outranks one in an address
+COLUMN_WEIGHTS = {"name": 10.0, "visitor_name": 10.0, "title": 4.0, "email": 3.0, "website": 3.0, "address": 2.0}
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchUnavailable(Exception):
+    """The FTS5 index needed for a query does not exist on this database."""
+
+
+# --- MATCH Expressions ---
+
+def prefix_match_expression(query_text: str) -> str | None:
+    """Every word must match as a token prefix: 'acm jo' -> '"acm"* "jo"*' (implicit AND)."""
+    words = _WORD_PATTERN.findall(query_text)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def fuzzy_match_expression(query_text: str) -> str | None:
+    """
+    Any trigram of any word may match: bm25 then ranks rows sharing the most trigrams first,
+    which tolerates typos and partial words ('gonzales' still finds 'Gonzalez'). Words under 3 characters are ignored.
+    """
+    trigrams = []
+    for word in _WORD_PATTERN.findall(query_text.lower()):
+        trigrams.extend(word[i:i + 3] for i in range(len(word) - 2))
+    return " OR ".join(f'"{trigram}"' for trigram in dict.fromkeys(trigrams)) or None
+
+
+# --- Queries ---
+
+def _search_index(
+    db: Session,
+    index_key: str,
+    kind: str,
+    match: str,
+    limit: int,
+    start_date: date | None,
+    end_date: date | None,
+    exclude_ids: set[int],
+) -> List[tuple]:
+    """Top `limit` (id, bm25 score) pairs from one FTS table; lower scores rank higher."""
+    model = SEARCH_MODELS[index_key]
+    fts_name = search_index_name(index_key, kind)
+    fts_table = table(fts_name, column("rowid"))
+    fts_ref = literal_column(fts_name)
+    score = func.bm25(fts_ref, *(COLUMN_WEIGHTS[name] for name in SEARCH_INDEXES[index_key]["columns"]))
+    query = (
+        db.query(model.id, score.label("score"))
+        .select_from(fts_table)
+        .join(model, model.id == fts_table.c.rowid)
+        .filter(fts_ref.op("MATCH")(match))
+        .filter(*created_at_range(model.created_at, start_date, end_date))
+    )
+    if exclude_ids:
+        query = query.filter(model.id.notin_(exclude_ids))
+    return query.order_by(score).limit(limit).all()
+
+
+def search_records(
+    db: Session,
+    query_text: str,
+    mode: str = "auto",
+    scope: str = "all",
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    start_date: date | None = None,
+    end_date: date | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Ranked full-text search over business cards and/or visitor log entries.
+    Returns [{"index", "id", "score", "match"}] best first, where score is the negated
+    bm25 value (higher is better) and match is "prefix" or "fuzzy".
+    Raises ValueError for a bad mode/scope and SearchUnavailable if the index is missing.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(SEARCH_MODES)}.")
+    if scope not in SEARCH_SCOPES:
+        raise ValueError(f"scope must be one of: {', '.join(SEARCH_SCOPES)}.")
+
+    index_keys = list(SEARCH_INDEXES) if scope == "all" else [scope]
+    passes = []
+    if mode in ("auto", "prefix"):
+        passes.append(("prefix", "fts", prefix_match_expression(query_text)))
+    if mode in ("auto", "fuzzy"):
+        passes.append(("fuzzy", "trigram", fuzzy_match_expression(query_text)))
+
+    results: List[Dict[str, Any]] = []
+    seen: Dict[str, set[int]] = {index_key: set() for index_key in index_keys}
+    for match_name, kind, match in passes:
+        if match is None or len(results) >= limit:
+            continue
+        if kind not in search_index_kinds:
+            if mode == "auto" and results:
+                continue # Prefix results are still useful without the fuzzy index
+            raise SearchUnavailable(f"The '{kind}' full-text index is not available on this database.")
+        found = []
+        for index_key in index_keys:
+            for record_id, score in _search_index(db, index_key, kind, match, limit - len(results), start_date, end_date, seen[index_key]):
+                found.append({"index": index_key, "id": record_id, "score": round(-score, 6), "match": match_name})
+        # bm25 values from different passes aren't comparable, so later passes only fill remaining slots
+        found.sort(key=lambda result: result["score"], reverse=True)
+        for result in found[:limit - len(results)]:
+            seen[result["index"]].add(result["id"])
+            results.append(result)
+    return results
@@ -0,0 +1,126 @@
+# serialization.py
+"""
+Fast path for turning stored rows into response bodies.
+
+Read endpoints select only the columns they return (tuples, no ORM objects), keep timestamps
+as the text SQLite already stores, and turn each tuple into a dict with an encoder compiled
+once per model. Bodies are encoded with orjson (stdlib json if it is missing), or msgpack
+when the client asks for it and the package is installed.
+"""
+
+import json
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import Date, DateTime, String, Time, select, type_coerce
+from sqlalchemy.orm import Session
+
+from database import BusinessCard, BusinessCardContact, VisitorLogEntry, CONTACT_KINDS
+
+try:
+    import orjson
+except ImportError: # Optional speed-up; the stdlib encoder produces the same JSON
+    orjson = None
+
+try:
+    import msgpack
+except ImportError: # Optional; without it every client gets JSON
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+# --- Projections & Row Encoders ---
+
+def _iso_timestamp(stored: str | None) -> str | None:
+    """SQLite stores 'YYYY-MM-DD HH:MM:SS[.ffffff]'; its ISO-8601 form only differs by the 'T'."""
+    return stored.replace(" ", "T", 1) if stored else None
+
+
+def projected_columns(model) -> List[Any]:
+    """
+    Every table column in declaration order, labelled with its name. Date, time and timestamp
+    columns are read as their stored text so SQLAlchemy never parses them into Python objects.
+    """
+    return [
+        type_coerce(column, String).label(column.name) if isinstance(column.type, (Date, DateTime, Time)) else column.label(column.name)
+        for column in model.__table__.columns
+    ]
+
+
+def compile_row_encoder(model) -> Callable[[Sequence[Any]], Dict[str, Any]]:
+    """
+    Builds `encode(row) -> dict` for rows of projected_columns(model): a generated function with
+    one dict literal and fixed tuple indexes, so per row there is no loop over column metadata.
+    """
+    fields = []
+    for index, column in enumerate(model.__table__.columns):
+        value = f"row[{index}]"
+        if isinstance(column.type, DateTime):
+            value = f"_iso_timestamp({value})"
+        fields.append(f"{column.name!r}: {value}")
+    source = f"def encode(row):\n    return {{{', '.join(fields)}}}\n"
+    namespace = {"_iso_timestamp": _iso_timestamp}
+    exec(compile(source, f"<row encoder {model.__tablename__}>", "exec"), namespace)
+    return namespace["encode"]
+
+
+_encode_business_card = compile_row_encoder(BusinessCard)
+_encode_visitor_log = compile_row_encoder(VisitorLogEntry)
+
+
+# --- Per-model Serializers ---
+
+def business_card_dicts(db: Session, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    """
+    Response dicts for projected business card rows. Contact lists are filled from one
+    query on business_card_contacts for the whole page.
+    """
+    cards = [_encode_business_card(row) for row in rows]
+    if not cards:
+        return cards
+    contacts: Dict[Tuple[int, str], List[str]] = defaultdict(list)
+    contact_rows = db.connection().execute( # Core execution: plain tuples, no ORM result processing
+        select(BusinessCardContact.card_id, BusinessCardContact.kind, BusinessCardContact.value)
+        .where(BusinessCardContact.card_id.in_([card["id"] for card in cards]))
+        .order_by(BusinessCardContact.card_id, BusinessCardContact.kind, BusinessCardContact.position)
+    ).all()
+    for card_id, kind, value in contact_rows:
+        contacts[(card_id, kind)].append(value)
+    for card in cards:
+        for kind in CONTACT_KINDS:
+            # A field the card never had stays null, as it was in the stored JSON column
+            values = contacts.get((card["id"], kind))
+            card[kind] = values if values else ([] if card[kind] is not None else None)
+    return cards
+
+
+def visitor_log_dicts(db: Session, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+    return [_encode_visitor_log(row) for row in rows]
+
+
+SERIALIZERS = {BusinessCard: business_card_dicts, VisitorLogEntry: visitor_log_dicts}
+
+
+def load_dicts_by_id(db: Session, model, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Response dicts for specific rows (e.g. search hits), keyed by id."""
+    if not ids:
+        return {}
+    rows = db.connection().execute(select(*projected_columns(model)).where(model.id.in_(ids))).all()
+    return {record["id"]: record for record in SERIALIZERS[model](db, rows)}
+
+
+# --- Body Encoding ---
+
+def wants_msgpack(accept_header: str | None) -> bool:
+    return msgpack is not None and bool(accept_header) and any(media_type in accept_header for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def encode_body(payload: Any, accept_header: str | None = None) -> Tuple[bytes, str]:
+    """(body, media_type) for `payload`, honouring an Accept header that asks for msgpack."""
+    if wants_msgpack(accept_header):
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK_MEDIA_TYPES[0]
+    if orjson is not None:
+        return orjson.dumps(payload), JSON_MEDIA_TYPE
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8"), JSON_MEDIA_TYPE
@@ -0,0 +1,114 @@
+# streaming.py
+"""
+Incremental parsing of a streamed extraction response.
+
+The LLM answers with one JSON object, {"type": ..., "data": ...}. For visitor registers `data`
+is a list of row objects; IncrementalExtractionParser scans the text as it arrives and hands
+back each row the moment its closing brace is seen, so rows can be validated and shown long
+before the whole response (and its final validation) is done.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+from validation import coerce_llm_output, validate_visitor_register_data
+
+
+class IncrementalExtractionParser:
+    """
+    Character-level scanner over the top-level object. It tracks string/escape state and nesting
+    depth only, so it never re-parses what it has already seen; complete pieces are handed to
+    json.loads. feed() returns events:
+        ("type", "visitor_register")   once the top-level "type" value is complete
+        ("entry", index, {...})        for every complete object inside a top-level "data" list
+    Malformed input never raises here; the full text is still validated once the stream ends.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.document_type: str | None = None
+        self.entries_seen = 0
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = -1
+        self._expect_key = False
+        self._current_key: str | None = None
+        self._data_is_list = False
+        self._entry_start = -1
+
+    def feed(self, chunk: str) -> List[Tuple[Any, ...]]:
+        self.text += chunk
+        events: List[Tuple[Any, ...]] = []
+        text = self.text
+        for position in range(self._position, len(text)):
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string_end(position, events)
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = position
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = char == "{"
+                elif self._depth == 2 and self._current_key == "data" and char == "[":
+                    self._data_is_list = True
+                elif self._depth == 3 and self._data_is_list and char == "{":
+                    self._entry_start = position
+            elif char in "}]":
+                if self._depth == 3 and self._entry_start != -1 and char == "}":
+                    self._on_entry_end(position, events)
+                elif self._depth == 2 and self._data_is_list and char == "]":
+                    self._data_is_list = False
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                self._expect_key = True
+                self._current_key = None
+        self._position = len(text)
+        return events
+
+    def _on_string_end(self, position: int, events: List[Tuple[Any, ...]]):
+        if self._depth != 1:
+            return
+        try:
+            value = json.loads(self.text[self._string_start:position + 1])
+        except ValueError:
+            return
+        if self._expect_key:
+            self._current_key = value
+            self._expect_key = False
+        elif self._current_key == "type" and self.document_type is None:
+            self.document_type = value
+            events.append(("type", value))
+
+    def _on_entry_end(self, position: int, events: List[Tuple[Any, ...]]):
+        try:
+            entry = json.loads(self.text[self._entry_start:position + 1])
+        except ValueError:
+            entry = None
+        self._entry_start = -1
+        if isinstance(entry, dict):
+            events.append(("entry", self.entries_seen, entry))
+        self.entries_seen += 1
+
+
+def check_streamed_entry(entry: Dict[str, Any]) -> Tuple[Dict[str, Any] | None, str | None]:
+    """
+    Runs one streamed visitor row through the same coercion and validation as a full response.
+    Returns (entry, None) if it is valid on its own, or (None, error).
+    """
+    coerced, _ = coerce_llm_output({"type": "visitor_register", "data": [entry]})
+    entries = coerced["data"]
+    is_valid, error = validate_visitor_register_data(entries)
+    if not is_valid:
+        return None, error
+    return entries[0], None
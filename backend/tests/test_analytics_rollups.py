@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+# database.py reads DATABASE_URL at import time, so point it at a scratch file first
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'rollups.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database # noqa: E402
+from analytics import rebuild_rollups # noqa: E402
+from database import DailyRollup, HourlyRollup, SessionLocal, VisitorRollup, add_documents_bulk # noqa: E402
+
+database.create_db_and_tables()
+
+
+def _register(*entries):
+    return {"type": "visitor_register", "data": [
+        {"date": day, "visitor_name": name, "address": "", "time_in": "09:00", "time_out": "10:00"}
+        for day, name in entries
+    ]}
+
+
+def _snapshot(db):
+    return {
+        "visitors": sorted((row.visitor_key, row.visitor_name, row.visits, row.last_visit_day) for row in db.query(VisitorRollup)),
+        "daily": sorted((row.day, row.visits, row.cards, row.duration_minutes_total, row.duration_samples) for row in db.query(DailyRollup)),
+        "hourly": sorted((row.day, row.hour, row.arrivals) for row in db.query(HourlyRollup)),
+    }
+
+
+def test_out_of_order_registers_match_rebuild():
+    db = SessionLocal()
+    try:
+        # Newer visit stored first, then older registers with other spellings
+        add_documents_bulk(db, [_register(("05/03/2024", "Ann Lee"))])
+        add_documents_bulk(db, [_register(("02/02/2022", "ANN LEE"))])
+        add_documents_bulk(db, [_register(("01/01/2023", "ann lee"), ("03/03/2023", "ann lee"))])
+
+        incremental = _snapshot(db)
+        rebuild_rollups(db)
+        assert incremental == _snapshot(db)
+
+        (visitor,) = db.query(VisitorRollup).all()
+        assert visitor.visits == 4
+        assert visitor.last_visit_day.isoformat() == "2024-03-05"
+        assert visitor.visitor_name == "Ann Lee"
+    finally:
+        db.close()
@@ -0,0 +1,182 @@
+# tiling.py
+"""
+Splitting large documents into pieces the LLM can extract within one call, and merging the
+visitor rows back together.
+
+A document becomes pages (multi-frame TIFFs, PDFs via the optional PyMuPDF package, or a single
+image), and a page can be cut into horizontal bands that overlap by TILE_OVERLAP_FRACTION so no
+handwritten row is lost at a cut. Rows read twice in an overlap are removed by merge_visitor_rows.
+"""
+
+import io
+import math
+import os
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, NamedTuple
+
+from PIL import Image, ImageOps, ImageSequence
+
+try:
+    import fitz # PyMuPDF
+except ImportError: # Optional; without it PDFs are rejected with a clear error
+    fitz = None
+
+# --- Configuration ---
+TILE_BAND_HEIGHT_PX = int(os.getenv("TILE_BAND_HEIGHT_PX", "1200"))          # Target band height when the band count is automatic
+TILE_OVERLAP_FRACTION = float(os.getenv("TILE_OVERLAP_FRACTION", "0.15"))    # Of a band's height, shared with the next band
+TILE_MAX_BANDS = int(os.getenv("TILE_MAX_BANDS", "8"))                       # Per page
+TILE_MAX_PAGES = int(os.getenv("TILE_MAX_PAGES", "20"))
+TILE_MAX_PARALLEL = int(os.getenv("TILE_MAX_PARALLEL", "4"))                 # Tiles of one document extracted at once
+TILE_PDF_DPI = int(os.getenv("TILE_PDF_DPI", "150"))
+TILE_SEAM_ROWS = 3 # Rows on each side of a cut compared for duplicates
+TILE_NAME_SIMILARITY = 0.85
+
+MULTI_PAGE_MIME_TYPES = ["application/pdf", "image/tiff"]
+TILE_MIME_TYPE = "image/jpeg"
+TILE_JPEG_QUALITY = 92
+
+
+class Tile(NamedTuple):
+    image_bytes: bytes
+    mime_type: str
+    page: int
+    band: int
+    bands: int
+
+
+def config_signature() -> str:
+    """Tiling settings that change the merged result; folded into the extraction cache key."""
+    return f"band{TILE_BAND_HEIGHT_PX}-ov{TILE_OVERLAP_FRACTION}-pdf{TILE_PDF_DPI}"
+
+
+# --- Splitting ---
+
+def _encode(image: Image.Image) -> bytes:
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=TILE_JPEG_QUALITY)
+    return output.getvalue()
+
+
+def load_pages(document_bytes: bytes, mime_type: str) -> List[Image.Image]:
+    """
+    Decoded pages of an upload, upright. Raises ValueError for documents that can't be split
+    (unreadable, too many pages, or a PDF without PyMuPDF installed).
+    """
+    if mime_type == "application/pdf":
+        if fitz is None:
+            raise ValueError("PDF uploads require the optional PyMuPDF package (pip install pymupdf).")
+        with fitz.open(stream=document_bytes, filetype="pdf") as pdf:
+            if pdf.page_count > TILE_MAX_PAGES:
+                raise ValueError(f"Document has {pdf.page_count} pages; the limit is {TILE_MAX_PAGES}.")
+            pages = []
+            for page in pdf:
+                pixmap = page.get_pixmap(dpi=TILE_PDF_DPI)
+                pages.append(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples))
+            return pages
+
+    try:
+        image = Image.open(io.BytesIO(document_bytes))
+        pages = []
+        for frame in ImageSequence.Iterator(image):
+            if len(pages) >= TILE_MAX_PAGES:
+                raise ValueError(f"Document has more than {TILE_MAX_PAGES} pages.")
+            pages.append(ImageOps.exif_transpose(frame.copy()))
+        return pages
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Could not read the document: {e}")
+
+
+def band_boxes(height: int, bands: int, overlap_fraction: float = TILE_OVERLAP_FRACTION) -> List[tuple]:
+    """(top, bottom) pixel rows of `bands` equal bands covering `height`, each sharing overlap_fraction with the next."""
+    if bands <= 1:
+        return [(0, height)]
+    band_height = height / (bands - (bands - 1) * overlap_fraction)
+    step = band_height * (1 - overlap_fraction)
+    return [(round(index * step), min(height, round(index * step + band_height))) for index in range(bands)]
+
+
+def auto_band_count(height: int) -> int:
+    """Bands used when a page was too dense for one call: at least two, about TILE_BAND_HEIGHT_PX each."""
+    return max(2, min(TILE_MAX_BANDS, math.ceil(height / TILE_BAND_HEIGHT_PX)))
+
+
+def split_page(page: Image.Image, page_index: int, bands: int) -> List[Tile]:
+    bands = max(1, min(bands, TILE_MAX_BANDS))
+    boxes = band_boxes(page.height, bands)
+    return [
+        Tile(_encode(page.crop((0, top, page.width, bottom))), TILE_MIME_TYPE, page_index, band_index, len(boxes))
+        for band_index, (top, bottom) in enumerate(boxes)
+    ]
+
+
+def split_document(document_bytes: bytes, mime_type: str, bands: int | None = None) -> List[Tile]:
+    """
+    Pages of the document, each cut into `bands` bands (None or 1: whole pages).
+    Blocking Pillow/PyMuPDF work; run it in a thread.
+    """
+    tiles: List[Tile] = []
+    for page_index, page in enumerate(load_pages(document_bytes, mime_type)):
+        tiles.extend(split_page(page, page_index, bands or 1))
+    return tiles
+
+
+def split_image_into_bands(image_bytes: bytes, mime_type: str, bands: int | None = None) -> List[Tile]:
+    """Bands of a single-page image; `bands` defaults to auto_band_count for its height."""
+    page = load_pages(image_bytes, mime_type)[0]
+    return split_page(page, 0, bands or auto_band_count(page.height))
+
+
+# --- Merging ---
+
+def _normalized(value: Any) -> str:
+    return re.sub(r"\s+", " ", str(value)).strip().casefold() if value is not None else ""
+
+
+def _same_row(first: Dict[str, Any], second: Dict[str, Any]) -> bool:
+    """
+    The same register line read from both sides of a cut: similar visitor names, and no field
+    that both readings filled in disagrees (one side often misses a half-cut time or address).
+    """
+    first_name, second_name = _normalized(first.get("visitor_name")), _normalized(second.get("visitor_name"))
+    if not first_name or not second_name:
+        return False
+    if SequenceMatcher(None, first_name, second_name).ratio() < TILE_NAME_SIMILARITY:
+        return False
+    for key in ("date", "time_in", "time_out"):
+        first_value, second_value = _normalized(first.get(key)), _normalized(second.get(key))
+        if first_value and second_value and first_value != second_value:
+            return False
+    return True
+
+
+def _filled_fields(row: Dict[str, Any]) -> int:
+    return sum(1 for value in row.values() if value not in (None, ""))
+
+
+def merge_visitor_rows(tile_rows: List[List[Dict[str, Any]]], tiles: List[Tile]) -> List[Dict[str, Any]]:
+    """
+    Concatenates rows in page/band order. Where two bands of the same page meet, the last
+    TILE_SEAM_ROWS rows above the cut are matched against the first rows below it; a matched
+    pair is kept once, preferring the more complete reading.
+    """
+    merged: List[Dict[str, Any]] = []
+    previous_tile: Tile | None = None
+    previous_count = 0
+    for tile, rows in zip(tiles, tile_rows):
+        rows = list(rows)
+        if previous_tile is not None and previous_tile.page == tile.page and previous_count:
+            seam_start = len(merged) - min(TILE_SEAM_ROWS, previous_count)
+            for candidate in list(rows[:TILE_SEAM_ROWS]):
+                match = next((index for index in range(seam_start, len(merged)) if _same_row(merged[index], candidate)), None)
+                if match is None:
+                    continue
+                if _filled_fields(candidate) > _filled_fields(merged[match]):
+                    merged[match] = candidate
+                rows.remove(candidate)
+                seam_start = match + 1 # Rows keep their order, so later matches lie further down
+        merged.extend(rows)
+        previous_tile, previous_count = tile, len(rows)
+    return merged
@@ -0,0 +1,82 @@
+# uploads.py
+
+import os
+import json
+from typing import Dict
+
+from fastapi import HTTPException, UploadFile, status
+
+# --- Configuration ---
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024))) # Per image
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(500 * 1024 * 1024))) # Whole batch request
+MULTIPART_OVERHEAD_BYTES = 64 * 1024 # Room for multipart boundaries and part headers
+
+
+def _limit_message(limit: int) -> str:
+    return f"Request body exceeds the upload limit of {limit} bytes."
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Rejects oversized request bodies on upload routes before they are parsed.
+    A declared Content-Length over the limit is refused without reading the body;
+    chunked or mis-declared bodies are cut off as soon as the running total exceeds it.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" and scope.get("method") == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    if int(value) > limit:
+                        await self._reject(send, limit)
+                        return
+                except ValueError:
+                    pass
+                break
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPExceptions from body parsing, so this becomes a normal 413
+                    raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=_limit_message(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({"detail": _limit_message(limit)}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_CONTENT_TOO_LARGE,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_upload_limited(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Reads an upload from its spooled temp file, failing with 413 when it exceeds `max_bytes`.
+    A single bounded read (at most max_bytes + 1) yields one bytes object with no chunk-join copy.
+    """
+    too_large = HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=f"File exceeds the upload limit of {max_bytes} bytes.")
+    if upload.size is not None and upload.size > max_bytes:
+        raise too_large
+    data = await upload.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise too_large
+    return data
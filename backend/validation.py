@@ -1,5 +1,7 @@
 # validation.py
 
+import json
+import re
 from typing import Any, Tuple, List, Dict, Union
 
 def validate_business_card_data(data: Dict[str, Any]) -> Tuple[bool, Union[str, None]]:
@@ -67,4 +69,198 @@ def validate_visitor_register_data(data: List[Dict[str, Any]]) -> Tuple[bool, Un
             if value is not None and not isinstance(value, str):
                  return False, f"Invalid type for '{key}' in entry at index {i}, expected string or null."
 
-    return True, None # Data is valid
\ No newline at end of file
+    return True, None # Data is valid
+
+# --- LLM Output Repair ---
+# Deterministic fixes for the ways model output usually misses the schema (code fences, trailing
+# commas, a bare phone string instead of a list, a dropped null key). Only values that would fail
+# validation are touched, so output that is already valid passes through unchanged.
+BUSINESS_CARD_KEYS = ("name", "title", "phone", "email", "website", "address")
+BUSINESS_CARD_LIST_KEYS = ("phone", "email", "website")
+VISITOR_ENTRY_KEYS = ("date", "visitor_name", "address", "time_in", "time_out")
+DOCUMENT_TYPE_ALIASES = {
+    "businesscard": "business_card",
+    "card": "business_card",
+    "visitor_log": "visitor_register",
+    "visitor_book": "visitor_register",
+    "register": "visitor_register",
+}
+
+_CODE_FENCE_PATTERN = re.compile(r"^\s*```[\w-]*\s*(.*?)\s*```\s*$", re.DOTALL)
+_TRAILING_COMMA_PATTERN = re.compile(r",(\s*[}\]])")
+
+
+def parse_llm_json(text: str | None) -> Tuple[Any, List[str]]:
+    """
+    json.loads with fallbacks for code fences, prose around the object and trailing commas.
+    Returns (parsed value, repairs applied); raises ValueError if the text still isn't JSON.
+    """
+    if not text or not text.strip():
+        raise ValueError("LLM response was empty.")
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError:
+        pass
+
+    repairs = []
+    candidate = text
+    fenced = _CODE_FENCE_PATTERN.match(candidate)
+    if fenced:
+        candidate = fenced.group(1)
+        repairs.append("stripped code fence")
+    start, end = candidate.find("{"), candidate.rfind("}")
+    if start != -1 and end > start and (start > 0 or end < len(candidate) - 1):
+        candidate = candidate[start:end + 1]
+        repairs.append("trimmed text around JSON object")
+    for fix in (None, "removed trailing commas"):
+        if fix:
+            candidate = _TRAILING_COMMA_PATTERN.sub(r"\1", candidate)
+            repairs.append(fix)
+        try:
+            return json.loads(candidate), repairs
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("LLM response was not valid JSON.")
+
+
+def _coerce_text(value: Any) -> Any:
+    """Numbers become strings and lists of strings are joined; anything else is left for validation to report."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, list) and all(isinstance(item, (str, int, float)) and not isinstance(item, bool) for item in value):
+        return ", ".join(str(item) for item in value)
+    return value
+
+
+def _coerce_text_list(value: Any) -> Any:
+    """A bare string or number becomes a one-item list; null and numeric items are cleaned up."""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        value = str(value)
+    if isinstance(value, str):
+        return [value] if value.strip() else None
+    if isinstance(value, list):
+        return [str(item) if isinstance(item, (int, float)) and not isinstance(item, bool) else item for item in value if item is not None]
+    return value
+
+
+def _coerce_fields(record: Dict[str, Any], keys, list_keys, repairs: List[str], label: str) -> Dict[str, Any]:
+    coerced = dict(record)
+    for key in keys:
+        if key not in coerced:
+            coerced[key] = None
+            repairs.append(f"added missing '{key}'{label}")
+            continue
+        coerce = _coerce_text_list if key in list_keys else _coerce_text
+        value = coerce(coerced[key])
+        if value != coerced[key]:
+            coerced[key] = value
+            repairs.append(f"coerced '{key}'{label}")
+    return coerced
+
+
+def coerce_llm_output(llm_output: Any) -> Tuple[Any, List[str]]:
+    """
+    Fixes the document type spelling and the shape of `data` ({"type", "data"} as the extraction
+    prompt asks for). Returns (coerced output, repairs applied); unfixable output is returned as is.
+    """
+    repairs: List[str] = []
+    if not isinstance(llm_output, dict):
+        return llm_output, repairs
+    if "type" not in llm_output and "data" not in llm_output and set(llm_output) & set(BUSINESS_CARD_KEYS):
+        llm_output = {"type": "business_card", "data": llm_output}
+        repairs.append("wrapped bare business card")
+    output = dict(llm_output)
+
+    doc_type = output.get("type")
+    if isinstance(doc_type, str):
+        normalized_type = re.sub(r"[\s-]+", "_", doc_type.strip().lower())
+        normalized_type = DOCUMENT_TYPE_ALIASES.get(normalized_type, normalized_type)
+        if normalized_type != doc_type:
+            output["type"] = normalized_type
+            repairs.append(f"normalized type '{doc_type}'")
+
+    data = output.get("data")
+    if output.get("type") == "business_card":
+        if isinstance(data, list) and len(data) == 1 and isinstance(data[0], dict):
+            data = data[0]
+            repairs.append("unwrapped single-card list")
+        if isinstance(data, dict):
+            data = _coerce_fields(data, BUSINESS_CARD_KEYS, BUSINESS_CARD_LIST_KEYS, repairs, "")
+    elif output.get("type") == "visitor_register":
+        if isinstance(data, dict):
+            lists = [value for value in data.values() if isinstance(value, list)]
+            if len(lists) == 1:
+                data = lists[0]
+                repairs.append("unwrapped entry list")
+            elif set(data) & set(VISITOR_ENTRY_KEYS):
+                data = [data]
+                repairs.append("wrapped single entry")
+        if isinstance(data, list):
+            data = [
+                _coerce_fields(entry, VISITOR_ENTRY_KEYS, (), repairs, f" in entry {i}") if isinstance(entry, dict) else entry
+                for i, entry in enumerate(data)
+            ]
+    if "data" in output or data is not None:
+        output["data"] = data
+    return output, repairs
+
+
+def validate_llm_output(llm_output: Any) -> Tuple[bool, Union[str, None]]:
+    """Validates a full {"type", "data"} extraction result of any document type."""
+    if not isinstance(llm_output, dict) or "type" not in llm_output or "data" not in llm_output:
+        return False, "LLM response missing 'type' or 'data' keys."
+    doc_type = llm_output.get("type")
+    data_payload = llm_output.get("data")
+    if doc_type == "business_card":
+        if not isinstance(data_payload, dict):
+            return False, "Expected 'data' dictionary for business_card."
+        return validate_business_card_data(data_payload)
+    if doc_type == "visitor_register":
+        if not isinstance(data_payload, list):
+            return False, "Expected 'data' list for visitor_register."
+        return validate_visitor_register_data(data_payload)
+    if doc_type == "unknown":
+        return True, None
+    return False, f"Unrecognized document type '{doc_type}'."
+
+
+def repair_and_validate_llm_output(response_content: str | None) -> Tuple[Dict[str, Any] | None, Union[str, None], List[str]]:
+    """
+    Parse -> coerce -> validate for a raw LLM response.
+    Returns (validated output or None, validation error or None, repairs applied).
+    """
+    try:
+        llm_output, repairs = parse_llm_json(response_content)
+    except ValueError as e:
+        return None, str(e), []
+    llm_output, coercions = coerce_llm_output(llm_output)
+    repairs.extend(coercions)
+    is_valid, error = validate_llm_output(llm_output)
+    return (llm_output if is_valid else None), error, repairs
+
+
+# Bounded labels for validation errors (the messages themselves contain indexes and key names)
+VALIDATION_FAILURE_REASONS = [
+    ("was empty", "empty_response"),
+    ("not valid JSON", "invalid_json"),
+    ("missing 'type' or 'data'", "missing_keys"),
+    ("structure mismatch", "structure_mismatch"),
+    ("Unrecognized document type", "unknown_document_type"),
+    ("Invalid type", "invalid_field_type"),
+    ("Invalid item type", "invalid_field_type"),
+    ("Expected 'data'", "invalid_data_shape"),
+    ("should be a list", "invalid_data_shape"),
+    ("is not a dictionary", "invalid_data_shape"),
+]
+
+
+def validation_failure_reason(error: str | None) -> str:
+    """Short, fixed category of a validation error message, for metrics labels."""
+    for fragment, reason in VALIDATION_FAILURE_REASONS:
+        if error and fragment in error:
+            return reason
+    return "other"
@@ -0,0 +1,204 @@
+# writer.py
+
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Dict, List
+
+from database import SessionLocal, add_documents_bulk
+from metrics import log
+
+# --- Configuration ---
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() in ("1", "true", "yes")
+WRITE_BATCH_MAX_DOCUMENTS = int(os.getenv("WRITE_BATCH_MAX_DOCUMENTS", "200")) # Commit once this many documents are waiting...
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "10"))       # ...or this long after the first one arrived
+
+LATENCY_SAMPLES = 1000 # Recent commits kept for the percentile metrics
+_STOP = object()
+
+
+class _WriteRequest:
+    __slots__ = ("documents", "future", "enqueued_at", "context")
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+        # The caller's context (its trace), so the writer thread's log lines about it carry its trace id
+        self.context = contextvars.copy_context()
+
+    def log(self, message: str, always: bool = False):
+        self.context.run(log, message, always)
+
+
+def _percentile_ms(samples, fraction: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread per process. Store requests are queued and coalesced into one
+    transaction (add_documents_bulk) until WRITE_BATCH_MAX_DOCUMENTS documents are waiting or
+    WRITE_BATCH_WINDOW_MS has passed. Each caller is answered only after its batch has committed.
+    A request is never split across batches, so each one stays atomic; if a group commit fails,
+    its requests are retried one transaction each so a single bad request cannot fail the others.
+    """
+
+    def __init__(self, max_documents: int, window_seconds: float):
+        self.max_documents = max_documents
+        self.window_seconds = window_seconds
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lifecycle_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._commit_latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._ack_latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"requests": 0, "documents": 0, "batches": 0, "fallback_batches": 0, "failed_requests": 0}
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Starts the writer thread (idempotent; store() also starts it on first use)."""
+        with self._lifecycle_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Commits everything already queued, then stops the thread. Blocking; call via a thread at shutdown."""
+        with self._lifecycle_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    # --- Submission ---
+
+    async def store(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Queues documents ({"type", "data", "filename"}) for the next group commit and waits until
+        it is committed. Returns add_documents_bulk's per-document results; raises its error on failure.
+        """
+        self.start()
+        request = _WriteRequest(documents)
+        self._queue.put(request)
+        return await asyncio.wrap_future(request.future)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            commit_latencies = list(self._commit_latencies)
+            ack_latencies = list(self._ack_latencies)
+        return {
+            **stats,
+            "queue_depth": self._queue.qsize(),
+            "average_batch_documents": round(stats["documents"] / stats["batches"], 2) if stats["batches"] else None,
+            "commit_latency_ms": {"p50": _percentile_ms(commit_latencies, 0.5), "p95": _percentile_ms(commit_latencies, 0.95), "max": _percentile_ms(commit_latencies, 1.0)},
+            "ack_latency_ms": {"p50": _percentile_ms(ack_latencies, 0.5), "p95": _percentile_ms(ack_latencies, 0.95), "max": _percentile_ms(ack_latencies, 1.0)},
+            "max_batch_documents": self.max_documents,
+            "batch_window_ms": self.window_seconds * 1000,
+        }
+
+    # --- Writer Thread ---
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            size = len(first.documents)
+            deadline = time.perf_counter() + self.window_seconds
+            while size < self.max_documents:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                size += len(item.documents)
+            self._commit(batch)
+
+    def _commit(self, batch: List[_WriteRequest]):
+        started = time.perf_counter()
+        documents = sum(len(request.documents) for request in batch)
+        try:
+            # A batch of one runs in its request's context, so add_documents_bulk's own log line is traced too
+            results = self._write([document for request in batch for document in request.documents], batch[0] if len(batch) == 1 else None)
+        except Exception as e:
+            if len(batch) == 1:
+                self._record(batch, started)
+                self._resolve(batch[0], error=e)
+                return
+            for request in batch:
+                request.log(f"Group commit of {len(batch)} requests failed ({e}); retrying them one by one.", always=True)
+            outcomes = []
+            for request in batch:
+                try:
+                    outcomes.append((request, self._write(request.documents, request), None))
+                except Exception as request_error:
+                    request.log(f"Write of {len(request.documents)} document(s) failed: {request_error}", always=True)
+                    outcomes.append((request, None, request_error))
+            self._record(batch, started, fallback=True)
+            for request, request_results, request_error in outcomes:
+                self._resolve(request, results=request_results, error=request_error)
+            return
+
+        self._record(batch, started)
+        commit_ms = (time.perf_counter() - started) * 1000
+        offset = 0
+        for request in batch:
+            count = len(request.documents)
+            request.log(
+                f"Committed {count} document(s) in a group of {len(batch)} request(s) / {documents} document(s): "
+                f"queued {(started - request.enqueued_at) * 1000:.1f}ms, commit {commit_ms:.1f}ms."
+            )
+            self._resolve(request, results=results[offset:offset + count])
+            offset += count
+
+    def _write(self, documents: List[Dict[str, Any]], request: _WriteRequest | None = None) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            if request is not None:
+                return request.context.run(add_documents_bulk, db, documents)
+            return add_documents_bulk(db, documents)
+        finally:
+            db.close()
+
+    def _resolve(self, request: _WriteRequest, results: List[Dict[str, Any]] | None = None, error: Exception | None = None):
+        with self._stats_lock:
+            self._ack_latencies.append(time.perf_counter() - request.enqueued_at)
+            if error is not None:
+                self._stats["failed_requests"] += 1
+        try:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(results)
+        except InvalidStateError:
+            pass # Caller went away (request cancelled); the write itself has still been committed
+
+    def _record(self, batch: List[_WriteRequest], started: float, fallback: bool = False):
+        with self._stats_lock:
+            self._commit_latencies.append(time.perf_counter() - started)
+            self._stats["batches"] += 1
+            self._stats["fallback_batches"] += int(fallback)
+            self._stats["requests"] += len(batch)
+            self._stats["documents"] += sum(len(request.documents) for request in batch)
+
+
+group_writer = GroupCommitWriter(WRITE_BATCH_MAX_DOCUMENTS, WRITE_BATCH_WINDOW_MS / 1000)
@@ -11,6 +11,7 @@ function UploadTab() {
   const [selectedFile, setSelectedFile] = useState(null);
   const [imagePreviewUrl, setImagePreviewUrl] = useState(null);
   const [extractedData, setExtractedData] = useState(null); // Stores { type, data } from backend
+  const [streamedRows, setStreamedRows] = useState([]); // Visitor rows shown while extraction is still running
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState('');
   const [successMessage, setSuccessMessage] = useState('');
@@ -74,21 +75,36 @@ function UploadTab() {
     setSuccessMessage('');
     setShowSuccessPopup(false);
     setExtractedData(null); // Clear previous results before new extraction
+    setStreamedRows([]);
 
     const formData = new FormData();
     formData.append('file', selectedFile);
 
     try {
-      console.log('Sending request to /extract_validate/ ...');
-      const response = await axios.post(`${BACKEND_URL}/extract_validate/`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' },
+      // Streaming endpoint: register rows arrive one by one, 'done' carries the validated result
+      console.log('Sending request to /extract_validate/stream/ ...');
+      const response = await fetch(`${BACKEND_URL}/extract_validate/stream/`, { method: 'POST', body: formData });
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.detail || `Server responded with status ${response.status}`);
+      }
+      let result = null;
+      let streamError = null;
+      await readEventStream(response, (eventName, payload) => {
+        if (eventName === 'row') setStreamedRows((rows) => [...rows, payload.entry]);
+        else if (eventName === 'done') result = payload;
+        else if (eventName === 'error') streamError = payload.detail;
       });
-      console.log('Received response from /extract_validate/:', response.data);
-      setExtractedData(response.data); // Set data for validation step
+      if (streamError || !result) {
+        throw new Error(streamError || 'The extraction stream ended unexpectedly.');
+      }
+      console.log('Received result from /extract_validate/stream/:', result);
+      setExtractedData({ type: result.type, data: result.data }); // Set data for validation step
     } catch (err) {
       handleApiError(err, 'Extraction failed');
     } finally {
       setIsLoading(false);
+      setStreamedRows([]);
     }
   };
 
@@ -132,6 +148,30 @@ function UploadTab() {
 
   // --- Helper Functions ---
 
+  // Reads a text/event-stream body and calls onEvent(eventName, payload) for each event
+  const readEventStream = async (response, onEvent) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let eventName = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach((line) => {
+          if (line.startsWith('event:')) eventName = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        if (data) onEvent(eventName, JSON.parse(data));
+      }
+    }
+  };
+
   const resetState = (clearMessages = true) => {
      setExtractedData(null);
      setSelectedFile(null);
@@ -249,6 +289,12 @@ function UploadTab() {
 
       {/* Loading/Error Messages - Show when relevant, hide during success popup */}
       {isLoading && <div className="loading">Processing... Please wait.</div>}
+      {isLoading && streamedRows.length > 0 && (
+        <div className="preview-section">
+          <p>Rows extracted so far: {streamedRows.length}</p>
+          <DataPreview type="visitor_register" data={streamedRows} />
+        </div>
+      )}
       {error && !showSuccessPopup && <div className="error">{error}</div>}
 
       {/* --- Validation Section --- */}
@@ -2,7 +2,7 @@
 import React, { useState, useEffect, useMemo, useCallback } from 'react'; // Added useCallback
 import axios from 'axios';
 import DatePicker from 'react-datepicker';
-import { format, parseISO, startOfDay, endOfDay, isValid } from 'date-fns'; // Date utilities
+import { format, parseISO, isValid } from 'date-fns'; // Date utilities
 // Removed unused Line import, kept Bar
 import { Bar } from 'react-chartjs-2';
 import {
@@ -35,102 +35,94 @@ ChartJS.register(
 
 // --- Configuration ---
 const BACKEND_URL = 'http://127.0.0.1:8000';
+const PAGE_SIZE = 100; // Rows per table page; more are loaded on request
+
+// Fetches one page of a read endpoint. nextCursor is the X-Next-Cursor response header (null on the last page).
+const fetchPage = async (endpoint, params, cursor = null) => {
+  const response = await axios.get(`${BACKEND_URL}${endpoint}`, {
+    params: { ...params, limit: PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+  });
+  return { rows: response.data || [], nextCursor: response.headers['x-next-cursor'] || null };
+};
 
 function VisualizeTab() {
-  const [businessCards, setBusinessCards] = useState([]);
-  const [visitorLogs, setVisitorLogs] = useState([]);
   const [filteredCards, setFilteredCards] = useState([]);
   const [filteredLogs, setFilteredLogs] = useState([]);
+  const [cardsCursor, setCardsCursor] = useState(null); // Next page of each table, if any
+  const [logsCursor, setLogsCursor] = useState(null);
+  const [analytics, setAnalytics] = useState(null); // Aggregates from /analytics/
   const [isLoading, setIsLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(''); // Which table is fetching its next page
   const [error, setError] = useState('');
   const [startDate, setStartDate] = useState(null); // Date object or null
   const [endDate, setEndDate] = useState(null);     // Date object or null
 
-  // Fetch data on component mount
-  useEffect(() => {
-    fetchData();
-  }, []); // Empty dependency array means run once on mount
-
-  // --- Filtering Logic ---
-  // Wrap applyFilters in useCallback because it's in useEffect dependency array
-  const applyFilters = useCallback(() => {
-    console.log("Applying filters with dates:", startDate, endDate);
-    const start = startDate ? startOfDay(startDate) : null;
-    const end = endDate ? endOfDay(endDate) : null;
-
-    const filterData = (data) => {
-        if (!start && !end) return data; // No filters applied
-
-        return data.filter(item => {
-            if (!item.created_at) return false; // Skip items without a creation date
-            try {
-                const itemDate = parseISO(item.created_at); // Dates from backend are ISO strings
-                if (!isValid(itemDate)) return false; // Skip invalid dates
+  // --- Data Fetching ---
+  // Filtering happens on the server. Charts and totals come from /analytics/; the tables load
+  // only their first page, and further pages when the user asks for them.
+  const filterParams = useMemo(() => {
+    const params = {};
+    if (startDate && isValid(startDate)) params.start_date = format(startDate, 'yyyy-MM-dd');
+    if (endDate && isValid(endDate)) params.end_date = format(endDate, 'yyyy-MM-dd');
+    return params;
+  }, [startDate, endDate]);
 
-                const itemDayStart = startOfDay(itemDate);
-                const isAfterStart = start ? itemDayStart >= start : true;
-                const isBeforeEnd = end ? itemDayStart <= end : true;
-                return isAfterStart && isBeforeEnd;
-            } catch (e) {
-                console.error("Error parsing date:", item.created_at, e);
-                return false; // Skip if date parsing fails
-            }
-        });
-    };
-
-    setFilteredCards(filterData(businessCards));
-    setFilteredLogs(filterData(visitorLogs));
-  }, [startDate, endDate, businessCards, visitorLogs]); // Dependencies for useCallback
-
-  // Apply filtering whenever dates or source data change
-   useEffect(() => {
-    applyFilters();
-  }, [applyFilters]); // Now depends on the memoized applyFilters
-
-
-  const fetchData = async () => {
+  const fetchData = useCallback(async () => {
     setIsLoading(true);
     setError('');
     try {
       console.log('Fetching data for visualization...');
-      const [cardsResponse, logsResponse] = await Promise.all([
-        axios.get(`${BACKEND_URL}/get_business_cards/`),
-        axios.get(`${BACKEND_URL}/get_visitor_logs/`)
+      const [cards, logs, analyticsResponse] = await Promise.all([
+        fetchPage('/get_business_cards/', filterParams),
+        fetchPage('/get_visitor_logs/', filterParams),
+        axios.get(`${BACKEND_URL}/analytics/`, { params: filterParams }),
       ]);
-      console.log('Business Cards:', cardsResponse.data.length);
-      console.log('Visitor Logs:', logsResponse.data.length);
-      setBusinessCards(cardsResponse.data || []);
-      setVisitorLogs(logsResponse.data || []);
-      // Note: Filtering will be triggered by the state update via the useEffect above
+      setFilteredCards(cards.rows);
+      setCardsCursor(cards.nextCursor);
+      setFilteredLogs(logs.rows);
+      setLogsCursor(logs.nextCursor);
+      setAnalytics(analyticsResponse.data);
     } catch (err) {
       console.error('Error fetching data:', err);
       setError(`Failed to fetch data: ${err.response?.data?.detail || err.message}`);
     } finally {
       setIsLoading(false);
     }
+  }, [filterParams]);
+
+  const loadMore = async (table) => {
+    const isCards = table === 'cards';
+    setLoadingMore(table);
+    setError('');
+    try {
+      const page = await fetchPage(isCards ? '/get_business_cards/' : '/get_visitor_logs/', filterParams, isCards ? cardsCursor : logsCursor);
+      if (isCards) {
+        setFilteredCards(previous => [...previous, ...page.rows]);
+        setCardsCursor(page.nextCursor);
+      } else {
+        setFilteredLogs(previous => [...previous, ...page.rows]);
+        setLogsCursor(page.nextCursor);
+      }
+    } catch (err) {
+      console.error('Error loading more records:', err);
+      setError(`Failed to load more records: ${err.response?.data?.detail || err.message}`);
+    } finally {
+      setLoadingMore('');
+    }
   };
 
+  // Fetch on mount and whenever the date range changes
+  useEffect(() => {
+    fetchData();
+  }, [fetchData]);
+
   // --- Chart Data Preparation ---
+  // Daily counts come pre-aggregated from /analytics/ (rollup tables), not from the table rows
   const chartData = useMemo(() => {
     const cardCounts = {};
     const logCounts = {};
-
-    // Aggregate counts by date (YYYY-MM-DD)
-    const aggregateCounts = (data, counts) => {
-        data.forEach(item => {
-            if (item.created_at) {
-                try {
-                    const dateStr = format(parseISO(item.created_at), 'yyyy-MM-dd');
-                    counts[dateStr] = (counts[dateStr] || 0) + 1;
-                } catch (e) {
-                    console.error("Error processing date for chart:", item.created_at, e);
-                }
-            }
-        });
-    };
-
-    aggregateCounts(filteredCards, cardCounts);
-    aggregateCounts(filteredLogs, logCounts);
+    (analytics?.cards_per_day || []).forEach(bucket => { cardCounts[bucket.day] = bucket.cards; });
+    (analytics?.visits_per_day || []).forEach(bucket => { logCounts[bucket.day] = bucket.visits; });
 
     // Combine dates and sort
     const allDates = [...new Set([...Object.keys(cardCounts), ...Object.keys(logCounts)])].sort();
@@ -149,7 +141,7 @@ function VisualizeTab() {
           order: 2 // Render bars behind line
         },
         {
-          label: 'Visitor Logs Added',
+          label: 'Visits (by visit date)',
           data: allDates.map(date => logCounts[date] || 0),
           borderColor: 'rgb(255, 99, 132)',
           backgroundColor: 'rgba(255, 99, 132, 0.5)',
@@ -160,7 +152,7 @@ function VisualizeTab() {
         }
       ]
     };
-  }, [filteredCards, filteredLogs]); // Recalculate when filtered data changes
+  }, [analytics]); // Recalculate when the aggregates change
 
   // Chart Options
   const chartOptions = {
@@ -168,7 +160,7 @@ function VisualizeTab() {
     maintainAspectRatio: false, // Allow chart to resize height
     plugins: {
       legend: { position: 'top' },
-      title: { display: true, text: 'Entries Added Over Time' },
+      title: { display: true, text: 'Visits and Cards per Day' },
       tooltip: { mode: 'index', intersect: false },
     },
     scales: {
@@ -265,7 +257,7 @@ function VisualizeTab() {
       {error && <div className="error">{error}</div>}
 
       {/* --- Charts --- */}
-       {!isLoading && !error && (filteredCards.length > 0 || filteredLogs.length > 0) && (
+       {!isLoading && !error && chartData.labels.length > 0 && (
         <div className="data-display-section">
             <h3>Charts</h3>
             <div className="charts-container">
@@ -277,7 +269,7 @@ function VisualizeTab() {
             </div>
         </div>
        )}
-        {!isLoading && !error && !(filteredCards.length > 0 || filteredLogs.length > 0) && (
+        {!isLoading && !error && chartData.labels.length === 0 && (
             <p>No data available for the selected period to display charts.</p>
         )}
 
@@ -286,7 +278,7 @@ function VisualizeTab() {
       {!isLoading && !error && (
         <>
           <div className="data-display-section">
-            <h3>Business Card Records ({filteredCards.length})</h3>
+            <h3>Business Card Records ({filteredCards.length}{cardsCursor ? '+' : ''})</h3>
             {filteredCards.length > 0 ? (
               <div className="data-table-container">
                 <table>
@@ -318,6 +310,11 @@ function VisualizeTab() {
                     ))}
                   </tbody>
                 </table>
+                {cardsCursor && (
+                  <button onClick={() => loadMore('cards')} disabled={loadingMore === 'cards'} className='filter-button'>
+                    {loadingMore === 'cards' ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </div>
             ) : (
               <p>No business card records found{startDate || endDate ? ' matching the selected date range.' : '.'}</p>
@@ -325,7 +322,7 @@ function VisualizeTab() {
           </div>
 
           <div className="data-display-section">
-            <h3>Visitor Log Entries ({filteredLogs.length})</h3>
+            <h3>Visitor Log Entries ({filteredLogs.length}{logsCursor ? '+' : ''})</h3>
              {filteredLogs.length > 0 ? (
               <div className="data-table-container">
                 <table>
@@ -356,6 +353,11 @@ function VisualizeTab() {
                     ))}
                   </tbody>
                 </table>
+                {logsCursor && (
+                  <button onClick={() => loadMore('logs')} disabled={loadingMore === 'logs'} className='filter-button'>
+                    {loadingMore === 'logs' ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </div>
              ) : (
                 <p>No visitor log entries found{startDate || endDate ? ' matching the selected date range.' : '.'}</p>